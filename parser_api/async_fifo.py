@@ -3,6 +3,7 @@
 import logging
 import os
 import stat
+from typing import Optional
 
 from parser_api.pipe_reader import get_stream_reader
 
@@ -19,9 +20,10 @@ class AsyncFifo:
         self._reader = None
         self._transport = None
 
-    async def open(self, path: str, allow_eof: bool = False):
+    async def open(self, path: str, allow_eof: bool = False, limit: Optional[int] = None):
         """Open source pipe for reading, create relevant StreamReader,
         initialize _file, _reader and _transport attributes.
+        limit sets buffer limit of the StreamReader (64 KiB by default).
         """
 
         logger.info("AsyncFifo.open() invoked.")
@@ -69,7 +71,7 @@ class AsyncFifo:
             )
 
         try:
-            self._reader, self._transport = await get_stream_reader(self._file)
+            self._reader, self._transport = await get_stream_reader(self._file, limit)
         except Exception as e:
             logger.error(
                 f"AsyncFifo.open(): Failed to attach transport to named pipe {self._path}."
@@ -3,6 +3,7 @@ import asyncio
 import logging
 import os
 import sys
+from typing import Optional
 
 from parser_api.pipe_reader import get_stream_reader
 
@@ -16,9 +17,10 @@ class AsyncStdin:
         self._reader = None
         self._transport = None
 
-    async def open(self):
+    async def open(self, limit: Optional[int] = None):
         """Open sys.stdin for reading, create relevant StreamReader,
         initialize _reader and _transport attributes.
+        limit sets buffer limit of the StreamReader (64 KiB by default).
         """
 
         logger.info("AsyncStdin.open() invoked.")
@@ -49,7 +51,7 @@ class AsyncStdin:
             raise e
 
         try:
-            self._reader, self._transport = await get_stream_reader(self._stdin)
+            self._reader, self._transport = await get_stream_reader(self._stdin, limit)
         except Exception as e:
             logger.error(
                 f"AsyncStdin.open(): Failed to attach transport to sys.stdin."
@@ -1,75 +1,1004 @@
 #!/usr/bin/env python3
+import codecs
+import collections
+import contextlib
+import json
 import logging
-from typing import List, Callable, Awaitable, Any
+import mmap
+import os
+import sys
+import time
+from typing import List, Callable, Awaitable, Any, Optional, Tuple, Union, Iterator, AsyncIterator, NamedTuple, Type
 
 import asyncio
 from parser_api.async_fifo import AsyncFifo
 from parser_api.async_stdin import AsyncStdin
+from parser_api.decompress import decompress_stream
+from parser_api.error import ParserError, InputError, IncompleteDataError, ErrorRateExceededError
+from parser_api.metrics import ParserMetrics, PipelineStats
+from parser_api.reconnecting_fifo import ReconnectingFifo
+from parser_api.shm_ring import AsyncShmRing
 
 logger = logging.getLogger(__name__)
 
 
+def _split_lines(
+        text: Union[str, bytes],
+        pending: List[Union[str, bytes]],
+        ) -> Tuple[List[Union[str, bytes]], Union[str, bytes]]:
+    """Splits decoded text or raw bytes into complete lines (keeping line ends,
+    as readline does) and a trailing incomplete line. Pending parts of an incomplete
+    line from previous blocks are prepended to the first line.
+    """
+    newline = "\n" if isinstance(text, str) else b"\n"
+    end = text.rfind(newline)
+    if end < 0:
+        return [], text
+    if pending:
+        text = text[:0].join(pending) + text
+        end = text.rfind(newline)
+    lines = text[:end].split(newline)
+    return [line + newline for line in lines], text[end + 1:]
+
+
+def _file_ranges(data: mmap.mmap, range_size: int, start: int = 0) -> Iterator[Tuple[int, int]]:
+    """Splits a memory-mapped file from offset start into ranges of about range_size
+    bytes, each ending at a line boundary. Yields (start, end) offsets.
+    """
+    size = len(data)
+    while start < size:
+        target = start + range_size
+        if target >= size:
+            end = size
+        else:
+            newline = data.find(b"\n", target - 1)
+            end = size if newline < 0 else newline + 1
+        yield start, end
+        start = end
+
+
+OVERFLOW_POLICIES = ("error", "grow", "split", "skip")
+
+ERROR_POLICIES = ("abort", "skip", "quarantine")
+
+# Bytes at the beginning of a file passed to _on_resume
+RESUME_HEAD_SIZE = 2 ** 16
+
+
+class Position(NamedTuple):
+    """Position in the input: stream offset and number of lines before it."""
+
+    offset: int
+    line: int
+
+
+def read_checkpoint(path: str) -> Optional[Position]:
+    """Returns the checkpoint saved to a state file by BaseParser, None if there is no such file."""
+    try:
+        with open(path) as file:
+            state = json.load(file)
+    except FileNotFoundError:
+        return None
+    return Position(state["offset"], state["line"])
+
+
+class QuarantinedInput(NamedTuple):
+    """Input which failed to parse, as passed to error_sink of BaseParser."""
+
+    data: bytes  # Raw bytes of the line, or of the batch of lines if _parse_lines is overridden
+    error: Type[InputError]
+    message: str
+    offset: Optional[int]  # Stream offset of data, None if not known
+    line: Optional[int]  # Number of the first line of data (from 0), None if not known
+
+
+class _QueueReader:
+    """Reads blocks of data from a queue, as the parse stages of
+    BaseParser.parse_pipelined do. An empty block marks EOF.
+    """
+
+    def __init__(self, queue: asyncio.Queue):
+        self._queue = queue
+
+    async def read(self, n: int = -1) -> bytes:
+        """Returns the next block from the queue, regardless of n."""
+        block = await self._queue.get()
+        if len(block) == 0:
+            self._queue.put_nowait(block)  # Let other parse stages see EOF too
+        return block
+
+
 class BaseParser:
     """A base class for parsers. Parses text and passes it to _parse_line method
     which should be implemented by subclasses.
+    Subclasses setting _bytes_input to True receive lines as bytes, without decoding.
     """
 
-    def __init__(self, result_callback: Callable[[List[Any]], Awaitable[None]]):
+    _bytes_input = False
+
+    def __init__(
+            self,
+            result_callback: Optional[Callable[[List[Any]], Awaitable[None]]],
+            batch_size: Optional[int] = None,
+            batch_bytes: Optional[int] = None,
+            batch_latency: Optional[float] = None,
+            metrics: Optional[ParserMetrics] = None,
+            errors: str = "abort",
+            error_sink: Optional[Callable[[List[QuarantinedInput]], Awaitable[None]]] = None,
+            max_error_rate: Optional[float] = None,
+            error_window: int = 1000,
+            checkpoints: bool = False,
+            state_file: Optional[str] = None,
+            checkpoint_interval: float = 1.0,
+            ):
+        """If any of batch_size, batch_bytes or batch_latency is set, results passed
+        to _emit_results are buffered and delivered to result_callback in batches:
+        once batch_size items or batch_bytes bytes are collected, once batch_latency
+        seconds passed since the first buffered item, or at EOF.
+        If metrics is set, it is updated with counters and latencies while parsing.
+        result_callback may be None if results are only taken with records or batches.
+        errors sets handling of InputError (e.g. FormatError) raised while parsing:
+        "abort" stops parsing by raising it, "skip" drops data which caused it, and
+        "quarantine" passes this data as QuarantinedInput to error_sink, both going on
+        with the next line (in chunked mode, with the next batch of lines if _parse_lines
+        is overridden, since the failed line is not known then). Errors are counted
+        by class name in error_counts. If max_error_rate is set, parsing is stopped
+        by ErrorRateExceededError once more than this fraction of the last error_window
+        lines failed. Offsets assume an ASCII-compatible encoding.
+        If checkpoints is True or state_file is set, position of the input parsed
+        and checkpoint, position of the input all results of which were delivered,
+        are tracked by parse_stream and parse_file (see there for their granularity).
+        Results count as delivered once result_callback returns, or once queued by
+        batches and parse_pipelined. If state_file is set, checkpoint is saved to
+        it at most every checkpoint_interval seconds and at EOF, see parse_file
+        for resuming from it.
+        """
+        if errors not in ERROR_POLICIES:
+            raise ValueError(f"Unknown error policy: {errors!r}.")
+        if errors == "quarantine" and error_sink is None:
+            raise ValueError("error_sink is required by the quarantine error policy.")
         self._result_callback = result_callback
+        self._metrics = metrics
+        self._batch_size = batch_size
+        self._batch_bytes = batch_bytes
+        self._batch_latency = batch_latency
+        self._batching = bool(batch_size or batch_bytes or batch_latency)
+        self._results = []
+        self._results_bytes = 0
+        self._flush_lock = asyncio.Lock()
+        self._flush_timer = None
+        self._flush_task = None
+        self._result_queue = None
+        self._result_queue_stats = None
+        self._error_policy = errors
+        self._error_sink = error_sink
+        self._max_error_rate = max_error_rate
+        self._error_window = error_window
+        self._recent_errors = collections.deque()  # Line numbers of errors within error_window
+        self.error_counts = collections.Counter()
+        self._checkpoints = checkpoints or state_file is not None
+        self._state_file = state_file
+        self._checkpoint_interval = checkpoint_interval
+        self._checkpoint_saved = 0.0
+        self._delivering = 0  # Number of deliveries in progress
+        self._parsed = Position(0, 0)
+        self._checkpoint = Position(0, 0)
+        # Whether results may go straight to result_callback, unless queued, see _emit_results
+        self._direct = (
+            not self._batching
+            and not self._checkpoints
+            and metrics is None
+            and type(self)._deliver_results is BaseParser._deliver_results
+            and type(self)._put_results is BaseParser._put_results
+            )
 
     async def _on_eof(self):
         """Called when EOF is reached."""
         pass
 
-    async def _parse_line(self, line: str):
+    async def _emit_results(self, items: List[Any]) -> None:
+        """Passes parsed items to result_callback, buffering them if batching is configured.
+        Should be used by subclasses to emit results. Unless results are batched, queued,
+        tracked by checkpoints or measured by metrics, result_callback is awaited directly.
+        """
+        if self._direct and self._result_queue is None:  # Fast path
+            await self._result_callback(items)
+            return
+
+        if self._metrics is not None:
+            self._metrics.records_emitted += len(items)
+
+        if not self._batching:
+            await self._deliver_results(items)
+            return
+
+        self._results.extend(items)
+        if self._batch_bytes:
+            self._results_bytes += sum(map(self._result_size, items))
+
+        if (
+                (self._batch_size and len(self._results) >= self._batch_size)
+                or (self._batch_bytes and self._results_bytes >= self._batch_bytes)
+                ):
+            await self._flush_results()
+        elif self._batch_latency and self._flush_timer is None and self._results:
+            self._flush_timer = asyncio.get_running_loop().call_later(
+                self._batch_latency, self._on_flush_timer
+                )
+
+    async def _flush_results(self) -> None:
+        """Delivers buffered results to result_callback."""
+
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+
+        task = self._flush_task
+        if task is not None and task.done():
+            self._flush_task = None
+            task.result()  # Re-raises an error of a timed flush, if any
+
+        async with self._flush_lock:
+            if not self._results:
+                return
+            results = self._results
+            self._results = []
+            self._results_bytes = 0
+            await self._deliver_results(results)
+
+    def _on_flush_timer(self) -> None:
+        """Called when batch_latency expires for the buffered results."""
+        self._flush_timer = None
+        self._flush_task = asyncio.ensure_future(self._flush_results())
+
+    async def _deliver_results(self, items: List[Any]) -> None:
+        """Passes a list of results to result_callback, or to the sink stage
+        when running parse_pipelined, updating checkpoint once they are delivered.
+        """
+        if not self._checkpoints:
+            await self._put_results(items)
+            return
+        position = self._parsed  # Results of the input up to it are delivered now or before
+        self._delivering += 1
+        try:
+            await self._put_results(items)
+        finally:
+            self._delivering -= 1
+        self._acknowledge(position)
+
+    async def _put_results(self, items: List[Any]) -> None:
+        """Passes a list of results to result_callback, or to the sink stage
+        when running parse_pipelined.
+        """
+        if self._result_queue is not None:
+            if self._result_queue_stats is not None:
+                self._result_queue_stats.sample(self._result_queue)
+            await self._result_queue.put(items)
+            return
+        await self._call_result_callback(items)
+
+    async def _call_result_callback(self, items: List[Any]) -> None:
+        """Passes a list of results to result_callback."""
+        if self._metrics is None:
+            await self._result_callback(items)
+            return
+        start = time.perf_counter_ns()
+        await self._result_callback(items)
+        self._metrics.callback_latency.add(time.perf_counter_ns() - start)
+
+    async def _handle_input_error(
+            self,
+            error: InputError,
+            data: bytes,
+            offset: Optional[int],
+            line: Optional[int],
+            ) -> None:
+        """Handles an input error raised while parsing data according to the error policy."""
+
+        name = type(error).__name__
+        self.error_counts[name] += 1
+        if self._error_policy == "abort":
+            raise error
+        if self._metrics is not None:
+            self._metrics.errors[name] += 1
+        logger.warning(f"Input error at offset {offset}, line {line}: {error!r}, {len(data)} bytes dropped.")
+
+        if self._max_error_rate is not None and line is not None:
+            recent = self._recent_errors
+            if recent and recent[-1] > line:  # A new stream
+                recent.clear()
+            recent.append(line)
+            while recent[0] <= line - self._error_window:
+                recent.popleft()
+            if len(recent) > self._max_error_rate * self._error_window:
+                raise ErrorRateExceededError(
+                    f"{len(recent)} of the last {self._error_window} lines failed to parse."
+                    ) from error
+
+        if self._error_policy == "quarantine":
+            await self._quarantine(error, data, offset, line)
+        await self._on_input_error(error)
+
+    async def _quarantine(
+            self,
+            error: InputError,
+            data: bytes,
+            offset: Optional[int] = None,
+            line: Optional[int] = None,
+            ) -> None:
+        """Passes data which failed to parse to error_sink."""
+        await self._error_sink([QuarantinedInput(data, type(error), str(error), offset, line)])
+
+    async def _on_input_error(self, error: InputError) -> None:
+        """Called when an input error is skipped or quarantined, before parsing goes on.
+        Subclasses keeping state between lines may override it to recover.
+        """
+        pass
+
+    @property
+    def position(self) -> Position:
+        """Position of the input parsed, if checkpoints are tracked."""
+        return self._parsed
+
+    @property
+    def checkpoint(self) -> Position:
+        """Position of the input all results of which are delivered, if checkpoints are tracked."""
+        return self._checkpoint
+
+    def _at_boundary(self) -> bool:
+        """Returns True if parsing may resume after the input parsed so far.
+        Subclasses parsing records spanning several lines may override it.
+        """
+        return True
+
+    async def _on_resume(self, head: bytes) -> None:
+        """Called before parsing resumes from a checkpoint, with the beginning of the input.
+        Subclasses which need it to parse the rest (e.g. a document header) may override it.
+        """
+        pass
+
+    def _start_at(self, position: Position) -> None:
+        """Sets position and checkpoint before parsing input from position."""
+        self._parsed = position
+        self._checkpoint = position
+
+    def _mark_parsed(self, offset: int, line: int) -> None:
+        """Marks input up to offset, of line lines, as parsed."""
+        if not self._at_boundary():
+            return
+        self._parsed = Position(offset, line)
+        if not self._results and not self._delivering:  # No results are waiting for delivery
+            self._acknowledge(self._parsed)
+
+    def _acknowledge(self, position: Position) -> None:
+        """Advances checkpoint to position, saving it to state_file if it is due."""
+        if position <= self._checkpoint:
+            return
+        self._checkpoint = position
+        if self._state_file is not None and time.monotonic() - self._checkpoint_saved >= self._checkpoint_interval:
+            self.save_checkpoint()
+
+    def save_checkpoint(self) -> None:
+        """Saves checkpoint to state_file, replacing it atomically."""
+
+        logger.debug(f"save_checkpoint(): {self._checkpoint} to {self._state_file}.")
+
+        temp_path = self._state_file + ".tmp"
+        with open(temp_path, "w") as file:
+            json.dump({"offset": self._checkpoint.offset, "line": self._checkpoint.line, "time": time.time()}, file)
+        os.replace(temp_path, self._state_file)
+        self._checkpoint_saved = time.monotonic()
+
+    @staticmethod
+    def _result_size(item: Any) -> int:
+        """Returns size of a result item in bytes, as accounted against batch_bytes."""
+        if isinstance(item, (str, bytes, bytearray)):
+            return len(item)
+        return sys.getsizeof(item)
+
+    async def _parse_line(self, line: Union[str, bytes]):
         """Parses a single line of data. Should be implemented by subclasses."""
         raise NotImplementedError
 
+    async def _parse_lines(self, lines: List[Union[str, bytes]]) -> None:
+        """Parses a batch of lines. Used by parse_stream in chunked mode.
+        Passes each line to _parse_line, subclasses may override it to process
+        the whole batch at once.
+        """
+        for line in lines:
+            await self._parse_line(line)
+
     async def parse_stream(
             self,
             pipe: asyncio.StreamReader,
             encoding: str = "utf-8",
+            chunk_size: Optional[int] = None,
+            overflow: str = "error",
+            compression: Optional[str] = None,
+            decompress_in_thread: bool = False,
+            limit: Optional[int] = None,
             ) -> None:
-        """Main class method. Parses a stream of data from a pipe."""
+        """Main class method. Parses a stream of data from a pipe.
+        If chunk_size is set, data is read in blocks of up to chunk_size bytes,
+        split into lines and passed to _parse_lines. Otherwise, data is read and
+        passed to _parse_line line by line.
+        encoding is not used if the parser takes bytes input.
+        overflow sets handling of lines longer than the limit of the pipe when reading
+        line by line: "error" skips the line and raises IncompleteDataError (handled
+        according to the error policy), "grow"
+        reads the whole line, "split" passes the line to _parse_line in pieces
+        as they are read, and "skip" skips the line. Overflows are counted in metrics.
+        In chunked mode, lines of any length are read whole.
+        If compression is set, data is decompressed before parsing, see
+        decompress.decompress_stream for codecs ("auto" detects the codec).
+        limit sets buffer limit of the reader of decompressed data (64 KiB by default),
+        which should match that of pipe.
+        If checkpoints are tracked, position is updated after every line, or every
+        block of lines in chunked mode, at which _at_boundary holds. Offsets are
+        counted from the start of the stream, in decompressed data.
+        """
 
         logger.info("parse_stream() invoked.")
+
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow!r}.")
+        self._start_at(Position(0, 0))
+
+        transport = None
+        if compression:
+            pipe, transport = decompress_stream(pipe, compression, in_thread=decompress_in_thread, limit=limit)
+
+        try:
+            if chunk_size:
+                await self._read_chunks(pipe, encoding, chunk_size)
+            else:
+                await self._read_lines(pipe, encoding, overflow)
+        except ParserError as e:
+            if self._metrics is not None:
+                self._metrics.errors[type(e).__name__] += 1
+            raise
+        finally:
+            if transport is not None:
+                transport.close()
+
+        if self._metrics is not None:
+            self._metrics.eofs += 1
+        await self._on_eof()
+        await self._flush_results()
+        if self._state_file is not None:
+            self.save_checkpoint()
+
+        logger.info("parse_stream() finished.")
+
+    async def _read_lines(
+            self,
+            pipe: asyncio.StreamReader,
+            encoding: str,
+            overflow: str = "error",
+            ) -> None:
+        """Reads the pipe line by line until EOF, passing each line to _parse_line."""
+        debug = logger.isEnabledFor(logging.DEBUG)
+        raw = self._bytes_input
+        metrics = self._metrics
+        checkpoints = self._checkpoints
+        clock = time.perf_counter_ns
+        offset = 0
+        number = 0
         while True:
-            data = await pipe.readline()
+            if metrics is not None:
+                started = clock()
+            try:
+                data = await pipe.readuntil(b"\n")
+            except asyncio.IncompleteReadError as e:  # EOF reached, possibly after a partial line
+                data = e.partial
+            except asyncio.LimitOverrunError as e:
+                offset += await self._read_long_line(
+                    pipe, e.consumed, overflow, None if raw else encoding, offset, number,
+                    )
+                number += 1
+                if checkpoints:
+                    self._mark_parsed(offset, number)
+                continue
+            if metrics is not None:
+                read = clock()
+                metrics.read_latency.add(read - started)
+                metrics.bytes_read += len(data)
             if len(data) == 0:  # EOF reached
-                await self._on_eof()
                 break
 
-            logger.debug(f"next line to parse: '{data}'")
-            line = data.decode(encoding)
-            await self._parse_line(line)
+            if debug:
+                logger.debug(f"next line to parse: '{data}'")
+            line = data if raw else data.decode(encoding)
+            if metrics is not None:
+                decoded = clock()
+                metrics.decode_latency.add(decoded - read)
+            try:
+                await self._parse_line(line)
+            except InputError as e:
+                await self._handle_input_error(e, data, offset, number)
+            offset += len(data)
+            number += 1
+            if checkpoints:
+                self._mark_parsed(offset, number)
+            if metrics is not None:
+                metrics.parse_latency.add(clock() - decoded)
+                metrics.lines_parsed += 1
 
-        logger.info("parse_stream() finished.")
+    async def _read_long_line(
+            self,
+            pipe: asyncio.StreamReader,
+            consumed: int,
+            overflow: str,
+            encoding: Optional[str],
+            offset: int = 0,
+            number: int = 0,
+            ) -> int:
+        """Reads a line longer than the limit of the pipe, consumed bytes of which are
+        already buffered, and handles it according to the overflow policy.
+        offset and number locate the line in the stream for the error policy.
+        Returns size of the line.
+        """
+
+        logger.warning(f"Line longer than the limit of the pipe, overflow policy is '{overflow}'.")
+
+        decoder = None
+        if encoding and overflow == "split":
+            decoder = codecs.getincrementaldecoder(encoding)()
+        pieces = []
+        size = 0
+        while True:
+            piece = await pipe.readexactly(consumed) if consumed else b""
+            try:
+                piece += await pipe.readuntil(b"\n")
+                last = True
+            except asyncio.IncompleteReadError as e:  # EOF reached
+                piece += e.partial
+                last = True
+            except asyncio.LimitOverrunError as e:
+                consumed = e.consumed
+                last = False
+            size += len(piece)
+
+            if overflow == "grow":
+                pieces.append(piece)
+            elif overflow == "split" and piece:
+                try:
+                    await self._parse_line(decoder.decode(piece, final=last) if decoder else piece)
+                except InputError as e:
+                    await self._handle_input_error(e, piece, offset + size - len(piece), number)
+            if last:
+                break
+
+        if self._metrics is not None:
+            self._metrics.bytes_read += size
+            self._metrics.overflows += 1
+
+        if overflow == "grow":
+            data = b"".join(pieces)
+            try:
+                await self._parse_line(data.decode(encoding) if encoding else data)
+            except InputError as e:
+                await self._handle_input_error(e, data, offset, number)
+        elif overflow == "error":
+            await self._handle_input_error(
+                IncompleteDataError(f"Line of {size} bytes exceeds the limit of the pipe."),
+                b"", offset, number,
+                )
+        return size
+
+    async def _read_chunks(
+            self,
+            pipe: asyncio.StreamReader,
+            encoding: str,
+            chunk_size: int,
+            ) -> None:
+        """Reads the pipe in blocks until EOF, passing complete lines to _parse_lines.
+        An incomplete trailing line is kept until the next block completes it,
+        multibyte characters split between blocks are handled by an incremental decoder.
+        """
+        debug = logger.isEnabledFor(logging.DEBUG)
+        raw = self._bytes_input
+        metrics = self._metrics
+        clock = time.perf_counter_ns
+        decoder = None if raw else codecs.getincrementaldecoder(encoding)()
+        pending = []
+        read_size = 0  # Bytes read before the current block
+        offset = 0  # Stream offset of the first pending line
+        number = 0
+        while True:
+            if metrics is not None:
+                started = clock()
+            data = await pipe.read(chunk_size)
+            if metrics is not None:
+                read = clock()
+                metrics.read_latency.add(read - started)
+                metrics.bytes_read += len(data)
+            if len(data) == 0:  # EOF reached
+                break
+
+            if debug:
+                logger.debug(f"next chunk to parse: {len(data)} bytes.")
+            lines, tail = _split_lines(data if raw else decoder.decode(data), pending)
+            if metrics is not None:
+                decoded = clock()
+                metrics.decode_latency.add(decoded - read)
+            if lines:
+                pending = [tail] if tail else []
+                await self._parse_batch(lines, encoding, offset, number)
+                offset = read_size + data.rfind(b"\n") + 1
+                number += len(lines)
+                if self._checkpoints:
+                    self._mark_parsed(offset, number)
+                if metrics is not None:
+                    metrics.parse_latency.add(clock() - decoded)
+                    metrics.lines_parsed += len(lines)
+            elif tail:
+                pending.append(tail)
+            read_size += len(data)
+
+        if raw:
+            text = b"".join(pending)
+        else:
+            text = "".join(pending) + decoder.decode(b"", final=True)
+        lines, tail = _split_lines(text, [])
+        if tail:
+            lines.append(tail)
+        if lines:
+            if metrics is not None:
+                started = clock()
+            await self._parse_batch(lines, encoding, offset, number)
+            if self._checkpoints:
+                self._mark_parsed(read_size, number + len(lines))
+            if metrics is not None:
+                metrics.parse_latency.add(clock() - started)
+                metrics.lines_parsed += len(lines)
+
+    async def _parse_batch(
+            self,
+            lines: List[Union[str, bytes]],
+            encoding: str,
+            offset: int,
+            number: int,
+            ) -> None:
+        """Passes a batch of lines starting at offset and line number to _parse_lines,
+        handling input errors according to the error policy. Unless _parse_lines is
+        overridden, lines are passed to _parse_line here and errors are handled
+        for each line, otherwise for the whole batch.
+        """
+        if type(self)._parse_lines is not BaseParser._parse_lines:
+            try:
+                await self._parse_lines(lines)
+            except InputError as e:
+                await self._handle_input_error(e, self._encode_lines(lines, encoding), offset, number)
+            return
+        await self._parse_each_line(lines, encoding, offset, number)
+
+    async def _parse_each_line(
+            self,
+            lines: List[Union[str, bytes]],
+            encoding: str,
+            offset: int,
+            number: int,
+            ) -> None:
+        """Passes a batch of lines starting at offset and line number to _parse_line
+        one by one, handling input errors for each line according to the error policy.
+        """
+        parse_line = self._parse_line
+        done = 0  # Lines before offset
+        for index, line in enumerate(lines):
+            try:
+                await parse_line(line)
+            except InputError as e:
+                offset += len(self._encode_lines(lines[done:index], encoding))
+                done = index + 1
+                data = self._encode_lines([line], encoding)
+                await self._handle_input_error(e, data, offset, number + index)
+                offset += len(data)
+
+    def _encode_lines(self, lines: List[Union[str, bytes]], encoding: str) -> bytes:
+        """Returns raw bytes of lines."""
+        return b"".join(lines) if self._bytes_input else "".join(lines).encode(encoding)
+
+    async def parse_pipelined(
+            self,
+            pipe: asyncio.StreamReader,
+            encoding: str = "utf-8",
+            chunk_size: int = 65536,
+            read_queue_size: int = 16,
+            result_queue_size: int = 16,
+            parse_tasks: int = 1,
+            stats: Optional[PipelineStats] = None,
+            ) -> None:
+        """Parses a stream of data from a pipe in three concurrent stages: a reader
+        task putting blocks of complete lines to a queue of read_queue_size blocks,
+        parse_tasks tasks passing them to _parse_lines (see parse_stream in chunked
+        mode), and a sink task passing results from a queue of result_queue_size
+        batches to result_callback. Reading is suspended only when the queues are full.
+        More than one parse task is only suitable for parsers which keep no state
+        between lines, and results are not kept in input order then.
+        If stats is set, it is updated with occupancy of the queues.
+        """
+
+        logger.info("parse_pipelined() invoked.")
+
+        chunks = asyncio.Queue(read_queue_size)
+        results = asyncio.Queue(result_queue_size)
+        chunks_stats = stats.chunks if stats is not None else None
+
+        async def _read() -> None:
+            pending = []
+            while True:
+                data = await pipe.read(chunk_size)
+                if len(data) == 0:  # EOF reached
+                    break
+                end = data.rfind(b"\n")
+                if end < 0:
+                    pending.append(data)
+                    continue
+                pending.append(data[:end + 1])
+                block = b"".join(pending)
+                pending = [data[end + 1:]]
+                if chunks_stats is not None:
+                    chunks_stats.sample(chunks)
+                await chunks.put(block)
+            block = b"".join(pending)
+            if block:
+                await chunks.put(block)
+            await chunks.put(b"")
+
+        async def _parse() -> None:
+            await self._read_chunks(_QueueReader(chunks), encoding, chunk_size)
+
+        async def _sink() -> None:
+            while True:
+                items = await results.get()
+                if items is None:
+                    break
+                await self._call_result_callback(items)
+
+        reader = asyncio.ensure_future(_read())
+        parsers = [asyncio.ensure_future(_parse()) for _ in range(parse_tasks)]
+        sink = asyncio.ensure_future(_sink())
+        stages = asyncio.gather(reader, *parsers)
+
+        self._result_queue = results
+        self._result_queue_stats = stats.results if stats is not None else None
+        try:
+            await asyncio.wait([stages, sink], return_when=asyncio.FIRST_COMPLETED)
+            if sink.done():
+                sink.result()  # Re-raises an error of the sink stage
+            await stages
+
+            if self._metrics is not None:
+                self._metrics.eofs += 1
+            await self._on_eof()
+            await self._flush_results()
+
+            await results.put(None)
+            await sink
+        finally:
+            self._result_queue = None
+            self._result_queue_stats = None
+            for task in (reader, *parsers, sink):
+                task.cancel()
+
+        logger.info("parse_pipelined() finished.")
+
+    async def batches(
+            self,
+            source: Union[asyncio.StreamReader, str, None] = None,
+            queue_size: int = 1,
+            **kwargs,
+            ) -> AsyncIterator[List[Any]]:
+        """Parses source and yields lists of results instead of passing them to
+        result_callback. source is a StreamReader (see parse_stream), a path of
+        a named pipe (see parse_fifo) or None for sys.stdin (see parse_stdin),
+        other keyword arguments are passed to the respective method.
+        Parsing runs in a task suspended while queue_size lists wait for the
+        consumer, so the consumer drives reading. The task is cancelled when the
+        iterator is closed, use contextlib.aclosing to close it on leaving a loop early.
+        """
+
+        logger.info("batches() invoked.")
+
+        if isinstance(source, str):
+            parse = self.parse_fifo(source, **kwargs)
+        elif source is None:
+            parse = self.parse_stdin(**kwargs)
+        else:
+            parse = self.parse_stream(source, **kwargs)
+
+        queue = asyncio.Queue(queue_size)
+
+        async def _parse() -> None:
+            try:
+                await parse
+            except Exception as e:
+                await queue.put(e)
+                return
+            await queue.put(None)
+
+        self._result_queue = queue
+        task = asyncio.ensure_future(_parse())
+        try:
+            while True:
+                items = await queue.get()
+                if items is None:
+                    break
+                if isinstance(items, Exception):
+                    raise items
+                yield items
+        finally:
+            self._result_queue = None
+            task.cancel()
+
+        logger.info("batches() finished.")
+
+    async def records(
+            self,
+            source: Union[asyncio.StreamReader, str, None] = None,
+            queue_size: int = 1,
+            **kwargs,
+            ) -> AsyncIterator[Any]:
+        """Parses source and yields results one by one, see batches."""
+        async with contextlib.aclosing(self.batches(source, queue_size, **kwargs)) as batches:
+            async for items in batches:
+                for item in items:
+                    yield item
+
+    async def parse_file(
+            self,
+            path: str,
+            encoding: str = "utf-8",
+            range_size: int = 2 ** 20,
+            resume: bool = False,
+            ) -> None:
+        """Parses a regular file. The file is memory-mapped and passed to _parse_lines
+        in ranges of about range_size bytes split at line boundaries.
+        Reading is not asynchronous: page faults block the event loop.
+        The error policy applies as in chunked mode of parse_stream. If checkpoints are tracked,
+        position is updated after every range at which _at_boundary holds.
+        If resume is True, parsing starts from the checkpoint saved to state_file,
+        if any, after passing the beginning of the file to _on_resume.
+        """
+
+        logger.info("parse_file() invoked.")
+        logger.debug(f"for path = {path}.")
+
+        position = Position(0, 0)
+        if resume:
+            if self._state_file is None:
+                raise ValueError("Resuming requires state_file.")
+            position = read_checkpoint(self._state_file) or position
+            logger.info(f"parse_file(): resuming from {position}.")
+        self._start_at(position)
+
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_size:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    if position.offset:
+                        await self._on_resume(data[:RESUME_HEAD_SIZE])
+                    number = position.line
+                    for start, end in _file_ranges(data, range_size, position.offset):
+                        number += await self._parse_mapped_range(data, start, end, encoding, number)
+                        if self._checkpoints:
+                            self._mark_parsed(end, number)
+
+        if self._metrics is not None:
+            self._metrics.eofs += 1
+        await self._on_eof()
+        await self._flush_results()
+        if self._state_file is not None:
+            self.save_checkpoint()
+
+        logger.info("parse_file() finished.")
+
+    async def _parse_mapped_range(
+            self,
+            data: mmap.mmap,
+            start: int,
+            end: int,
+            encoding: str,
+            number: int = 0,
+            ) -> int:
+        """Passes lines of a range of a memory-mapped file, starting with line number,
+        to _parse_batch, returns the number of lines.
+        """
+
+        block = data[start:end]
+        lines, tail = _split_lines(block if self._bytes_input else block.decode(encoding), [])
+        if tail:
+            lines.append(tail)
+
+        if self._metrics is not None:
+            self._metrics.bytes_read += len(block)
+            self._metrics.lines_parsed += len(lines)
+        await self._parse_batch(lines, encoding, start, number)
+        return len(lines)
 
     async def parse_fifo(
             self,
             fifo_path: str,
             encoding: str = "utf-8",
             nowait: bool = True,
+            chunk_size: Optional[int] = None,
+            limit: Optional[int] = None,
+            overflow: str = "error",
+            compression: Optional[str] = None,
+            decompress_in_thread: bool = False,
+            reconnect: bool = False,
             ) -> None:
         """Reads a stream of data from a named pipe and forwards it to parse_stream.
         If nowait is True, EOF will be allowed and the method will return immediately.
         Otherwise, it will block waiting for data.
+        If reconnect is True, the pipe is read across writers, see ReconnectingFifo,
+        until the method is cancelled; nowait is ignored then.
+        limit sets buffer limit of the pipe reader (64 KiB by default).
+        See parse_stream for the other arguments.
         """
         logger.info("parse_fifo() invoked.")
         logger.debug(f"for fifo_path = {fifo_path}.")
 
-        fifo = AsyncFifo()
-        with await fifo.open(fifo_path, allow_eof=nowait) as reader:
-            await self.parse_stream(reader, encoding)
+        if reconnect:
+            fifo = await ReconnectingFifo(self._metrics).open(fifo_path, limit=limit)
+        else:
+            fifo = await AsyncFifo().open(fifo_path, allow_eof=nowait, limit=limit)
+        with fifo as reader:
+            await self.parse_stream(
+                reader, encoding, chunk_size, overflow, compression, decompress_in_thread, limit,
+                )
 
         logger.info("parse_fifo() finished.")
 
-    async def parse_stdin(self, encoding: str = 'utf-8') -> None:
-        """Reads a stream of data from sys.stdin and forwards it to parse_stream."""
+    async def parse_shm_ring(
+            self,
+            name: str,
+            encoding: str = "utf-8",
+            capacity: int = 2 ** 24,
+            fifo_dir: Optional[str] = None,
+            chunk_size: Optional[int] = None,
+            limit: Optional[int] = None,
+            overflow: str = "error",
+            compression: Optional[str] = None,
+            decompress_in_thread: bool = False,
+            ) -> None:
+        """Creates a shared memory ring buffer of capacity bytes named name, reads
+        a stream of data written to it by a ShmRingWriter and forwards it to
+        parse_stream, see AsyncShmRing. Returns when the writer is closed.
+        limit sets buffer limit of the ring reader (64 KiB by default).
+        See parse_stream for the other arguments.
+        """
+        logger.info("parse_shm_ring() invoked.")
+        logger.debug(f"for name = {name}.")
+
+        ring = await AsyncShmRing().open(name, capacity, fifo_dir, limit)
+        with ring as reader:
+            await self.parse_stream(
+                reader, encoding, chunk_size, overflow, compression, decompress_in_thread, limit,
+                )
+
+        logger.info("parse_shm_ring() finished.")
+
+    async def parse_stdin(
+            self,
+            encoding: str = 'utf-8',
+            chunk_size: Optional[int] = None,
+            limit: Optional[int] = None,
+            overflow: str = "error",
+            compression: Optional[str] = None,
+            decompress_in_thread: bool = False,
+            ) -> None:
+        """Reads a stream of data from sys.stdin and forwards it to parse_stream.
+        limit sets buffer limit of the stdin reader (64 KiB by default).
+        See parse_stream for the other arguments.
+        """
         logger.info("parse_stdin() invoked.")
 
         stdin = AsyncStdin()
-        with await stdin.open() as reader:
-            await self.parse_stream(reader, encoding)
+        with await stdin.open(limit=limit) as reader:
+            await self.parse_stream(
+                reader, encoding, chunk_size, overflow, compression, decompress_in_thread, limit,
+                )
 
         logger.info("parse_stdin() finished.")
+
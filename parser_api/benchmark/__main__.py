@@ -0,0 +1,5 @@
+import sys
+
+from parser_api.benchmark.suite import main
+
+sys.exit(main())
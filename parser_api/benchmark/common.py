@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""Parsers, callbacks and output shared by the benchmarks."""
+
+import re
+from typing import Any, Callable, Dict, List, Tuple
+
+from parser_api.base_parser import BaseParser
+
+# Alignment and width of a format specification, e.g. ">12" of ">12.1f"
+_WIDTH = re.compile(r"[<>^]?\d*")
+
+
+async def a_pass(items) -> None:
+    """Asynchronous version of pass for use in callbacks."""
+    pass
+
+
+class LineParser(BaseParser):
+    """A parser emitting every line."""
+
+    async def _parse_line(self, line: str) -> None:
+        await self._emit_results([line])
+
+
+def print_table(
+        results: List[Dict[str, Any]],
+        columns: List[Tuple[str, str, Callable[[Dict[str, Any]], Any]]],
+        ) -> None:
+    """Prints results as a table. columns are (header, format specification,
+    function returning the value of a result) of each column.
+    """
+    print(" ".join(format(header, _WIDTH.match(spec).group(0)) for header, spec, _ in columns))
+    for item in results:
+        print(" ".join(format(value(item), spec) for _, spec, value in columns))
+
+
+def ratio(value: float, base: float) -> str:
+    """Returns value relative to base for a ratio column, e.g. "x1.25"."""
+    return f"x{value / base:.2f}"
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""Compares lines/s of BaseParser and XmlBaseParser on the available event loops.
+
+Every workload is run through every driver of the benchmark suite on each loop
+(see runner.available_loops()), the ratio is against the standard asyncio loop.
+
+Usage: python3 -m parser_api.benchmark.loops [size MB] [workload ...]
+"""
+
+import sys
+from typing import Any, Dict, List, Optional
+
+from parser_api import runner
+from parser_api.benchmark.common import print_table, ratio
+from parser_api.benchmark.suite import run
+
+DRIVERS = ("memory", "fifo")
+
+
+def compare_loops(
+        workloads: List[str],
+        size: int,
+        chunk_size: Optional[int] = None,
+        loops: Optional[List[str]] = None,
+        ) -> List[Dict[str, Any]]:
+    """Runs the workloads on each loop, returns results of the benchmark suite
+    with the "loop" key added.
+    """
+    results = []
+    for loop in loops or runner.available_loops():
+        for workload in workloads:
+            for driver in DRIVERS:
+                result = runner.run(run(workload, driver, size, chunk_size), loop)
+                result["loop"] = loop
+                results.append(result)
+    return results
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    """Prints results as a table."""
+    base = {
+        (item["workload"], item["driver"]): item["lines_per_s"]
+        for item in results if item["loop"] == "asyncio"
+        }
+    print_table(results, [
+        ("loop", "<8", lambda item: item["loop"]),
+        ("workload", "<12", lambda item: item["workload"]),
+        ("driver", "<7", lambda item: item["driver"]),
+        ("lines/s", ">12.0f", lambda item: item["lines_per_s"]),
+        ("MB/s", ">8.1f", lambda item: item["mb_per_s"]),
+        ("ratio", ">6", lambda item: ratio(item["lines_per_s"], base[(item["workload"], item["driver"])])),
+        ])
+
+
+if __name__ == "__main__":
+
+    size = int(float(sys.argv[1]) * 2 ** 20) if len(sys.argv) > 1 else 16 * 2 ** 20
+    workloads = sys.argv[2:] or ["short_lines", "nested_xml"]
+
+    print_results(compare_loops(workloads, size))
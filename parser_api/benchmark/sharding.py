@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Compares lines/s of a single LineParser and of ShardedParser with N shards.
+
+Line-oriented workloads only, parsed from an in-memory StreamReader in chunked
+mode; the ratio is against the single parser. Shards scale with the cost of
+parsing a line, so the trivial LineParser of the benchmarks shows the overhead of
+routing rather than the gain. Startup of the worker processes is included.
+
+Usage: python3 -m parser_api.benchmark.sharding [size MB] [shards ...]
+"""
+
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from parser_api import runner
+from parser_api.benchmark.common import LineParser, print_table, ratio
+from parser_api.benchmark.suite import RecordClock, run_memory
+from parser_api.benchmark.workloads import WORKLOADS
+from parser_api.sharded_parser import ShardedParser
+
+CHUNK_SIZE = 2 ** 16
+
+
+async def run_sharded(workload: str, size: int, shards: Optional[int]) -> Dict[str, Any]:
+    """Parses a workload with a single parser (shards is None) or with ShardedParser,
+    returns lines/s and MB/s.
+    """
+    data = WORKLOADS[workload][1](size)
+    clock = RecordClock()
+    if shards is None:
+        parser = LineParser(clock)
+    else:
+        parser = ShardedParser(LineParser, clock, shards=shards)
+    started = time.perf_counter()
+    try:
+        await run_memory(parser, data, CHUNK_SIZE)
+    finally:
+        if shards is not None:
+            parser.close()
+    seconds = time.perf_counter() - started
+    return {
+        "workload": workload,
+        "shards": shards or 0,
+        "records": clock.records,
+        "seconds": seconds,
+        "lines_per_s": data.count(b"\n") / seconds,
+        "mb_per_s": len(data) / seconds / 2 ** 20,
+        }
+
+
+def compare_shards(workloads: List[str], size: int, shards: List[int]) -> List[Dict[str, Any]]:
+    """Runs the workloads on a single parser and on each number of shards."""
+    return [
+        runner.run(run_sharded(workload, size, count))
+        for workload in workloads
+        for count in [None] + shards
+        ]
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    """Prints results as a table, shards 0 being the single parser."""
+    base = {item["workload"]: item["lines_per_s"] for item in results if not item["shards"]}
+    print_table(results, [
+        ("workload", "<12", lambda item: item["workload"]),
+        ("shards", ">6", lambda item: item["shards"]),
+        ("lines/s", ">12.0f", lambda item: item["lines_per_s"]),
+        ("MB/s", ">8.1f", lambda item: item["mb_per_s"]),
+        ("ratio", ">6", lambda item: ratio(item["lines_per_s"], base[item["workload"]])),
+        ])
+
+
+if __name__ == "__main__":
+
+    size = int(float(sys.argv[1]) * 2 ** 20) if len(sys.argv) > 1 else 16 * 2 ** 20
+    shards = [int(arg) for arg in sys.argv[2:]] or [1, 2, 4]
+
+    print_results(compare_shards(["short_lines", "long_lines"], size, shards))
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Compares local handoff throughput of a named pipe (AsyncFifo) and of a shared
+memory ring buffer (AsyncShmRing).
+
+A producer process writes the data in pieces; the consumer reads it from the
+StreamReader of the source ("read", handoff only) or parses it with the line
+parser of the benchmark suite ("parse"). Time is measured from the first data
+received, so startup of the producer is not included.
+
+Usage: python3 -m parser_api.benchmark.shm_ring [size MB] [piece KB]
+"""
+
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from parser_api import runner
+from parser_api.async_fifo import AsyncFifo
+from parser_api.benchmark.common import LineParser, print_table, ratio
+from parser_api.benchmark.workloads import short_lines
+from parser_api.shm_ring import AsyncShmRing, ShmRingWriter
+
+SOURCES = ("fifo", "shm")
+MODES = ("read", "parse")
+READ_SIZE = 2 ** 18
+
+
+def produce(source: str, path: str, size: int, piece: int) -> None:
+    """Writes size bytes of short lines to a named pipe or to a ring."""
+    data = short_lines(piece)
+    count = max(1, size // len(data))
+    if source == "fifo":
+        with open(path, "wb") as fifo:
+            for _ in range(count):
+                fifo.write(data)
+    else:
+        with ShmRingWriter(os.path.basename(path), os.path.dirname(path)) as writer:
+            for _ in range(count):
+                writer.write(data)
+
+
+class _Counter:
+    """Result callback counting records and the time of the first one."""
+
+    def __init__(self):
+        self.records = 0
+        self.started = None
+
+    async def __call__(self, items: List[Any]) -> None:
+        if self.started is None:
+            self.started = time.perf_counter()
+        self.records += len(items)
+
+
+async def _consume(reader: asyncio.StreamReader, mode: str) -> Dict[str, Any]:
+    """Reads or parses everything from reader, returns bytes or records and seconds."""
+
+    if mode == "parse":
+        counter = _Counter()
+        await LineParser(counter).parse_stream(reader, chunk_size=READ_SIZE)
+        return {"records": counter.records, "seconds": time.perf_counter() - counter.started}
+
+    received = 0
+    started = None
+    while data := await reader.read(READ_SIZE):
+        if started is None:
+            started = time.perf_counter()
+        received += len(data)
+    return {"bytes": received, "seconds": time.perf_counter() - started}
+
+
+async def run(source: str, mode: str, size: int, piece: int) -> Dict[str, Any]:
+    """Runs a single benchmark, returns its results."""
+
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if source == "fifo":
+            path = os.path.join(tmp_dir, "bench_fifo")
+            os.mkfifo(path)
+            handle = await AsyncFifo().open(path, allow_eof=True, limit=READ_SIZE)
+        else:
+            path = os.path.join(tmp_dir, f"bench_ring_{os.getpid()}")
+            handle = await AsyncShmRing(READ_SIZE).open(os.path.basename(path), fifo_dir=tmp_dir, limit=READ_SIZE)
+        producer = context.Process(target=produce, args=(source, path, size, piece))
+        producer.start()
+        with handle as reader:
+            result = await _consume(reader, mode)
+        await asyncio.get_running_loop().run_in_executor(None, producer.join)
+
+    result.update(source=source, mode=mode, size=size)
+    result["mb_per_s"] = size / result["seconds"] / 2 ** 20
+    return result
+
+
+def compare_sources(size: int, piece: int = 2 ** 16) -> List[Dict[str, Any]]:
+    """Runs every mode on every source."""
+    return [runner.run(run(source, mode, size, piece)) for mode in MODES for source in SOURCES]
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    """Prints results as a table, the ratio being against the named pipe."""
+    base = {item["mode"]: item["mb_per_s"] for item in results if item["source"] == "fifo"}
+    print_table(results, [
+        ("mode", "<6", lambda item: item["mode"]),
+        ("source", "<6", lambda item: item["source"]),
+        ("MB/s", ">8.1f", lambda item: item["mb_per_s"]),
+        ("ratio", ">6", lambda item: ratio(item["mb_per_s"], base[item["mode"]])),
+        ])
+
+
+if __name__ == "__main__":
+
+    size = int(float(sys.argv[1]) * 2 ** 20) if len(sys.argv) > 1 else 256 * 2 ** 20
+    piece = int(float(sys.argv[2]) * 2 ** 10) if len(sys.argv) > 2 else 2 ** 16
+
+    print_results(compare_sources(size, piece))
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""Throughput benchmark suite for BaseParser and XmlBaseParser.
+
+Drives synthetic workloads (see workloads.py) through parse_stream on an in-memory
+StreamReader ("memory"), through parse_fifo on a named pipe ("fifo") and through
+parse_stdin ("stdin"). Reports lines/s, MB/s, p50/p99 inter-arrival time ("gap") of
+records (time between consecutive records delivered to the callback) and peak RSS.
+Every benchmark runs in a child process of its own, which receives the workload on
+stdin, so that peak RSS is of that benchmark only.
+
+Results can be saved as a baseline JSON file and compared against it later,
+failing (exit code 1) on throughput regressions above a threshold.
+
+Usage: python3 -m parser_api.benchmark [--help]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from xml.etree import ElementTree
+
+from parser_api import runner
+from parser_api.base_parser import BaseParser
+from parser_api.benchmark.common import LineParser, print_table
+from parser_api.benchmark.workloads import WORKLOADS
+from parser_api.metrics import LatencyHistogram
+from parser_api.xml_base_parser import XmlBaseParser
+
+DRIVERS = ("memory", "fifo", "stdin")
+
+
+class RecordClock:
+    """Result callback recording time between consecutive records."""
+
+    def __init__(self):
+        self.records = 0
+        self.inter_arrival = LatencyHistogram()
+        self._last = time.perf_counter_ns()
+
+    async def __call__(self, items: List[Any]) -> None:
+        now = time.perf_counter_ns()
+        duration = (now - self._last) // len(items)
+        for _ in items:
+            self.inter_arrival.add(duration)
+        self.records += len(items)
+        self._last = now
+
+
+class RecordXmlParser(XmlBaseParser):
+    """An XML parser emitting every record ("rec" element)."""
+
+    def __init__(self, result_callback):
+        super().__init__(result_callback, prune=True)
+
+    async def _parse_xml(self, event: str, element: ElementTree.Element) -> None:
+        if element.tag == "rec":
+            await self._emit_results([element])
+
+
+def make_parser(kind: str, result_callback) -> BaseParser:
+    """Returns a parser for the given kind of workload."""
+    if kind == "xml":
+        return RecordXmlParser(result_callback)
+    return LineParser(result_callback)
+
+
+def peak_rss() -> int:
+    """Returns peak resident set size of the current process in bytes. VmHWM of
+    /proc/self/status is preferred to ru_maxrss, which Linux carries over exec from
+    the parent process.
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+async def run_memory(parser: BaseParser, data: bytes, chunk_size: Optional[int]) -> None:
+    """Parses data from an in-memory StreamReader."""
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+    await parser.parse_stream(reader, chunk_size=chunk_size)
+
+
+async def run_fifo(parser: BaseParser, data: bytes, chunk_size: Optional[int]) -> None:
+    """Parses data written to a named pipe by a thread."""
+
+    def _write(path: str) -> None:
+        with open(path, "wb") as fifo:  # Blocks until the parser opens the pipe
+            fifo.write(data)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "bench_fifo")
+        os.mkfifo(path)
+        writer = threading.Thread(target=_write, args=(path,))
+        writer.start()
+        try:
+            await parser.parse_fifo(path, chunk_size=chunk_size)
+        finally:
+            writer.join()
+
+
+def run_child_process(workload: str, driver: str, data: bytes, chunk_size: Optional[int]) -> Dict[str, Any]:
+    """Runs a benchmark in a child process, passing data on its stdin, returns
+    results measured by the child.
+    """
+    command = [sys.executable, "-m", "parser_api.benchmark.suite", "--child", workload, "--drivers", driver]
+    if chunk_size:
+        command += ["--chunk-size", str(chunk_size)]
+    if runner.selected_loop():  # The child parses on the same event loop
+        command += ["--loop", runner.selected_loop()]
+    result = subprocess.run(command, input=data, stdout=subprocess.PIPE, check=True)
+    return json.loads(result.stdout)
+
+
+async def run_child(workload: str, driver: str, chunk_size: Optional[int]) -> Dict[str, Any]:
+    """Parses a workload given on stdin through a driver, in a child process started
+    by run_child_process.
+    """
+    kind, _ = WORKLOADS[workload]
+    clock = RecordClock()
+    parser = make_parser(kind, clock)
+    if driver == "stdin":
+        started = time.perf_counter()
+        await parser.parse_stdin(chunk_size=chunk_size)
+    else:
+        data = sys.stdin.buffer.read()
+        started = time.perf_counter()
+        if driver == "memory":
+            await run_memory(parser, data, chunk_size)
+        else:
+            await run_fifo(parser, data, chunk_size)
+    seconds = time.perf_counter() - started
+    return {
+        "seconds": seconds,
+        "records": clock.records,
+        "p50": clock.inter_arrival.percentile(0.5) / 1e9,
+        "p99": clock.inter_arrival.percentile(0.99) / 1e9,
+        "peak_rss": peak_rss(),
+        }
+
+
+async def run(workload: str, driver: str, size: int, chunk_size: Optional[int]) -> Dict[str, Any]:
+    """Runs a single benchmark in a child process, returns its results."""
+    _, generate = WORKLOADS[workload]
+    data = generate(size)
+    lines = data.count(b"\n")
+    result = run_child_process(workload, driver, data, chunk_size)
+    result.update(
+        workload=workload,
+        driver=driver,
+        bytes=len(data),
+        lines=lines,
+        lines_per_s=lines / result["seconds"],
+        mb_per_s=len(data) / result["seconds"] / 2 ** 20,
+        )
+    return result
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], threshold: float) -> List[str]:
+    """Returns descriptions of results whose throughput dropped by more than
+    threshold (a fraction) against the baseline.
+    """
+    previous = {(item["workload"], item["driver"]): item for item in baseline}
+    regressions = []
+    for item in results:
+        base = previous.get((item["workload"], item["driver"]))
+        if base is None:
+            continue
+        if item["lines_per_s"] < base["lines_per_s"] * (1 - threshold):
+            regressions.append(
+                f"{item['workload']}/{item['driver']}: {item['lines_per_s']:.0f} lines/s, "
+                f"baseline {base['lines_per_s']:.0f} lines/s"
+                )
+    return regressions
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    """Prints results as a table."""
+    print_table(results, [
+        ("workload", "<12", lambda item: item["workload"]),
+        ("driver", "<7", lambda item: item["driver"]),
+        ("lines/s", ">12.0f", lambda item: item["lines_per_s"]),
+        ("MB/s", ">8.1f", lambda item: item["mb_per_s"]),
+        ("p50 gap us", ">11.1f", lambda item: item["p50"] * 1e6),
+        ("p99 gap us", ">11.1f", lambda item: item["p99"] * 1e6),
+        ("peak RSS MB", ">12.1f", lambda item: item["peak_rss"] / 2 ** 20),
+        ])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(description="parser_api throughput benchmarks.")
+    arg_parser.add_argument("--workloads", nargs="+", choices=list(WORKLOADS), default=list(WORKLOADS))
+    arg_parser.add_argument("--drivers", nargs="+", choices=DRIVERS, default=list(DRIVERS))
+    arg_parser.add_argument("--size", type=float, default=16, help="workload size, MB")
+    arg_parser.add_argument("--chunk-size", type=int, default=None, help="use chunked mode")
+    arg_parser.add_argument("--save", help="save results as a baseline JSON file")
+    arg_parser.add_argument("--baseline", help="compare results against a baseline JSON file")
+    arg_parser.add_argument("--threshold", type=float, default=0.1, help="allowed regression, fraction")
+    arg_parser.add_argument("--loop", choices=["auto"] + runner.available_loops(), default="auto", help="event loop")
+    arg_parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = arg_parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(runner.run(run_child(args.child, args.drivers[0], args.chunk_size), args.loop)))
+        return 0
+
+    size = int(args.size * 2 ** 20)
+    results = [
+        runner.run(run(workload, driver, size, args.chunk_size), args.loop)
+        for workload in args.workloads
+        for driver in args.drivers
+        ]
+    print_results(results)
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""Synthetic workloads for benchmarks. Each workload generator takes approximate
+size of the data in bytes and returns the data.
+"""
+
+from typing import Callable, Dict, Tuple
+
+
+def short_lines(size: int) -> bytes:
+    """Lines of about 20 bytes."""
+    line = b"%08d short line\n"
+    return b"".join(line % i for i in range(size // len(line % 0)))
+
+
+def long_lines(size: int) -> bytes:
+    """Lines of about 16 KiB."""
+    line = b"%08d " + b"x" * 16375 + b"\n"
+    return b"".join(line % i for i in range(max(1, size // len(line % 0))))
+
+
+def nested_xml(size: int) -> bytes:
+    """XML document of records, each nested 20 levels deep."""
+    depth = 20
+    opening = "".join(f"<n{level}>" for level in range(depth))
+    closing = "".join(f"</n{level}>" for level in reversed(range(depth)))
+    record = f'<rec id="%d">{opening}%d{closing}</rec>\n'.encode()
+    count = size // len(record % (0, 0))
+    return b"<root>\n" + b"".join(record % (i, i) for i in range(count)) + b"</root>\n"
+
+
+def wide_xml(size: int) -> bytes:
+    """XML document of records, each with 50 attributes and 50 children."""
+    attributes = " ".join(f'a{i}="v{i}"' for i in range(50))
+    children = "".join(f"<c{i}>{i}</c{i}>" for i in range(50))
+    record = f'<rec id="%d" {attributes}>{children}</rec>\n'.encode()
+    count = size // len(record % 0)
+    return b"<root>\n" + b"".join(record % i for i in range(count)) + b"</root>\n"
+
+
+# Workload name -> (kind of parser, generator)
+WORKLOADS: Dict[str, Tuple[str, Callable[[int], bytes]]] = {
+    "short_lines": ("lines", short_lines),
+    "long_lines": ("lines", long_lines),
+    "nested_xml": ("xml", nested_xml),
+    "wide_xml": ("xml", wide_xml),
+    }
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Compares XML engines of XmlBaseParser on the same feed.
+
+The feed consists of records with many attributes, of which only "id" is read.
+The engines compared are ElementTree with and without pruning, and expat
+building record subtrees with all attributes and with "id" only, as well as
+both engines with "record" elements selected.
+
+Usage: python3 -m parser_api.benchmark.xml_engines [records] [attributes] [repeats]
+"""
+
+import asyncio
+import functools
+import sys
+import time
+from xml.etree import ElementTree
+
+from parser_api import runner
+from parser_api.benchmark.common import a_pass
+from parser_api.xml_base_parser import XmlBaseParser
+from parser_api.xml_engine import ExpatEngine
+
+# Name -> XmlBaseParser keyword arguments
+CONFIGURATIONS = {
+    "etree": {"engine": "etree"},
+    "etree_prune": {"engine": "etree", "prune": True},
+    "expat": {"engine": "expat"},
+    "expat_id": {"engine": functools.partial(ExpatEngine, attributes=["id"])},
+    "etree_select": {"engine": "etree", "select": ["record"]},
+    "expat_select": {"engine": "expat", "select": ["record"]},
+    }
+
+
+class IdXmlParser(XmlBaseParser):
+    """An XML parser reading id of every record."""
+
+    async def _parse_xml(self, event: str, element: ElementTree.Element) -> None:
+        if element.tag == "record":
+            element.get("id")
+
+
+def make_feed(records: int, attributes: int) -> bytes:
+    """Returns an XML document with the given number of records, one per line."""
+    extra = " ".join(f'a{i}="value {i}"' for i in range(attributes)).encode()
+    lines = [b"<feed>\n"]
+    lines.extend(
+        b'<record id="%d" %s><name>item %d</name><value>%d</value></record>\n' % (i, extra, i, i * 7)
+        for i in range(records)
+        )
+    lines.append(b"</feed>\n")
+    return b"".join(lines)
+
+
+async def run_once(feed: bytes, kwargs: dict, chunk_size: int = 65536) -> float:
+    """Parses the feed once, returns elapsed time in seconds."""
+    reader = asyncio.StreamReader()
+    reader.feed_data(feed)
+    reader.feed_eof()
+    parser = IdXmlParser(a_pass, record_tags=["record"], **kwargs)
+    start = time.perf_counter()
+    await parser.parse_stream(reader, chunk_size=chunk_size)
+    await parser.close()
+    return time.perf_counter() - start
+
+
+async def main(records: int = 10000, attributes: int = 1000, repeats: int = 3) -> None:
+    feed = make_feed(records, attributes)
+    print(f"feed: {records} records, {attributes} attributes each, {len(feed) / 2 ** 20:.1f} MB")
+
+    results = {}
+    for name, kwargs in CONFIGURATIONS.items():
+        best = min([await run_once(feed, kwargs) for _ in range(repeats)])
+        results[name] = best
+        print(
+            f"{name:>12}: {best:.3f} s, {best / records * 1e6:.1f} us/record, "
+            f"{len(feed) / best / 2 ** 20:.1f} MB/s, x{results['etree'] / best:.2f}"
+            )
+
+
+if __name__ == "__main__":
+
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    attributes = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    repeats = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+
+    runner.run(main(records, attributes, repeats))
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Measures per-element cost of XmlBaseParser with DEBUG logging disabled and enabled.
+
+With DEBUG disabled, the debug messages (including re-serialization of each element)
+are not built at all, so the difference between the two runs is the per-element
+saving of the guarded logging.
+
+Usage: python3 -m parser_api.benchmark.xml_logging [records] [repeats]
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from xml.etree import ElementTree
+
+from parser_api import runner, xml_base_parser
+from parser_api.benchmark.common import a_pass
+from parser_api.xml_base_parser import XmlBaseParser
+
+
+class NullXmlParser(XmlBaseParser):
+    """An XML parser which drops all the elements it receives."""
+
+    async def _parse_xml(self, event: str, element: ElementTree.Element) -> None:
+        pass
+
+
+def make_feed(records: int) -> bytes:
+    """Returns an XML document with the given number of records, one per line."""
+    lines = [b"<feed>\n"]
+    lines.extend(
+        b'<record id="%d" kind="sample"><name>item %d</name><value>%d</value></record>\n'
+        % (i, i, i * 7)
+        for i in range(records)
+        )
+    lines.append(b"</feed>\n")
+    return b"".join(lines)
+
+
+async def run_once(feed: bytes, chunk_size: int = 65536) -> float:
+    """Parses the feed once, returns elapsed time in seconds."""
+    reader = asyncio.StreamReader()
+    reader.feed_data(feed)
+    reader.feed_eof()
+    parser = NullXmlParser(a_pass)
+    start = time.perf_counter()
+    await parser.parse_stream(reader, chunk_size=chunk_size)
+    return time.perf_counter() - start
+
+
+async def main(records: int = 100000, repeats: int = 3) -> None:
+    feed = make_feed(records)
+    elements = records * 3 + 1  # record, name and value per record, and the root
+
+    logger = xml_base_parser.logger
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    results = {}
+    for level in (logging.INFO, logging.DEBUG):
+        logger.setLevel(level)
+        best = min([await run_once(feed) for _ in range(repeats)])
+        results[level] = best
+        print(
+            f"{logging.getLevelName(level):>5}: {best:.3f} s, "
+            f"{best / elements * 1e6:.2f} us/element"
+            )
+
+    saving = (results[logging.DEBUG] - results[logging.INFO]) / elements
+    print(f"saving with DEBUG disabled: {saving * 1e6:.2f} us/element")
+
+
+if __name__ == "__main__":
+
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    runner.run(main(records, repeats))
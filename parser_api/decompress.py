@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+import asyncio
+import bz2
+import logging
+import lzma
+import zlib
+from typing import Optional, Tuple
+
+from parser_api.error import FormatError, IncompleteDataError
+from parser_api.pipe_reader import FeedTransport, create_fed_reader
+
+logger = logging.getLogger(__name__)
+
+CODECS = ("gzip", "zlib", "bz2", "lzma")
+
+
+def detect_codec(data: bytes) -> Optional[str]:
+    """Returns codec of compressed data by its magic bytes, None if the data
+    does not look compressed.
+    """
+    if data[:2] == b"\x1f\x8b":
+        return "gzip"
+    if data[:3] == b"BZh":
+        return "bz2"
+    if data[:6] == b"\xfd7zXZ\x00":
+        return "lzma"
+    if data[:1] == b"\x78" and len(data) >= 2 and (data[0] << 8 | data[1]) % 31 == 0:
+        return "zlib"  # Default 32 KiB window only, to avoid mistaking text for zlib
+    return None
+
+
+class Decompressor:
+    """Incremental decompressor producing output in chunks of at most max_length bytes.
+    Concatenated compressed streams (e.g. multi-member gzip) are decompressed one
+    after another.
+    """
+
+    def __init__(self, codec: str, max_length: int = 2 ** 18):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown compression codec: {codec!r}.")
+        self._codec = codec
+        self._zlib = codec in ("gzip", "zlib")
+        self._max_length = max_length
+        self._decompressor = self._new_decompressor()
+        self._input = b""
+        self._started = False
+        self._more = False
+
+    def _new_decompressor(self):
+        if self._codec == "gzip":
+            return zlib.decompressobj(wbits=31)
+        if self._codec == "zlib":
+            return zlib.decompressobj()
+        if self._codec == "bz2":
+            return bz2.BZ2Decompressor()
+        return lzma.LZMADecompressor()
+
+    def feed(self, data: bytes) -> None:
+        """Adds compressed data."""
+        self._input += data
+        self._more = True
+
+    def step(self) -> bytes:
+        """Returns the next chunk of decompressed data."""
+
+        decompressor = self._decompressor
+        try:
+            output = decompressor.decompress(self._input, self._max_length)
+        except (zlib.error, OSError, EOFError, lzma.LZMAError) as e:
+            raise FormatError(f"{self._codec} decompression error: {e}") from e
+
+        if self._zlib:
+            self._input = decompressor.unconsumed_tail
+            self._more = bool(self._input) or len(output) == self._max_length
+        else:
+            self._input = b""
+            self._more = not decompressor.needs_input and not decompressor.eof
+        self._started = True
+
+        if decompressor.eof:
+            # Start over for the next concatenated stream, if any
+            self._input = decompressor.unused_data + self._input
+            self._decompressor = self._new_decompressor()
+            self._started = False
+            self._more = bool(self._input)
+
+        return output
+
+    @property
+    def has_output(self) -> bool:
+        """Returns True if step might return more data without more input."""
+        return self._more
+
+    @property
+    def finished(self) -> bool:
+        """Returns True if all the data fed so far formed complete compressed streams."""
+        return not self._started and not self._input
+
+
+async def _pump(
+        source: asyncio.StreamReader,
+        target: asyncio.StreamReader,
+        transport: FeedTransport,
+        codec: str,
+        chunk_size: int,
+        max_length: int,
+        in_thread: bool,
+        ) -> None:
+    """Reads compressed data from source and feeds decompressed data to target."""
+
+    loop = asyncio.get_running_loop()
+    decompressor = None if codec == "auto" else Decompressor(codec, max_length)
+    passthrough = False
+    head = b""
+    while True:
+        data = await source.read(chunk_size)
+
+        if decompressor is None and not passthrough:
+            head += data
+            if data and len(head) < 6:  # Not enough data to detect the codec yet
+                continue
+            detected = detect_codec(head)
+            logger.info(f"decompress_stream(): detected codec is {detected}.")
+            if detected is None:
+                passthrough = True
+            else:
+                decompressor = Decompressor(detected, max_length)
+            data, head = head, b""
+
+        if len(data) == 0:  # EOF reached
+            break
+
+        if passthrough:
+            await transport.wait_resumed()
+            target.feed_data(data)
+            continue
+
+        decompressor.feed(data)
+        while decompressor.has_output:
+            if in_thread:
+                output = await loop.run_in_executor(None, decompressor.step)
+            else:
+                output = decompressor.step()
+            if output:
+                await transport.wait_resumed()
+                target.feed_data(output)
+
+    if decompressor is not None and not decompressor.finished:
+        raise IncompleteDataError("Compressed stream is truncated.")
+
+    target.feed_eof()
+
+
+def decompress_stream(
+        source: asyncio.StreamReader,
+        codec: str = "auto",
+        chunk_size: int = 65536,
+        max_length: int = 2 ** 18,
+        in_thread: bool = False,
+        limit: Optional[int] = None,
+        ) -> Tuple[asyncio.StreamReader, FeedTransport]:
+    """Returns a StreamReader of decompressed data read from source, along with its
+    transport, which should be closed when the reader is no longer needed.
+    codec is one of CODECS or "auto" to detect it by magic bytes (data which does
+    not look compressed is passed as is). Compressed data is read in chunks of
+    chunk_size bytes and decompressed in chunks of at most max_length bytes, in
+    a worker thread if in_thread is True. Decompression is suspended while the
+    returned reader holds more than twice its limit. Decompression errors are
+    raised by the returned reader as FormatError, a truncated stream as IncompleteDataError.
+    """
+
+    logger.info("decompress_stream() invoked.")
+
+    if codec != "auto" and codec not in CODECS:
+        raise ValueError(f"Unknown compression codec: {codec!r}.")
+
+    reader, transport = create_fed_reader(limit)
+
+    async def _run() -> None:
+        try:
+            await _pump(source, reader, transport, codec, chunk_size, max_length, in_thread)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            reader.set_exception(e)
+
+    transport.attach(asyncio.ensure_future(_run()))
+
+    return reader, transport
@@ -21,3 +21,8 @@ class FormatError(InputError):
 class IncompleteDataError(InputError):
     """Raised when data is incomplete and cannot be parsed."""
     pass
+
+
+class ErrorRateExceededError(ParserError):
+    """Raised when the share of input which failed to parse exceeds the limit of parser."""
+    pass
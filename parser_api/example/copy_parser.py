@@ -13,5 +13,5 @@ class CopyParser(BaseParser):
             line: str,
             ) -> None:
         """Parses a single line of data."""
-        await self._result_callback([line])
+        await self._emit_results([line])
 
@@ -1,8 +1,8 @@
-import asyncio
 import logging
 import sys
 
 from parser_api.base_parser import BaseParser
+from parser_api import runner
 from parser_api.pipe_reader import get_stream_reader
 
 logger = logging.getLogger(__name__)
@@ -23,7 +23,7 @@ class PrinterParser(BaseParser):
             line: str,
             ) -> None:
         """Parses a single line of data."""
-        await self._result_callback([line])
+        await self._emit_results([line])
 
 
 if __name__ == "__main__":
@@ -41,4 +41,4 @@ if __name__ == "__main__":
     else:
         src = None
 
-    asyncio.run(main(src))
+    runner.run(main(src))
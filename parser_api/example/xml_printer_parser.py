@@ -1,9 +1,9 @@
-import asyncio
 import logging
 import sys
 from xml.etree import ElementTree
 
 from parser_api.xml_base_parser import XmlBaseParser
+from parser_api import runner
 from parser_api.pipe_reader import get_stream_reader
 
 logger = logging.getLogger(__name__)
@@ -25,7 +25,7 @@ class XmlPrinterParser(XmlBaseParser):
             element: ElementTree.Element,
             ) -> None:
         """Parses a single line of data."""
-        await self._result_callback([element])
+        await self._emit_results([element])
 
 
 if __name__ == "__main__":
@@ -43,4 +43,4 @@ if __name__ == "__main__":
     else:
         src = None
 
-    asyncio.run(main(src))
+    runner.run(main(src))
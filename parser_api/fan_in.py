@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+import asyncio
+import functools
+import logging
+from typing import List, Callable, Awaitable, Any, Optional, Iterable, Dict
+
+from parser_api.base_parser import BaseParser
+
+logger = logging.getLogger(__name__)
+
+
+async def parse_fifos(
+        parser_factory: Callable[[Callable[[List[Any]], Awaitable[None]]], BaseParser],
+        fifo_paths: Iterable[str],
+        result_callback: Callable[[str, List[Any]], Awaitable[None]],
+        encoding: str = "utf-8",
+        nowait: bool = True,
+        chunk_size: Optional[int] = None,
+        max_active: Optional[int] = None,
+        reconnect: bool = False,
+        limit: Optional[int] = None,
+        overflow: str = "error",
+        compression: Optional[str] = None,
+        decompress_in_thread: bool = False,
+        ) -> Dict[str, BaseParser]:
+    """Parses many named pipes concurrently on the running event loop.
+    Each pipe gets its own parser created by parser_factory, which is called
+    with a result callback, e.g. a BaseParser subclass. Results are passed to
+    result_callback along with the path of the pipe they came from.
+    At most max_active pipes are open and parsed at once, if set.
+    The other arguments are passed to BaseParser.parse_fifo for every pipe.
+    Returns parsers by pipe path. If parsing of any pipe fails, the others are cancelled.
+    """
+
+    logger.info("parse_fifos() invoked.")
+
+    semaphore = asyncio.Semaphore(max_active) if max_active else None
+    options = {
+        "limit": limit,
+        "overflow": overflow,
+        "compression": compression,
+        "decompress_in_thread": decompress_in_thread,
+        "reconnect": reconnect,
+        }
+    parsers = {
+        path: parser_factory(functools.partial(result_callback, path))
+        for path in fifo_paths
+        }
+
+    async def _parse_fifo(path: str, parser: BaseParser) -> None:
+        if semaphore is None:
+            await parser.parse_fifo(path, encoding, nowait, chunk_size, **options)
+            return
+        async with semaphore:
+            await parser.parse_fifo(path, encoding, nowait, chunk_size, **options)
+
+    tasks = [asyncio.ensure_future(_parse_fifo(path, parser)) for path, parser in parsers.items()]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    logger.info("parse_fifos() finished.")
+
+    return parsers
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+import asyncio
+import collections
+import json
+import logging
+import time
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyHistogram:
+    """Histogram of durations in nanoseconds, with power-of-two buckets."""
+
+    __slots__ = ("buckets", "count", "total_ns", "max_ns")
+
+    def __init__(self):
+        self.buckets = [0] * 64
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def add(self, duration_ns: int) -> None:
+        """Adds a duration to the histogram."""
+        self.buckets[duration_ns.bit_length()] += 1
+        self.count += 1
+        self.total_ns += duration_ns
+        if duration_ns > self.max_ns:
+            self.max_ns = duration_ns
+
+    def percentile(self, fraction: float) -> int:
+        """Returns upper bound (in nanoseconds) of the bucket holding the given fraction of durations."""
+        threshold = fraction * self.count
+        seen = 0
+        for bits, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= threshold:
+                return min((1 << bits) - 1, self.max_ns)
+        return self.max_ns
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns summary of the histogram, durations are in seconds."""
+        return {
+            "count": self.count,
+            "total": self.total_ns / 1e9,
+            "mean": self.total_ns / self.count / 1e9 if self.count else 0.0,
+            "p50": self.percentile(0.5) / 1e9,
+            "p99": self.percentile(0.99) / 1e9,
+            "max": self.max_ns / 1e9,
+            }
+
+
+class ParserMetrics:
+    """Counters and per-stage latency histograms of a parser.
+    Passed to BaseParser as metrics argument, which then updates it while parsing.
+    Stages are: read (waiting for data from the pipe), decode, parse (including
+    delivery of results emitted while parsing) and callback (result_callback).
+    """
+
+    STAGES = ("read", "decode", "parse", "callback")
+
+    def __init__(self):
+        self.started = time.time()
+        self.bytes_read = 0
+        self.lines_parsed = 0
+        self.records_emitted = 0
+        self.eofs = 0
+        self.overflows = 0
+        self.reconnects = 0
+        self.errors = collections.Counter()
+        self.read_latency = LatencyHistogram()
+        self.decode_latency = LatencyHistogram()
+        self.parse_latency = LatencyHistogram()
+        self.callback_latency = LatencyHistogram()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns current values of all the metrics."""
+        now = time.time()
+        return {
+            "time": now,
+            "uptime": now - self.started,
+            "bytes_read": self.bytes_read,
+            "lines_parsed": self.lines_parsed,
+            "records_emitted": self.records_emitted,
+            "eofs": self.eofs,
+            "overflows": self.overflows,
+            "reconnects": self.reconnects,
+            "errors": dict(self.errors),
+            "latency": {
+                stage: getattr(self, f"{stage}_latency").snapshot()
+                for stage in self.STAGES
+                },
+            }
+
+    async def dump_periodically(
+            self,
+            interval: float,
+            path: Optional[str] = None,
+            target_logger: Optional[logging.Logger] = None,
+            ) -> None:
+        """Dumps a snapshot every interval seconds until cancelled.
+        Snapshots are appended as JSON lines to the file at path if given,
+        otherwise logged at INFO level to target_logger (this module's logger by default).
+        """
+        target_logger = target_logger or logger
+        while True:
+            await asyncio.sleep(interval)
+            snapshot = json.dumps(self.snapshot())
+            if path:
+                with open(path, "a") as file:
+                    file.write(snapshot + "\n")
+            else:
+                target_logger.info(f"parser metrics: {snapshot}")
+
+
+class QueueStats:
+    """Occupancy statistics of a bounded queue, sampled before every put."""
+
+    __slots__ = ("maxsize", "samples", "total", "peak", "full")
+
+    def __init__(self):
+        self.maxsize = 0
+        self.samples = 0
+        self.total = 0
+        self.peak = 0
+        self.full = 0
+
+    def sample(self, queue: asyncio.Queue) -> None:
+        """Records current occupancy of the queue."""
+        size = queue.qsize()
+        self.maxsize = queue.maxsize
+        self.samples += 1
+        self.total += size
+        if size > self.peak:
+            self.peak = size
+        if queue.full():
+            self.full += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns summary of the statistics. full is the fraction of puts which had to
+        wait for the consumer.
+        """
+        return {
+            "maxsize": self.maxsize,
+            "mean": self.total / self.samples if self.samples else 0.0,
+            "peak": self.peak,
+            "full": self.full / self.samples if self.samples else 0.0,
+            }
+
+
+class PipelineStats:
+    """Queue occupancy statistics of BaseParser.parse_pipelined."""
+
+    def __init__(self):
+        self.chunks = QueueStats()
+        self.results = QueueStats()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns statistics of the chunk and result queues."""
+        return {
+            "chunks": self.chunks.snapshot(),
+            "results": self.results.snapshot(),
+            }
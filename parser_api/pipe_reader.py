@@ -1,23 +1,101 @@
 #!/usr/bin/env python3
 import logging
-from typing import Tuple
+from typing import Tuple, Optional
 import asyncio
-from asyncio import StreamReader, ReadTransport
+from asyncio import StreamReader, StreamWriter, ReadTransport
 
 logger = logging.getLogger(__name__)
 
 
-async def get_stream_reader(pipe) -> Tuple[StreamReader, ReadTransport]:
-    """Creates asyncio StreamReader object for a given file-like object."""
+async def get_stream_reader(pipe, limit: Optional[int] = None) -> Tuple[StreamReader, ReadTransport]:
+    """Creates asyncio StreamReader object for a given file-like object.
+    limit sets buffer limit of the reader (64 KiB by default), which is also
+    the maximum length of a line returned by readline.
+    """
 
     logger.info("get_stream_reader invoked")
     logger.debug(f"for pipe = {pipe}.")
 
     loop = asyncio.get_event_loop()
-    reader = asyncio.StreamReader(loop=loop)
+    if limit is None:
+        reader = asyncio.StreamReader(loop=loop)
+    else:
+        reader = asyncio.StreamReader(limit=limit, loop=loop)
     protocol = asyncio.StreamReaderProtocol(reader)
     transport, _ = await loop.connect_read_pipe(lambda: protocol, pipe)
 
     logger.debug(f"reader = {reader}.")
 
     return reader, transport
+
+
+async def get_stream_writer(pipe) -> StreamWriter:
+    """Creates asyncio StreamWriter object for a given file-like object (a pipe,
+    a socket or a character device). Its drain method waits while the pipe is full.
+    """
+
+    logger.info("get_stream_writer invoked")
+    logger.debug(f"for pipe = {pipe}.")
+
+    loop = asyncio.get_event_loop()
+    protocol = asyncio.StreamReaderProtocol(asyncio.StreamReader(loop=loop))
+    transport, _ = await loop.connect_write_pipe(lambda: protocol, pipe)
+    writer = StreamWriter(transport, protocol, None, loop)
+
+    logger.debug(f"writer = {writer}.")
+
+    return writer
+
+
+class FeedTransport(asyncio.ReadTransport):
+    """Read transport for a StreamReader fed by a coroutine rather than by a pipe.
+    When the reader pauses the transport (its buffer exceeds twice its limit),
+    the feeding coroutine is suspended in wait_resumed until the reader drains the buffer.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._resumed = asyncio.Event()
+        self._resumed.set()
+        self._closing = False
+        self._task = None
+
+    def attach(self, task: asyncio.Task) -> None:
+        """Attaches the feeding task, to be cancelled when the transport is closed."""
+        self._task = task
+
+    async def wait_resumed(self) -> None:
+        """Waits until the reader is ready to accept more data."""
+        await self._resumed.wait()
+
+    def pause_reading(self) -> None:
+        self._resumed.clear()
+
+    def resume_reading(self) -> None:
+        self._resumed.set()
+
+    def is_reading(self) -> bool:
+        return self._resumed.is_set()
+
+    def close(self) -> None:
+        self._closing = True
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    def is_closing(self) -> bool:
+        return self._closing
+
+
+def create_fed_reader(limit: Optional[int] = None) -> Tuple[StreamReader, FeedTransport]:
+    """Creates asyncio StreamReader object to be fed by a coroutine via feed_data,
+    along with its flow control transport.
+    """
+
+    if limit is None:
+        reader = asyncio.StreamReader()
+    else:
+        reader = asyncio.StreamReader(limit=limit)
+    transport = FeedTransport()
+    reader.set_transport(transport)
+
+    return reader, transport
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+import asyncio
+import collections
+import logging
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Callable, Awaitable, Any, Optional, Tuple
+
+from parser_api.base_parser import BaseParser, Position, RESUME_HEAD_SIZE, _file_ranges, read_checkpoint
+from parser_api.error import InputError
+
+logger = logging.getLogger(__name__)
+
+# Parser instance, collected results and input errors of a worker process
+_worker_parser = None
+_worker_results = []
+_worker_errors = []
+_worker_loop = None
+
+# Result of a worker call: emitted results, number of lines and input errors
+# (error, data, offset, line), offsets and lines relative to the input of the call
+_CallResult = Tuple[List[Any], int, List[Tuple[InputError, bytes, int, int]]]
+
+
+async def _collect_results(items: List[Any]) -> None:
+    """Result callback of worker parsers."""
+    _worker_results.extend(items)
+
+
+async def _collect_input_error(
+        error: InputError,
+        data: bytes,
+        offset: Optional[int],
+        line: Optional[int],
+        ) -> None:
+    """Input error handler of worker parsers, keeps errors to be handled by ProcessPoolParser."""
+    _worker_errors.append((error, data, offset, line))
+    await _worker_parser._on_input_error(error)
+
+
+def _init_worker(parser_factory: Callable[..., BaseParser]) -> None:
+    """Creates parser instance of a worker process."""
+    global _worker_parser, _worker_loop
+    _worker_loop = asyncio.new_event_loop()
+    _worker_parser = parser_factory(_collect_results)
+    _worker_parser._handle_input_error = _collect_input_error
+
+
+async def _parse_batch_async(lines: List[str], encoding: str) -> int:
+    """Passes a batch of lines to the worker parser and flushes its results."""
+    await _worker_parser._parse_batch(lines, encoding, 0, 0)
+    await _worker_parser._flush_results()
+    return len(lines)
+
+
+def _parse_batch(lines: List[str], encoding: str) -> _CallResult:
+    """Parses a batch of lines in a worker process, see _run."""
+    return _run(_parse_batch_async(lines, encoding))
+
+
+async def _parse_range_async(path: str, start: int, end: int, encoding: str) -> int:
+    """Passes a range of a file to the worker parser and flushes its results."""
+    with open(path, "rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            count = await _worker_parser._parse_mapped_range(data, start, end, encoding)
+    await _worker_parser._flush_results()
+    _worker_errors[:] = [(error, data, offset - start, line) for error, data, offset, line in _worker_errors]
+    return count
+
+
+def _parse_range(path: str, start: int, end: int, encoding: str) -> _CallResult:
+    """Parses a range of a file in a worker process, see _run."""
+    return _run(_parse_range_async(path, start, end, encoding))
+
+
+def _run(call: Awaitable[int]) -> _CallResult:
+    """Runs a call in a worker process, returns results it emitted, its result
+    and input errors handled by the worker parser meanwhile.
+    Results of a failed call, emitted or buffered by the worker parser, are dropped.
+    """
+    try:
+        count = _worker_loop.run_until_complete(call)
+        return list(_worker_results), count, list(_worker_errors)
+    except BaseException:
+        _worker_parser._results = []
+        _worker_parser._results_bytes = 0
+        raise
+    finally:
+        _worker_results.clear()
+        _worker_errors.clear()
+
+
+class ProcessPoolParser(BaseParser):
+    """A parser which distributes batches of lines to parsers running in a pool
+    of worker processes. Each worker holds its own parser instance created by
+    parser_factory, which is called with a result callback, e.g. a BaseParser
+    subclass. Results are passed to result_callback in input order.
+
+    Lines are parsed independently by different workers, so this is only suitable
+    for parsers which keep no state between lines. Worker parsers never receive
+    _on_eof. parser_factory must be picklable.
+
+    If checkpoints are tracked, input of a batch (or range of a file) is marked
+    as parsed once results of the batch are due, so checkpoint never passes
+    results pending in the pool.
+
+    Input errors raised by worker parsers are handled by this parser according
+    to its error policy, once results of their batch are due, for each failed
+    line, or for the whole batch if the worker parser overrides _parse_lines
+    (see BaseParser._parse_batch). Offsets of the failed lines are only known if
+    checkpoints are tracked or the policy is not "abort".
+    """
+
+    def __init__(
+            self,
+            parser_factory: Callable[[Callable[[List[Any]], Awaitable[None]]], BaseParser],
+            result_callback: Callable[[List[Any]], Awaitable[None]],
+            workers: Optional[int] = None,
+            lines_per_batch: int = 1000,
+            max_in_flight: Optional[int] = None,
+            **kwargs,
+            ):
+        """Lines are sent to workers in batches of lines_per_batch lines, which is also
+        the unit of input errors of worker parsers overriding _parse_lines. workers defaults to the number of CPUs, max_in_flight (the number of
+        batches submitted to the pool but not yet delivered) to twice the number
+        of workers. When max_in_flight batches are pending, reading is suspended
+        until the oldest one is parsed. Other keyword arguments are passed to BaseParser.
+        """
+        super().__init__(result_callback, **kwargs)
+        self._parser_factory = parser_factory
+        self._workers = workers or os.cpu_count()
+        self._lines_per_batch = lines_per_batch
+        self._max_in_flight = max_in_flight or 2 * self._workers
+        self._executor = None
+        self._batch = []
+        self._in_flight = collections.deque()  # (future, end offset, size of a file range) of each call
+        self._encoding = "utf-8"
+        self._offsets = self._checkpoints or self._error_policy != "abort"  # Whether offsets are tracked
+        self._submitted = 0  # Stream offset of the current batch, if offsets are tracked
+        self._collected = Position(0, 0)  # Position of the next call to collect
+        self._handled_error = None
+
+    async def _parse_line(self, line: str) -> None:
+        """Adds a line to the current batch."""
+        self._batch.append(line)
+        if len(self._batch) >= self._lines_per_batch:
+            batch = self._batch
+            self._batch = []
+            await self._submit(batch)
+
+    async def _parse_lines(self, lines: List[str]) -> None:
+        """Adds lines to the current batch, submitting complete batches."""
+        batch = self._batch
+        batch.extend(lines)
+        size = self._lines_per_batch
+        full = len(batch) - len(batch) % size
+        self._batch = batch[full:]
+        for start in range(0, full, size):
+            await self._submit(batch[start:start + size])
+
+    def _mark_parsed(self, offset: int, line: int) -> None:
+        """Does nothing: input is marked as parsed by _collect, once results of its batch are due."""
+        pass
+
+    def _start_at(self, position: Position) -> None:
+        """Sets offsets of the batches to the position parsing starts from."""
+        super()._start_at(position)
+        self._submitted = position.offset
+        self._collected = position
+
+    async def parse_stream(
+            self,
+            pipe: asyncio.StreamReader,
+            encoding: str = "utf-8",
+            *args,
+            **kwargs,
+            ) -> None:
+        """Keeps encoding of the stream for offsets of the batches, see BaseParser.parse_stream."""
+        self._encoding = encoding
+        await super().parse_stream(pipe, encoding, *args, **kwargs)
+
+    async def _parse_batch(
+            self,
+            lines: List[str],
+            encoding: str,
+            offset: int,
+            number: int,
+            ) -> None:
+        """Keeps encoding of the stream for offsets of the batches in chunked
+        and pipelined modes, see BaseParser._parse_batch.
+        """
+        self._encoding = encoding
+        await super()._parse_batch(lines, encoding, offset, number)
+
+    async def _handle_input_error(
+            self,
+            error: InputError,
+            data: bytes,
+            offset: Optional[int],
+            line: Optional[int],
+            ) -> None:
+        """Handles an input error, unless it is one of a batch handled by _collect already."""
+        if error is self._handled_error:
+            raise error
+        await super()._handle_input_error(error, data, offset, line)
+
+    async def _on_eof(self) -> None:
+        """Submits the last batch and waits for all the pending results."""
+        if self._batch:
+            batch = self._batch
+            self._batch = []
+            await self._submit(batch)
+        while self._in_flight:
+            await self._collect()
+
+    async def parse_file(
+            self,
+            path: str,
+            encoding: str = "utf-8",
+            range_size: int = 2 ** 20,
+            resume: bool = False,
+            ) -> None:
+        """Parses a regular file in parallel. Ranges of about range_size bytes,
+        split at line boundaries, are memory-mapped and parsed by the workers.
+        Results are passed to result_callback in file order. If checkpoints are
+        tracked, position is updated after every range. If resume is True, parsing
+        starts from the checkpoint saved to state_file, see BaseParser.parse_file.
+        """
+
+        logger.info("ProcessPoolParser.parse_file() invoked.")
+
+        position = Position(0, 0)
+        if resume:
+            if self._state_file is None:
+                raise ValueError("Resuming requires state_file.")
+            position = read_checkpoint(self._state_file) or position
+            logger.info(f"ProcessPoolParser.parse_file(): resuming from {position}.")
+        self._start_at(position)
+
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_size:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    if position.offset:
+                        await self._on_resume(data[:RESUME_HEAD_SIZE])
+                    ranges = list(_file_ranges(data, range_size, position.offset))
+            else:
+                ranges = []
+
+        for start, end in ranges:
+            await self._submit_call(end, end - start, _parse_range, path, start, end, encoding)
+
+        if self._metrics is not None:
+            self._metrics.eofs += 1
+        await self._on_eof()
+        await self._flush_results()
+        if self._state_file is not None:
+            self.save_checkpoint()
+
+        logger.info("ProcessPoolParser.parse_file() finished.")
+
+    async def _submit(self, lines: List[str]) -> None:
+        """Submits a batch of lines to the pool."""
+        if self._offsets:
+            self._submitted += len(self._encode_lines(lines, self._encoding))
+        await self._submit_call(self._submitted, None, _parse_batch, lines, self._encoding)
+
+    async def _submit_call(
+            self,
+            end: int,
+            size: Optional[int],
+            function: Callable[..., _CallResult],
+            *args,
+            ) -> None:
+        """Submits a call of a worker function to the pool. end is the stream offset
+        after the input of the call, size is the size of a file range, counted by
+        metrics once the call is collected.
+        """
+
+        if self._executor is None:
+            logger.info(f"ProcessPoolParser: starting {self._workers} workers.")
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._workers,
+                initializer=_init_worker,
+                initargs=(self._parser_factory,),
+                )
+
+        while len(self._in_flight) >= self._max_in_flight:
+            await self._collect()
+
+        loop = asyncio.get_running_loop()
+        self._in_flight.append((loop.run_in_executor(self._executor, function, *args), end, size))
+
+        while self._in_flight and self._in_flight[0][0].done():
+            await self._collect()
+
+    async def _collect(self) -> None:
+        """Waits for the oldest pending call, handles its input errors according to
+        the error policy and emits its results, then marks its input as parsed.
+        """
+        future, end, size = self._in_flight.popleft()
+        start = self._collected
+        results, count, errors = await future
+        self._collected = Position(end, start.line + count)
+        if size is not None and self._metrics is not None:
+            self._metrics.bytes_read += size
+            self._metrics.lines_parsed += count
+        for error, data, offset, line in errors:
+            try:
+                await self._handle_input_error(error, data, start.offset + offset, start.line + line)
+            except InputError as e:
+                self._handled_error = e  # Not to be handled again by the caller
+                raise
+        if results:
+            await self._emit_results(results)
+        if self._checkpoints:
+            super()._mark_parsed(*self._collected)
+
+    def close(self) -> None:
+        """Shuts the worker processes down."""
+        logger.info("ProcessPoolParser.close() invoked.")
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from parser_api.async_fifo import AsyncFifo
+from parser_api.metrics import ParserMetrics
+from parser_api.pipe_reader import create_fed_reader
+
+logger = logging.getLogger(__name__)
+
+
+class ReconnectingFifo:
+    """Helper class enabling async reading from a named pipe across many writers.
+    Unlike AsyncFifo, its reader does not see EOF when a writer hangs up: data of
+    consecutive writers is read as one stream, so a parser reading it keeps its
+    state (e.g. a partially parsed XML document).
+    On hangup the pipe is opened again with O_RDONLY|O_NONBLOCK, which does not
+    poll as readable until the next writer connects and writes, so waiting for
+    it takes no CPU. The new descriptor is opened before the old one is closed,
+    so the pipe always has a reader and writers never get EPIPE.
+    """
+
+    def __init__(self, metrics: Optional[ParserMetrics] = None, chunk_size: int = 65536):
+        """If metrics is set, its reconnects counter is updated too."""
+
+        self._path = None
+        self._limit = None
+        self._metrics = metrics
+        self._chunk_size = chunk_size
+        self._fifo = None
+        self._reader = None
+        self._transport = None
+        self.reconnects = 0
+        self.last_reconnect = None
+
+    async def open(self, path: str, limit: Optional[int] = None):
+        """Open source pipe for reading and start relaying its data to reader.
+        limit sets buffer limit of the StreamReader (64 KiB by default).
+        """
+
+        logger.info("ReconnectingFifo.open() invoked.")
+
+        if not self.is_closed():
+            logger.error(
+                "ReconnectingFifo.open(): Attempted to open a pipe that is already open."
+                )
+            raise RuntimeError(
+                "Attempted to open a pipe that is already open."
+                )
+
+        self._path = path
+        self._limit = limit
+        self._fifo = await AsyncFifo().open(path, allow_eof=True, limit=limit)
+        self._reader, self._transport = create_fed_reader(limit)
+        self._transport.attach(asyncio.ensure_future(self._relay()))
+
+        return self
+
+    async def _reopen(self) -> None:
+        """Replaces the pipe descriptor after a writer hangup."""
+
+        fifo = await AsyncFifo().open(self._path, allow_eof=True, limit=self._limit)
+        self._fifo.close()
+        self._fifo = fifo
+
+        self.reconnects += 1
+        self.last_reconnect = time.time()
+        if self._metrics is not None:
+            self._metrics.reconnects += 1
+        logger.debug(f"ReconnectingFifo: writer hung up, {self._path} reopened.")
+
+    async def _relay(self) -> None:
+        """Passes data from the pipe to reader, reopening the pipe on EOF."""
+
+        reader = self._reader
+        transport = self._transport
+        try:
+            while True:
+                data = await self._fifo.reader.read(self._chunk_size)
+                if len(data) == 0:  # Writer hung up
+                    await self._reopen()
+                    continue
+                await transport.wait_resumed()
+                reader.feed_data(data)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"ReconnectingFifo: failed to read from {self._path}: {e!r}.")
+            reader.set_exception(e)
+
+    def close(self):
+        """Closes the pipe and feeds EOF to reader."""
+
+        logger.info("ReconnectingFifo.close() invoked.")
+
+        if self._transport and not self._transport.is_closing():
+            self._transport.close()
+            self._reader.feed_eof()
+
+        if self._fifo:
+            self._fifo.close()
+
+    def is_closed(self):
+        """Returns True if the pipe and the relay are closed, False otherwise."""
+        return (not self._fifo or self._fifo.is_closed()) and (not self._transport or self._transport.is_closing())
+
+    def __enter__(self):
+        """Context manager entry point."""
+        logger.info("ReconnectingFifo.__enter__() invoked.")
+        return self._reader
+
+    def __exit__(self, exc_type, exc, tb):
+        """Context manager exit point."""
+        logger.info("ReconnectingFifo.__exit__() invoked.")
+        self.close()
+        return False
+
+    @property
+    def reader(self):
+        """Returns StreamReader object for the pipe."""
+        return self._reader
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+import collections
+import xml.etree.ElementTree as ElementTree
+from typing import Any, Callable, List, Mapping, Optional
+
+
+class RecordSchema:
+    """Declares a compact representation of XML records: a namedtuple type, record_type,
+    with a field for every item of fields, which maps field names to sources of their
+    values in the record element: "@name" for an attribute, "." for text of the element
+    itself, anything else for text of a child element, as a path taken by
+    Element.findtext, e.g. "price" or "price/amount". Missing values are None.
+    converters maps field names to callables applied to values which are not None,
+    e.g. int.
+    Records can be turned into columns, a namedtuple of lists (columns_type),
+    with a list of values for every field.
+    """
+
+    def __init__(
+            self,
+            fields: Mapping[str, str],
+            name: str = "Record",
+            converters: Optional[Mapping[str, Callable[[str], Any]]] = None,
+            ):
+        converters = converters or {}
+        unknown = set(converters) - set(fields)
+        if unknown:
+            raise ValueError(f"Converters given for unknown fields: {sorted(unknown)}.")
+        self.fields = tuple(fields)
+        self.record_type = collections.namedtuple(name, self.fields)
+        self.columns_type = collections.namedtuple(f"{name}Columns", self.fields)
+        self._getters = [self._getter(source, converters.get(field)) for field, source in fields.items()]
+
+    @staticmethod
+    def _getter(source: str, converter: Optional[Callable[[str], Any]]) -> Callable[[ElementTree.Element], Any]:
+        """Returns a function taking the value from its source in an element."""
+
+        if source.startswith("@"):
+            name = source[1:]
+            get = lambda element: element.get(name)
+        elif source == ".":
+            get = lambda element: element.text
+        else:
+            get = lambda element: element.findtext(source)
+        if converter is None:
+            return get
+
+        def _get_converted(element: ElementTree.Element) -> Any:
+            value = get(element)
+            return None if value is None else converter(value)
+
+        return _get_converted
+
+    def project(self, element: ElementTree.Element) -> tuple:
+        """Returns a record of record_type with values taken from element."""
+        return self.record_type._make([get(element) for get in self._getters])
+
+    def columns(self, records: List[tuple]) -> tuple:
+        """Returns columns of columns_type with values of the records."""
+        if not records:
+            return self.columns_type._make([] for _ in self.fields)
+        return self.columns_type._make(map(list, zip(*records)))
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Event loop selection for entry points.
+
+parse_stream awaits readline, _parse_line and the result callback for every line,
+so its throughput depends on the event loop much. uvloop is used when installed,
+the standard asyncio loop otherwise:
+
+    from parser_api import runner
+    runner.run(main())
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+logger = logging.getLogger(__name__)
+
+# Loop name -> event loop policy factory, in order of preference
+LOOPS: Dict[str, Callable[[], asyncio.AbstractEventLoopPolicy]] = {}
+if uvloop is not None:
+    LOOPS["uvloop"] = uvloop.EventLoopPolicy
+LOOPS["asyncio"] = asyncio.DefaultEventLoopPolicy
+
+_selected: Optional[str] = None
+
+
+def available_loops() -> List[str]:
+    """Returns names of the event loops available, the fastest first."""
+    return list(LOOPS)
+
+
+def _resolve(name: str) -> str:
+    """Returns name of an available loop, raises ValueError if there is none such."""
+    if name == "auto":
+        return next(iter(LOOPS))
+    if name not in LOOPS:
+        raise ValueError(f"Event loop {name!r} is not available, available are {available_loops()}.")
+    return name
+
+
+def select_loop(name: str = "auto") -> str:
+    """Installs event loop policy of the given loop ("auto" for the fastest available)
+    unless it is installed already, returns name of the loop.
+    """
+
+    name = _resolve(name)
+    global _selected
+    if name != _selected:
+        logger.info(f"select_loop(): using {name} event loop.")
+        asyncio.set_event_loop_policy(LOOPS[name]())
+        _selected = name
+    return name
+
+
+def selected_loop() -> Optional[str]:
+    """Returns name of the loop installed by select_loop, None if none is."""
+    return _selected
+
+
+def new_event_loop(name: str = "auto") -> asyncio.AbstractEventLoop:
+    """Returns a new event loop of the given loop without installing its policy."""
+    return LOOPS[_resolve(name)]().new_event_loop()
+
+
+def run(main: Awaitable[Any], loop: str = "auto", debug: Optional[bool] = None) -> Any:
+    """Runs main coroutine like asyncio.run, on the given event loop."""
+    select_loop(loop)
+    return asyncio.run(main, debug=debug)
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+import asyncio
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import pickle
+from typing import List, Callable, Awaitable, Any, Optional
+
+from parser_api import runner
+from parser_api.base_parser import BaseParser
+from parser_api.error import ParserError, IncompleteDataError
+from parser_api.pipe_reader import get_stream_reader, get_stream_writer
+
+logger = logging.getLogger(__name__)
+
+_HEADER_SIZE = 8  # Size of a result message length prefix
+
+
+async def _run_shard_async(
+        parser_factory: Callable[[Callable[[List[Any]], Awaitable[None]]], BaseParser],
+        input_fd: int,
+        output_fd: int,
+        encoding: str,
+        chunk_size: int,
+        result_batch: int,
+        ) -> None:
+    """Parses lines from input_fd, writing pickled lists of results to output_fd."""
+
+    output = await get_stream_writer(os.fdopen(output_fd, "wb"))
+    results = []
+
+    async def _flush() -> None:
+        nonlocal results
+        if results:
+            data = pickle.dumps(results, pickle.HIGHEST_PROTOCOL)
+            results = []
+            output.write(len(data).to_bytes(_HEADER_SIZE, "little") + data)
+            await output.drain()
+
+    async def _collect(items: List[Any]) -> None:
+        results.extend(items)
+        if len(results) >= result_batch:
+            await _flush()
+
+    parser = parser_factory(_collect)
+    with os.fdopen(input_fd, "rb") as pipe:
+        reader, transport = await get_stream_reader(pipe)
+        try:
+            await parser.parse_stream(reader, encoding, chunk_size)
+        finally:
+            transport.close()
+    await _flush()
+    output.close()
+    await output.wait_closed()
+
+
+def _run_shard(
+        parser_factory: Callable[[Callable[[List[Any]], Awaitable[None]]], BaseParser],
+        lines: multiprocessing.connection.Connection,
+        results: multiprocessing.connection.Connection,
+        encoding: str,
+        chunk_size: int,
+        result_batch: int,
+        ) -> None:
+    """Entry point of a shard worker process."""
+    input_fd = os.dup(lines.fileno())
+    lines.close()
+    output_fd = os.dup(results.fileno())
+    results.close()
+    runner.run(_run_shard_async(parser_factory, input_fd, output_fd, encoding, chunk_size, result_batch))
+
+
+class _Shard:
+    """A shard worker process and the front ends of its pipes."""
+
+    __slots__ = ("index", "process", "writer", "transport", "receiver")
+
+    def __init__(self, index: int, process: multiprocessing.Process):
+        self.index = index
+        self.process = process
+        self.writer = None
+        self.transport = None
+        self.receiver = None
+
+
+class ShardedParser(BaseParser):
+    """A parser which routes complete lines to parsers running in shard worker
+    processes, one per shard, each created by parser_factory, which is called with
+    a result callback, e.g. a BaseParser subclass.
+
+    Lines go to the shards as raw bytes over pipes, in blocks: with key set, a line
+    goes to shard hash(key(line)) % shards, so lines of the same key are parsed by
+    the same parser in input order; otherwise every block of lines passed to
+    _parse_lines (every line in line mode) goes to the next shard in turn. Use
+    chunked mode (chunk_size) of the parse methods for throughput.
+
+    Workers send results back in pickled lists of up to result_batch items. They
+    are passed to result_callback, in no particular order between shards, or to
+    shard_callbacks[i] for shard i if shard_callbacks is given. Writing to a shard
+    waits while its pipe is full, so reading follows the slowest shard.
+
+    Worker processes are started with the spawn method, so that each holds its own
+    pipes only, and parser_factory must be picklable. They are started on the first
+    lines and stopped at EOF. Worker parsers never receive _on_eof.
+    """
+
+    _bytes_input = True
+
+    def __init__(
+            self,
+            parser_factory: Callable[[Callable[[List[Any]], Awaitable[None]]], BaseParser],
+            result_callback: Optional[Callable[[List[Any]], Awaitable[None]]],
+            shards: Optional[int] = None,
+            key: Optional[Callable[[bytes], Any]] = None,
+            shard_callbacks: Optional[List[Callable[[List[Any]], Awaitable[None]]]] = None,
+            encoding: str = "utf-8",
+            chunk_size: int = 65536,
+            result_batch: int = 1000,
+            **kwargs,
+            ):
+        """shards defaults to the number of CPUs. encoding and chunk_size are used
+        by worker parsers. Other keyword arguments are passed to BaseParser, except
+        checkpoints and state_file: results are not delivered in input order, so
+        there is no position of the input all results of which are delivered, and
+        errors other than "abort" and error_sink: input errors are raised in worker
+        processes, where they stop the worker and so fail parsing.
+        """
+        if kwargs.get("checkpoints") or kwargs.get("state_file") is not None:
+            raise ValueError("ShardedParser does not track checkpoints.")
+        if kwargs.get("errors", "abort") != "abort" or kwargs.get("error_sink") is not None:
+            raise ValueError("ShardedParser only supports the abort error policy.")
+        super().__init__(result_callback, **kwargs)
+        self._parser_factory = parser_factory
+        self._shard_count = shards or os.cpu_count()
+        if shard_callbacks is not None and len(shard_callbacks) != self._shard_count:
+            raise ValueError("shard_callbacks should have a callback for every shard.")
+        self._key = key
+        self._shard_callbacks = shard_callbacks
+        self._encoding = encoding
+        self._chunk_size = chunk_size
+        self._result_batch = result_batch
+        self._shards: Optional[List[_Shard]] = None
+        self._next = 0
+
+    async def _start(self) -> None:
+        """Starts the shard worker processes."""
+
+        logger.info(f"ShardedParser: starting {self._shard_count} shards.")
+
+        context = multiprocessing.get_context("spawn")
+        shards = []
+        for index in range(self._shard_count):
+            lines_read, lines_write = context.Pipe(duplex=False)
+            results_read, results_write = context.Pipe(duplex=False)
+            process = context.Process(
+                target=_run_shard,
+                args=(
+                    self._parser_factory, lines_read, results_write,
+                    self._encoding, self._chunk_size, self._result_batch,
+                    ),
+                name=f"shard-{index}",
+                daemon=True,
+                )
+            process.start()
+            lines_read.close()
+            results_write.close()
+
+            shard = _Shard(index, process)
+            shard.writer = await get_stream_writer(os.fdopen(os.dup(lines_write.fileno()), "wb"))
+            lines_write.close()
+            reader, shard.transport = await get_stream_reader(os.fdopen(os.dup(results_read.fileno()), "rb"))
+            results_read.close()
+            shard.receiver = asyncio.ensure_future(self._receive(index, reader))
+            shards.append(shard)
+        self._shards = shards
+
+    async def _receive(self, index: int, reader: asyncio.StreamReader) -> None:
+        """Passes results of a shard to the callback until the shard closes its pipe."""
+
+        callback = self._shard_callbacks[index] if self._shard_callbacks else self._emit_results
+        while True:
+            try:
+                header = await reader.readexactly(_HEADER_SIZE)
+            except asyncio.IncompleteReadError as e:
+                if e.partial:
+                    raise IncompleteDataError(f"Shard {index} sent an incomplete message.") from e
+                break
+            data = await reader.readexactly(int.from_bytes(header, "little"))
+            await callback(pickle.loads(data))
+
+    async def _send(self, shard: _Shard, data: bytes) -> None:
+        """Writes lines to a shard, waiting while its pipe is full."""
+        if shard.receiver.done():
+            shard.receiver.result()  # Re-raises an error of the shard results, if any
+        try:
+            shard.writer.write(data)
+            await shard.writer.drain()
+        except (BrokenPipeError, ConnectionResetError) as e:
+            raise ParserError(f"Shard {shard.index} worker is gone.") from e
+
+    async def _parse_line(self, line: bytes) -> None:
+        """Routes a single line to a shard."""
+        await self._parse_lines([line])
+
+    async def _parse_lines(self, lines: List[bytes]) -> None:
+        """Routes a batch of lines to the shards."""
+
+        if self._shards is None:
+            await self._start()
+        shards = self._shards
+
+        if self._key is None:
+            shard = shards[self._next]
+            self._next = (self._next + 1) % len(shards)
+            await self._send(shard, b"".join(lines))
+            return
+
+        key = self._key
+        count = len(shards)
+        routed = [[] for _ in range(count)]
+        for line in lines:
+            routed[hash(key(line)) % count].append(line)
+        for shard, shard_lines in zip(shards, routed):
+            if shard_lines:
+                await self._send(shard, b"".join(shard_lines))
+
+    async def _on_eof(self) -> None:
+        """Closes the shard pipes, waits for all the results and for the workers to exit."""
+
+        shards = self._shards
+        if shards is None:
+            return
+        self._shards = None
+        self._next = 0
+
+        for shard in shards:
+            shard.writer.close()
+        try:
+            for shard in shards:
+                await shard.receiver
+        finally:
+            for shard in shards:
+                shard.transport.close()
+
+        loop = asyncio.get_running_loop()
+        for shard in shards:
+            await loop.run_in_executor(None, shard.process.join)
+            if shard.process.exitcode:
+                raise ParserError(f"Shard {shard.index} worker exited with code {shard.process.exitcode}.")
+
+        logger.info("ShardedParser: shards stopped.")
+
+    def close(self) -> None:
+        """Stops the shard worker processes, if any are running."""
+
+        logger.info("ShardedParser.close() invoked.")
+
+        shards = self._shards
+        if shards is None:
+            return
+        self._shards = None
+        for shard in shards:
+            shard.receiver.cancel()
+            shard.writer.close()
+            shard.transport.close()
+            shard.process.terminate()
+            shard.process.join()
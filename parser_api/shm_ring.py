@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+
+import asyncio
+import logging
+import os
+import select
+import tempfile
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional, Tuple
+
+from parser_api.pipe_reader import create_fed_reader
+
+logger = logging.getLogger(__name__)
+
+_HEADER_SIZE = 64  # Size of the ring header preceding the data
+# Indexes of the header fields, unsigned 64-bit integers
+_WRITTEN, _READ, _CLOSED, _READER_WAITING, _WRITER_WAITING, _CAPACITY = range(6)
+_WAKEUP_TIMEOUT = 0.1  # Seconds to wait for a wakeup before checking the ring again
+
+
+def _wakeup_paths(name: str, fifo_dir: Optional[str]) -> Tuple[str, str]:
+    """Returns paths of the data and the space wakeup pipes of a ring."""
+    fifo_dir = fifo_dir or tempfile.gettempdir()
+    return os.path.join(fifo_dir, f"{name}.data"), os.path.join(fifo_dir, f"{name}.space")
+
+
+def _open_wakeup(path: str) -> int:
+    """Opens a wakeup pipe for both reading and writing, so that neither blocks
+    on open nor sees EOF.
+    """
+    return os.open(path, os.O_RDWR | os.O_NONBLOCK)
+
+
+def _wake(fd: int) -> None:
+    """Writes a wakeup to a pipe."""
+    try:
+        os.write(fd, b"\0")
+    except BlockingIOError:  # The pipe is full of wakeups already
+        pass
+
+
+def _clear_wakeups(fd: int) -> None:
+    """Reads all the pending wakeups from a pipe."""
+    try:
+        while os.read(fd, 4096):
+            pass
+    except BlockingIOError:
+        pass
+
+
+class _Ring:
+    """A single-producer/single-consumer byte ring in a shared memory segment.
+    The header holds running totals of bytes written and read, each updated by
+    its own side only, so the ring holds written - read bytes.
+    """
+
+    def __init__(self, shm: SharedMemory, capacity: Optional[int] = None):
+        self.shm = shm
+        self.header = shm.buf[:_HEADER_SIZE].cast("Q")
+        if capacity is not None:
+            self.header[_CAPACITY] = capacity
+        self.capacity = self.header[_CAPACITY]
+        self.data = shm.buf[_HEADER_SIZE:_HEADER_SIZE + self.capacity]
+
+    def read_into(self, reader: asyncio.StreamReader, size: int) -> int:
+        """Feeds up to size bytes to reader straight from the ring, returns the
+        number of bytes read, 0 if the ring is empty.
+        """
+
+        header = self.header
+        start = header[_READ]
+        size = min(size, header[_WRITTEN] - start)
+        if size <= 0:
+            return 0
+        offset = start % self.capacity
+        end = offset + size
+        if end <= self.capacity:
+            with self.data[offset:end] as data:
+                reader.feed_data(data)
+        else:
+            with self.data[offset:] as data:
+                reader.feed_data(data)
+            with self.data[:end - self.capacity] as data:
+                reader.feed_data(data)
+        header[_READ] = start + size
+        return size
+
+    def write(self, data: memoryview) -> int:
+        """Writes as much of data as fits, returns the number of bytes written."""
+
+        header = self.header
+        start = header[_WRITTEN]
+        size = min(len(data), self.capacity - (start - header[_READ]))
+        if size <= 0:
+            return 0
+        offset = start % self.capacity
+        end = offset + size
+        if end <= self.capacity:
+            self.data[offset:end] = data[:size]
+        else:
+            first = self.capacity - offset
+            self.data[offset:] = data[:first]
+            self.data[:end - self.capacity] = data[first:size]
+        header[_WRITTEN] = start + size
+        return size
+
+    def release(self) -> None:
+        """Releases the views of the segment and closes it."""
+        self.header.release()
+        self.data.release()
+        self.shm.close()
+
+
+class AsyncShmRing:
+    """Helper class enabling async reading from a shared memory ring buffer
+    written by ShmRingWriter in another process on the same host.
+    Data is handed over in memory rather than through the kernel: the ring is a
+    multiprocessing.shared_memory segment named name, while a pair of named pipes
+    in fifo_dir (the temporary directory by default) only carries wakeups of a side
+    waiting for data or for space. The ring, its pipes and the reader are created by
+    open and removed by close; the reader sees EOF once the writer is closed.
+    Like FIFOs, a ring has a single writer at a time.
+    """
+
+    def __init__(self, chunk_size: int = 65536):
+        """chunk_size is the maximum size of data passed to reader at once."""
+
+        self._name = None
+        self._paths = None
+        self._ring = None
+        self._data_fd = None
+        self._space_fd = None
+        self._loop = None
+        self._chunk_size = chunk_size
+        self._reader = None
+        self._transport = None
+
+    async def open(
+            self,
+            name: str,
+            capacity: int = 2 ** 24,
+            fifo_dir: Optional[str] = None,
+            limit: Optional[int] = None,
+            ):
+        """Create the ring of capacity bytes and its wakeup pipes, create relevant
+        StreamReader and start passing data of the ring to it.
+        limit sets buffer limit of the StreamReader (64 KiB by default).
+        """
+
+        logger.info("AsyncShmRing.open() invoked.")
+
+        if not self.is_closed():
+            logger.error(
+                "AsyncShmRing.open(): Attempted to open a ring that is already open."
+                )
+            raise RuntimeError(
+                "Attempted to open a ring that is already open."
+                )
+
+        self._name = name
+        self._paths = _wakeup_paths(name, fifo_dir)
+        self._ring = _Ring(SharedMemory(name, create=True, size=_HEADER_SIZE + capacity), capacity)
+        try:
+            for path in self._paths:
+                os.mkfifo(path)
+            self._data_fd = _open_wakeup(self._paths[0])
+            self._space_fd = _open_wakeup(self._paths[1])
+        except Exception as e:
+            logger.error(
+                f"AsyncShmRing.open(): Failed to create wakeup pipes of ring {name}."
+                )
+            self._remove()
+            raise e
+
+        logger.debug(
+            f"AsyncShmRing.open(): ring {name} of {capacity} bytes created, wakeup pipes are {self._paths}."
+            )
+
+        self._loop = asyncio.get_running_loop()
+        self._reader, self._transport = create_fed_reader(limit)
+        self._transport.attach(asyncio.ensure_future(self._relay()))
+
+        return self
+
+    async def _wait_data(self) -> None:
+        """Waits for a wakeup from the writer, or for _WAKEUP_TIMEOUT."""
+
+        woken = self._loop.create_future()
+        self._loop.add_reader(self._data_fd, lambda: woken.done() or woken.set_result(None))
+        try:
+            await asyncio.wait_for(woken, _WAKEUP_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._loop.remove_reader(self._data_fd)
+        _clear_wakeups(self._data_fd)
+
+    async def _relay(self) -> None:
+        """Passes data from the ring to reader until the writer is closed."""
+
+        ring = self._ring
+        header = ring.header
+        reader = self._reader
+        transport = self._transport
+        try:
+            while True:
+                await transport.wait_resumed()
+                closed = header[_CLOSED]  # Checked first: the writer closes after its last write
+                if ring.read_into(reader, self._chunk_size):
+                    if header[_WRITER_WAITING]:
+                        _wake(self._space_fd)
+                    continue
+                if closed:
+                    break
+                header[_READER_WAITING] = 1
+                if header[_WRITTEN] == header[_READ] and not header[_CLOSED]:
+                    await self._wait_data()
+                header[_READER_WAITING] = 0
+            reader.feed_eof()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"AsyncShmRing: failed to read from ring {self._name}: {e!r}.")
+            reader.set_exception(e)
+
+    def _remove(self) -> None:
+        """Closes and removes the ring and its wakeup pipes."""
+
+        for fd in (self._data_fd, self._space_fd):
+            if fd is not None:
+                os.close(fd)
+        self._data_fd = self._space_fd = None
+        for path in self._paths:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        self._ring.release()
+        # A writer in a child process may share the resource tracker and have unregistered
+        # the segment, register it again so that unlink unregisters it cleanly
+        resource_tracker.register(self._ring.shm._name, "shared_memory")
+        self._ring.shm.unlink()
+        self._ring = None
+
+    def close(self):
+        """Stops reading, feeds EOF to reader unless it got it already, removes the ring."""
+
+        logger.info("AsyncShmRing.close() invoked.")
+
+        if self._transport and not self._transport.is_closing():
+            self._transport.close()
+            if not self._reader.at_eof():
+                self._reader.feed_eof()
+
+        if self._ring is not None:
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.remove_reader(self._data_fd)
+            self._remove()
+
+    def is_closed(self):
+        """Returns True if the ring is removed and the relay is closed, False otherwise."""
+        return self._ring is None and (not self._transport or self._transport.is_closing())
+
+    def __enter__(self):
+        """Context manager entry point."""
+        logger.info("AsyncShmRing.__enter__() invoked.")
+        return self._reader
+
+    def __exit__(self, exc_type, exc, tb):
+        """Context manager exit point."""
+        logger.info("AsyncShmRing.__exit__() invoked.")
+        self.close()
+        return False
+
+    @property
+    def reader(self):
+        """Returns StreamReader object for the ring."""
+        return self._reader
+
+
+class ShmRingWriter:
+    """Writes data to a ring created by AsyncShmRing.open in another process, see
+    AsyncShmRing. write blocks while the ring is full and raises BrokenPipeError
+    if the ring is closed by its reader meanwhile.
+    """
+
+    def __init__(self, name: str, fifo_dir: Optional[str] = None):
+        """Attaches to the ring name with wakeup pipes in fifo_dir (the temporary
+        directory by default). Raises FileNotFoundError if there is none such.
+        """
+
+        logger.info("ShmRingWriter() invoked.")
+        logger.debug(f"for name = {name}.")
+
+        self._name = name
+        self._paths = _wakeup_paths(name, fifo_dir)
+        shm = SharedMemory(name)
+        # The segment belongs to the reader, keep the resource tracker of this process
+        # from removing it when the process exits
+        resource_tracker.unregister(shm._name, "shared_memory")
+        self._ring = _Ring(shm)
+        try:
+            self._data_fd = _open_wakeup(self._paths[0])
+            self._space_fd = _open_wakeup(self._paths[1])
+        except Exception:
+            self._ring.release()
+            raise
+
+    def _wait_space(self) -> None:
+        """Waits for a wakeup from the reader, or for _WAKEUP_TIMEOUT."""
+        if not os.path.exists(self._paths[0]):
+            raise BrokenPipeError(f"Ring {self._name} is closed by its reader.")
+        select.select([self._space_fd], [], [], _WAKEUP_TIMEOUT)
+        _clear_wakeups(self._space_fd)
+
+    def write(self, data) -> None:
+        """Writes all of data (a bytes-like object) to the ring."""
+
+        if self._ring is None:
+            raise ValueError("Write to a closed ShmRingWriter.")
+
+        ring = self._ring
+        header = ring.header
+        view = memoryview(data).cast("B")
+        while view:
+            size = ring.write(view)
+            if size:
+                view = view[size:]
+                if header[_READER_WAITING]:
+                    _wake(self._data_fd)
+                continue
+            header[_WRITER_WAITING] = 1
+            if header[_WRITTEN] - header[_READ] == ring.capacity:
+                self._wait_space()
+            header[_WRITER_WAITING] = 0
+
+    def close(self) -> None:
+        """Marks the ring closed, so that its reader sees EOF, and detaches from it."""
+
+        logger.info("ShmRingWriter.close() invoked.")
+
+        if self._ring is None:
+            return
+        self._ring.header[_CLOSED] = 1
+        _wake(self._data_fd)
+        os.close(self._data_fd)
+        os.close(self._space_fd)
+        self._ring.release()
+        self._ring = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
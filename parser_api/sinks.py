@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+import stat
+import sys
+import xml.etree.ElementTree as ElementTree
+from typing import Union, List, Callable, Any, Optional, Sequence
+
+from parser_api.pipe_reader import get_stream_writer
+
+logger = logging.getLogger(__name__)
+
+
+class JsonlSerializer:
+    """Serializes items as JSON lines. Objects JSON does not support are written as strings."""
+
+    def __init__(self, encoding: str = "utf-8"):
+        self._encoding = encoding
+        self._dumps = json.JSONEncoder(ensure_ascii=False, default=str).encode
+
+    def __call__(self, items: List[Any]) -> bytes:
+        return ("\n".join(map(self._dumps, items)) + "\n").encode(self._encoding)
+
+
+class CsvSerializer:
+    """Serializes items as CSV rows. Items are sequences of values, or dicts written
+    in the order of fieldnames (keys of the first item by default), preceded
+    by a header row if header is True. Other keyword arguments are passed to csv.writer.
+    """
+
+    def __init__(
+            self,
+            fieldnames: Optional[Sequence[str]] = None,
+            header: bool = True,
+            encoding: str = "utf-8",
+            **fmtparams,
+            ):
+        self._fieldnames = list(fieldnames) if fieldnames is not None else None
+        self._header = header
+        self._encoding = encoding
+        self._fmtparams = dict({"lineterminator": "\n"}, **fmtparams)
+
+    def __call__(self, items: List[Any]) -> bytes:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, **self._fmtparams)
+        rows = items
+        if items and isinstance(items[0], dict):
+            if self._fieldnames is None:
+                self._fieldnames = list(items[0])
+            fieldnames = self._fieldnames
+            rows = ([item.get(name, "") for name in fieldnames] for item in items)
+        if self._header and self._fieldnames is not None:
+            writer.writerow(self._fieldnames)
+            self._header = False
+        writer.writerows(rows)
+        return buffer.getvalue().encode(self._encoding)
+
+
+class RawSerializer:
+    """Writes items as they are: bytes unchanged, str encoded, XML elements serialized
+    and other objects converted to str. No separators are added.
+    """
+
+    def __init__(self, encoding: str = "utf-8"):
+        self._encoding = encoding
+
+    def _serialize(self, item: Any) -> bytes:
+        if isinstance(item, bytes):
+            return item
+        if isinstance(item, ElementTree.Element):
+            return ElementTree.tostring(item, encoding=self._encoding)
+        return str(item).encode(self._encoding)
+
+    def __call__(self, items: List[Any]) -> bytes:
+        return b"".join(map(self._serialize, items))
+
+
+# Serializer name -> serializer class, for Sink serializer argument
+SERIALIZERS = {
+    "jsonl": JsonlSerializer,
+    "ndjson": JsonlSerializer,
+    "csv": CsvSerializer,
+    "raw": RawSerializer,
+    }
+
+
+class Sink:
+    """Base class of sinks, async callables to be passed to parsers as result_callback.
+    Items are serialized and buffered, the buffer is written once it holds at least
+    buffer_size bytes, on flush and on close. Writing waits while the consumer
+    does not keep up, which suspends the parser.
+    Subclasses should implement _write and _close.
+    """
+
+    def __init__(
+            self,
+            serializer: Union[str, Callable[[List[Any]], bytes]] = "jsonl",
+            buffer_size: int = 2 ** 16,
+            ):
+        """serializer is a name from SERIALIZERS or a callable returning serialized items
+        as bytes, e.g. CsvSerializer(fieldnames=["id", "name"]).
+        """
+        if isinstance(serializer, str):
+            if serializer not in SERIALIZERS:
+                raise ValueError(f"Unknown serializer: {serializer!r}.")
+            serializer = SERIALIZERS[serializer]()
+        self._serializer = serializer
+        self._buffer_size = buffer_size
+        self._buffer: List[bytes] = []
+        self._buffered = 0
+
+    async def __call__(self, items: List[Any]) -> None:
+        data = self._serializer(items)
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self._buffer_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Writes the buffered data."""
+        if not self._buffer:
+            return
+        chunks, self._buffer, self._buffered = self._buffer, [], 0
+        await self._write(chunks)
+
+    async def close(self) -> None:
+        """Writes the buffered data and closes the sink."""
+
+        logger.info(f"{type(self).__name__}.close() invoked.")
+
+        try:
+            await self.flush()
+        finally:
+            self._close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+        return False
+
+    async def _write(self, chunks: List[bytes]) -> None:
+        """Writes chunks of serialized data. Should be implemented by subclasses."""
+        raise NotImplementedError
+
+    def _close(self) -> None:
+        """Closes the underlying file. Should be implemented by subclasses."""
+        raise NotImplementedError
+
+
+class PipeSink(Sink):
+    """A sink writing to a pipe, a named pipe (FIFO), a socket or a character device
+    through a non-blocking write transport. Note that the pipe is switched to
+    non-blocking mode, which affects other writers sharing it.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._file = None
+        self._writer = None
+
+    async def open(self, pipe) -> "PipeSink":
+        """Opens the sink. pipe is a file-like object, or a path of a named pipe,
+        in which case opening waits until the pipe is opened for reading.
+        """
+
+        logger.info("PipeSink.open() invoked.")
+
+        if isinstance(pipe, str):
+            if not stat.S_ISFIFO(os.stat(pipe).st_mode):  # Might throw FileNotFoundError
+                logger.error(
+                    f"PipeSink.open(): Unexpected file type at {pipe}. "
+                    "The provided path doesn't seem to be a named pipe."
+                    )
+                raise TypeError(
+                    "The provided path doesn't seem to be a named pipe."
+                    )
+            loop = asyncio.get_running_loop()
+            pipe = self._file = await loop.run_in_executor(None, open, pipe, "wb", 0)
+
+        try:
+            self._writer = await get_stream_writer(pipe)
+        except Exception as e:
+            logger.error(f"PipeSink.open(): Failed to attach transport to {pipe}.")
+            if self._file is not None:
+                self._file.close()
+            raise e
+
+        return self
+
+    async def _write(self, chunks: List[bytes]) -> None:
+        self._writer.writelines(chunks)
+        await self._writer.drain()
+
+    def _close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+
+
+class FileSink(Sink):
+    """A sink writing to a regular file. Writes are done in a worker thread,
+    as regular files do not support non-blocking writes.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._file = None
+
+    async def open(self, file, append: bool = False) -> "FileSink":
+        """Opens the sink. file is a path, truncated unless append is True,
+        or a file-like object open for writing bytes.
+        """
+
+        logger.info("FileSink.open() invoked.")
+
+        if isinstance(file, str):
+            file = open(file, "ab" if append else "wb")
+        self._file = file
+
+        return self
+
+    def _write_sync(self, chunks: List[bytes]) -> None:
+        self._file.writelines(chunks)
+        self._file.flush()
+
+    async def _write(self, chunks: List[bytes]) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self._write_sync, chunks)
+
+    def _close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+
+async def open_stdout_sink(
+        serializer: Union[str, Callable[[List[Any]], bytes]] = "jsonl",
+        buffer_size: int = 2 ** 16,
+        ) -> Sink:
+    """Returns an open sink writing to a duplicate of sys.stdout file descriptor:
+    a FileSink if stdout is redirected to a regular file, a PipeSink otherwise.
+    Nothing else should write to stdout while the sink is open.
+    """
+
+    stdout = os.fdopen(os.dup(sys.stdout.fileno()), "wb", buffering=0)
+    if stat.S_ISREG(os.fstat(stdout.fileno()).st_mode):
+        return await FileSink(serializer, buffer_size).open(stdout)
+    return await PipeSink(serializer, buffer_size).open(stdout)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+import asyncio
+import logging
+import socket
+from typing import List, Callable, Awaitable, Any, Optional, Set
+
+from parser_api.base_parser import BaseParser
+
+logger = logging.getLogger(__name__)
+
+
+class ParserServer:
+    """Parses data sent over connections accepted by a Unix domain socket or TCP server.
+    Each connection is parsed by its own parser created by parser_factory, which is
+    called with result_callback, or by a shared parser if parser is given (suitable
+    for parsers which keep no state between lines only).
+    Connections beyond max_connections are closed as soon as they are accepted.
+    limit sets buffer limit of the StreamReader of each connection (64 KiB by default)
+    and recv_buffer sets SO_RCVBUF of its socket. Other keyword arguments are passed
+    to BaseParser.parse_stream.
+    An error in a connection is logged and closes that connection only.
+    """
+
+    def __init__(
+            self,
+            parser_factory: Optional[Callable[[Callable[[List[Any]], Awaitable[None]]], BaseParser]] = None,
+            result_callback: Optional[Callable[[List[Any]], Awaitable[None]]] = None,
+            parser: Optional[BaseParser] = None,
+            max_connections: Optional[int] = None,
+            limit: Optional[int] = None,
+            recv_buffer: Optional[int] = None,
+            **kwargs,
+            ):
+        if (parser_factory is None) == (parser is None):
+            raise ValueError("Exactly one of parser_factory and parser should be given.")
+        self._parser_factory = parser_factory
+        self._result_callback = result_callback
+        self._parser = parser
+        self._max_connections = max_connections
+        self._limit = limit
+        self._recv_buffer = recv_buffer
+        self._parse_kwargs = kwargs
+        self._server = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.connections = 0
+        self.active = 0
+        self.rejected = 0
+        self.errors = 0
+
+    def _server_kwargs(self) -> dict:
+        return {} if self._limit is None else {"limit": self._limit}
+
+    async def start_unix(self, path: str) -> "ParserServer":
+        """Starts accepting connections on a Unix domain socket at path."""
+
+        logger.info("ParserServer.start_unix() invoked.")
+        logger.debug(f"for path = {path}.")
+
+        self._server = await asyncio.start_unix_server(self._handle, path, **self._server_kwargs())
+        return self
+
+    async def start_tcp(self, host: Optional[str] = None, port: int = 0) -> "ParserServer":
+        """Starts accepting TCP connections at host and port (any free port by default)."""
+
+        logger.info("ParserServer.start_tcp() invoked.")
+        logger.debug(f"for host = {host}, port = {port}.")
+
+        self._server = await asyncio.start_server(self._handle, host, port, **self._server_kwargs())
+        return self
+
+    @property
+    def sockets(self):
+        """Returns listening sockets of the server."""
+        return self._server.sockets if self._server is not None else ()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Parses a single connection."""
+
+        peer = writer.get_extra_info("peername")
+        if self._max_connections is not None and self.active >= self._max_connections:
+            logger.warning(f"ParserServer: connection from {peer!r} rejected, limit reached.")
+            self.rejected += 1
+            writer.close()
+            return
+
+        self.connections += 1
+        self.active += 1
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        logger.debug(f"ParserServer: connection from {peer!r} accepted.")
+        try:
+            if self._recv_buffer:
+                sock = writer.get_extra_info("socket")
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self._recv_buffer)
+            parser = self._parser
+            if parser is None:
+                parser = self._parser_factory(self._result_callback)
+            await parser.parse_stream(reader, limit=self._limit, **self._parse_kwargs)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"ParserServer: connection from {peer!r} failed: {e!r}.")
+        finally:
+            self.active -= 1
+            self._tasks.discard(task)
+            writer.close()
+
+    async def serve_forever(self) -> None:
+        """Accepts connections until cancelled."""
+        await self._server.serve_forever()
+
+    async def close(self) -> None:
+        """Stops accepting connections and cancels parsing of the active ones."""
+
+        logger.info("ParserServer.close() invoked.")
+
+        if self._server is not None:
+            self._server.close()
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.wait(list(self._tasks))
+        if self._server is not None:
+            await self._server.wait_closed()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+        return False
@@ -1,13 +1,14 @@
 import asyncio
-from parser_api.base_parser import BaseParser
+import contextlib
+import os
+import tempfile
+from parser_api.base_parser import BaseParser, Position, QuarantinedInput, read_checkpoint
+from parser_api.error import FormatError, IncompleteDataError, ErrorRateExceededError
+from parser_api.metrics import ParserMetrics, PipelineStats
+from helpers import a_pass, memory_stream
 import unittest
 
 
-async def a_pass(item):
-    """Asynchronous version of pass for use in callbacks."""
-    pass
-
-
 class TestBaseParser(unittest.IsolatedAsyncioTestCase):
     """Tests for BaseParser without any interaction."""
 
@@ -122,6 +123,507 @@ class TestBaseParserCustomParseLine(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(self.parsed_items, ["bcdefgh", "cdefghi"])
 
 
+class _LinesParser(BaseParser):
+    """A parser collecting lines and batches it receives, for use in tests."""
+
+    def __init__(self, result_callback, **kwargs):
+        super().__init__(result_callback, **kwargs)
+        self.batches = []
+
+    async def _parse_line(self, line: str) -> None:
+        await self._result_callback([line])
+
+    async def _parse_lines(self, lines) -> None:
+        self.batches.append(lines)
+        await super()._parse_lines(lines)
+
+
+class TestBaseParserChunked(unittest.IsolatedAsyncioTestCase):
+    """Tests for BaseParser.parse_stream() in chunked mode."""
+
+    async def _in_test_callback(self, items):
+        """Callback function for use in tests."""
+        self.parsed_items.extend(items)
+
+    async def asyncSetUp(self) -> None:
+        self.parsed_items = []
+        self.parser = _LinesParser(self._in_test_callback)
+
+    async def test_same_lines_as_readline(self):
+        """Tests that chunked mode yields the same lines as line-by-line mode."""
+        data = b"abc\n\ndefgh\r\nij\nklm"
+        await self.parser.parse_stream(memory_stream(data))
+        expected = list(self.parsed_items)
+        for chunk_size in (1, 2, 3, 5, 64):
+            self.parsed_items = []
+            await self.parser.parse_stream(memory_stream(data), chunk_size=chunk_size)
+            self.assertEqual(self.parsed_items, expected, f"chunk_size = {chunk_size}")
+        self.assertEqual(expected, ["abc\n", "\n", "defgh\r\n", "ij\n", "klm"])
+
+    async def test_multibyte_across_chunks(self):
+        """Tests that multibyte characters split between chunks are decoded correctly."""
+        text = "äöü\n€uro\n𝄞\n"
+        for chunk_size in (1, 2, 3):
+            self.parsed_items = []
+            await self.parser.parse_stream(memory_stream(text.encode()), chunk_size=chunk_size)
+            self.assertEqual(self.parsed_items, ["äöü\n", "€uro\n", "𝄞\n"])
+
+    async def test_batches(self):
+        """Tests that lines are passed to _parse_lines in batches."""
+        await self.parser.parse_stream(memory_stream(b"a\nb\nc\nd"), chunk_size=1024)
+        self.assertEqual(self.parser.batches, [["a\n", "b\n", "c\n"], ["d"]])
+
+
+class _EmittingParser(BaseParser):
+    """A parser emitting each line it receives, for use in tests."""
+
+    async def _parse_line(self, line: str) -> None:
+        await self._emit_results([line.strip()])
+
+
+class TestBaseParserBatching(unittest.IsolatedAsyncioTestCase):
+    """Tests for batched delivery of results to result_callback."""
+
+    async def _in_test_callback(self, items):
+        """Callback function for use in tests."""
+        self.batches.append(items)
+
+    async def asyncSetUp(self) -> None:
+        self.batches = []
+
+    async def test_no_batching(self):
+        """Tests that results are delivered right away by default."""
+        parser = _EmittingParser(self._in_test_callback)
+        await parser.parse_stream(memory_stream(b"a\nb\nc\n"))
+        self.assertEqual(self.batches, [["a"], ["b"], ["c"]])
+
+    async def test_batch_size(self):
+        """Tests that results are flushed by count and at EOF."""
+        parser = _EmittingParser(self._in_test_callback, batch_size=2)
+        await parser.parse_stream(memory_stream(b"a\nb\nc\nd\ne\n"))
+        self.assertEqual(self.batches, [["a", "b"], ["c", "d"], ["e"]])
+
+    async def test_batch_bytes(self):
+        """Tests that results are flushed by size."""
+        parser = _EmittingParser(self._in_test_callback, batch_bytes=4)
+        await parser.parse_stream(memory_stream(b"ab\nc\nde\nfghi\nj\n"))
+        self.assertEqual(self.batches, [["ab", "c", "de"], ["fghi"], ["j"]])
+
+    async def test_batch_latency(self):
+        """Tests that buffered results are flushed when batch_latency expires."""
+        parser = _EmittingParser(self._in_test_callback, batch_size=100, batch_latency=0.05)
+        reader = asyncio.StreamReader()
+        task = asyncio.create_task(parser.parse_stream(reader))
+        reader.feed_data(b"a\nb\n")
+        await asyncio.sleep(0.2)
+        self.assertEqual(self.batches, [["a", "b"]])
+        reader.feed_data(b"c\n")
+        reader.feed_eof()
+        await task
+        self.assertEqual(self.batches, [["a", "b"], ["c"]])
+
+
+class _BytesParser(_LinesParser):
+    """A parser receiving lines as bytes."""
+
+    _bytes_input = True
+
+
+class TestBaseParserBytesInput(unittest.IsolatedAsyncioTestCase):
+    """Tests for BaseParser subclasses taking bytes input."""
+
+    async def _in_test_callback(self, items):
+        """Callback function for use in tests."""
+        self.parsed_items.extend(items)
+
+    async def asyncSetUp(self) -> None:
+        self.parsed_items = []
+        self.parser = _BytesParser(self._in_test_callback)
+
+    async def test_parse_stream(self):
+        """Tests that lines are passed as bytes in line-by-line and chunked modes."""
+        data = "ab\nä\nc".encode()
+        await self.parser.parse_stream(memory_stream(data))
+        self.assertEqual(self.parsed_items, [b"ab\n", "ä\n".encode(), b"c"])
+        for chunk_size in (1, 2, 64):
+            self.parsed_items = []
+            await self.parser.parse_stream(memory_stream(data), chunk_size=chunk_size)
+            self.assertEqual(self.parsed_items, [b"ab\n", "ä\n".encode(), b"c"])
+
+
+class TestBaseParserPipelined(unittest.IsolatedAsyncioTestCase):
+    """Tests for BaseParser.parse_pipelined()."""
+
+    async def _in_test_callback(self, items):
+        """Callback function for use in tests."""
+        await asyncio.sleep(0)
+        self.parsed_items.extend(items)
+
+    async def asyncSetUp(self) -> None:
+        self.parsed_items = []
+        self.lines = [f"line {i} ä" for i in range(2000)]
+        self.data = "".join(f"{line}\n" for line in self.lines).encode()
+
+    async def test_parse_pipelined(self):
+        """Tests that all the lines are parsed in order and queue stats are collected."""
+        parser = _EmittingParser(self._in_test_callback, batch_size=10)
+        stats = PipelineStats()
+        await parser.parse_pipelined(
+            memory_stream(self.data), chunk_size=100, read_queue_size=2, result_queue_size=2, stats=stats,
+            )
+        self.assertEqual(self.parsed_items, self.lines)
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot["chunks"]["maxsize"], 2)
+        self.assertLessEqual(snapshot["chunks"]["peak"], 2)
+        self.assertGreater(stats.results.samples, 0)
+
+    async def test_parse_tasks(self):
+        """Tests parse_pipelined with several parse tasks."""
+        parser = _EmittingParser(self._in_test_callback)
+        await parser.parse_pipelined(memory_stream(self.data), chunk_size=100, parse_tasks=3)
+        self.assertEqual(sorted(self.parsed_items), sorted(self.lines))
+
+    async def test_sink_error(self):
+        """Tests that an error in result_callback stops the pipeline."""
+
+        async def _failing_callback(items):
+            raise RuntimeError("sink failed")
+
+        parser = _EmittingParser(_failing_callback)
+        with self.assertRaises(RuntimeError):
+            await parser.parse_pipelined(memory_stream(self.data), chunk_size=100)
+
+
+class TestBaseParserOverflow(unittest.IsolatedAsyncioTestCase):
+    """Tests for handling of lines longer than the limit of the pipe."""
+
+    async def _in_test_callback(self, items):
+        """Callback function for use in tests."""
+        self.parsed_items.extend(items)
+
+    async def asyncSetUp(self) -> None:
+        self.parsed_items = []
+        self.metrics = ParserMetrics()
+        self.parser = _LinesParser(self._in_test_callback, metrics=self.metrics)
+        self.long_line = "ä" * 40 + "\n"
+
+    def _stream(self) -> asyncio.StreamReader:
+        reader = asyncio.StreamReader(limit=16)
+        reader.feed_data(f"a\n{self.long_line}b\n".encode())
+        reader.feed_eof()
+        return reader
+
+    async def test_error(self):
+        """Tests that a long line raises IncompleteDataError by default."""
+        with self.assertRaises(IncompleteDataError):
+            await self.parser.parse_stream(self._stream())
+        self.assertEqual(self.parsed_items, ["a\n"])
+
+    async def test_grow(self):
+        """Tests that a long line is read whole with overflow="grow"."""
+        await self.parser.parse_stream(self._stream(), overflow="grow")
+        self.assertEqual(self.parsed_items, ["a\n", self.long_line, "b\n"])
+        self.assertEqual(self.metrics.overflows, 1)
+        self.assertEqual(self.metrics.bytes_read, 2 + 81 + 2)
+
+    async def test_split(self):
+        """Tests that a long line is passed in pieces with overflow="split"."""
+        reader = asyncio.StreamReader(limit=16)
+        task = asyncio.create_task(self.parser.parse_stream(reader, overflow="split"))
+        data = f"a\n{self.long_line}b\n".encode()
+        for start in range(0, len(data), 25):
+            reader.feed_data(data[start:start + 25])
+            await asyncio.sleep(0.01)
+        reader.feed_eof()
+        await task
+        self.assertGreater(len(self.parsed_items), 3)
+        self.assertEqual(self.parsed_items[0], "a\n")
+        self.assertEqual(self.parsed_items[-1], "b\n")
+        self.assertEqual("".join(self.parsed_items[1:-1]), self.long_line)
+
+    async def test_skip(self):
+        """Tests that a long line is skipped with overflow="skip"."""
+        await self.parser.parse_stream(self._stream(), overflow="skip")
+        self.assertEqual(self.parsed_items, ["a\n", "b\n"])
+        self.assertEqual(self.metrics.overflows, 1)
+
+    async def test_unknown_policy(self):
+        """Tests that unknown overflow policy is rejected."""
+        with self.assertRaises(ValueError):
+            await self.parser.parse_stream(self._stream(), overflow="truncate")
+
+
+class TestBaseParserFile(unittest.IsolatedAsyncioTestCase):
+    """Tests for BaseParser.parse_file()."""
+
+    async def _in_test_callback(self, items):
+        """Callback function for use in tests."""
+        self.parsed_items.extend(items)
+
+    async def asyncSetUp(self) -> None:
+        self.parsed_items = []
+        self.parser = _LinesParser(self._in_test_callback)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "input.txt")
+
+    async def asyncTearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def _write(self, data: bytes) -> None:
+        with open(self.path, "wb") as file:
+            file.write(data)
+
+    async def test_parse_file(self):
+        """Tests that all the lines are parsed in order, split into ranges."""
+        lines = [f"line {i} ä\n" for i in range(100)] + ["last"]
+        self._write("".join(lines).encode())
+        await self.parser.parse_file(self.path, range_size=64)
+        self.assertEqual(self.parsed_items, lines)
+        self.assertGreater(len(self.parser.batches), 10)
+
+    async def test_empty_file(self):
+        """Tests parse_file() with an empty file."""
+        self._write(b"")
+        await self.parser.parse_file(self.path)
+        self.assertEqual(self.parsed_items, [])
+
+
+class _FailingParser(_EmittingParser):
+    """A parser failing on lines starting with "!", for use in tests."""
+
+    async def _parse_line(self, line: str) -> None:
+        if line.startswith("!"):
+            raise FormatError(f"Unexpected line: {line!r}.")
+        await super()._parse_line(line)
+
+
+class TestBaseParserIterators(unittest.IsolatedAsyncioTestCase):
+    """Tests for BaseParser.records() and BaseParser.batches()."""
+
+    async def test_records(self):
+        """Tests that records are yielded in order, in both parsing modes."""
+        for chunk_size in (None, 3):
+            parser = _EmittingParser(None)
+            stream = memory_stream(b"a\nb\nc")
+            records = [item async for item in parser.records(stream, chunk_size=chunk_size)]
+            self.assertEqual(records, ["a", "b", "c"], f"chunk_size = {chunk_size}")
+
+    async def test_batches(self):
+        """Tests that batches are yielded as delivered."""
+        parser = _EmittingParser(None, batch_size=2)
+        batches = [items async for items in parser.batches(memory_stream(b"a\nb\nc\n"))]
+        self.assertEqual(batches, [["a", "b"], ["c"]])
+
+    async def test_backpressure(self):
+        """Tests that parsing does not run ahead of the consumer by more than the queue."""
+        metrics = ParserMetrics()
+        parser = _EmittingParser(None, metrics=metrics)
+        data = b"".join(b"%d\n" % i for i in range(100))
+        async with contextlib.aclosing(parser.records(memory_stream(data), queue_size=2)) as records:
+            async for record in records:
+                await asyncio.sleep(0.001)
+                self.assertLessEqual(metrics.records_emitted - int(record), 4)
+
+    async def test_error(self):
+        """Tests that parsing errors are raised by the iterator after the preceding records."""
+        parser = _FailingParser(None)
+        records = []
+        with self.assertRaises(FormatError):
+            async for record in parser.records(memory_stream(b"a\nb\n!\nc\n")):
+                records.append(record)
+        self.assertEqual(records, ["a", "b"])
+
+    async def test_early_exit(self):
+        """Tests that parsing is cancelled when the iterator is closed early."""
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"a\nb\n")
+        parser = _EmittingParser(None)
+        async with contextlib.aclosing(parser.records(reader)) as records:
+            async for record in records:
+                break
+        self.assertIsNone(parser._result_queue)
+        buffered = len(reader._buffer)
+        reader.feed_data(b"c\n")
+        await asyncio.sleep(0.01)
+        self.assertEqual(len(reader._buffer), buffered + 2)
+
+    async def test_chained(self):
+        """Tests chaining two parsers into a pipeline."""
+        first = _EmittingParser(None)
+        second = _EmittingParser(None)
+        reader = asyncio.StreamReader()
+
+        async def _feed() -> None:
+            async for record in first.records(memory_stream(b"1\n2\n3\n")):
+                reader.feed_data(f"{record}\n".encode() * 2)
+            reader.feed_eof()
+
+        feeder = asyncio.ensure_future(_feed())
+        records = [record async for record in second.records(reader)]
+        await feeder
+        self.assertEqual(records, ["1", "1", "2", "2", "3", "3"])
+
+
+class TestBaseParserErrorPolicy(unittest.IsolatedAsyncioTestCase):
+    """Tests for BaseParser error policies."""
+
+    DATA = b"a\n!b\nc\n!d\ne\n"
+
+    async def _in_test_callback(self, items):
+        """Callback function for use in tests."""
+        self.parsed_items.extend(items)
+
+    async def _error_sink(self, items):
+        """Error sink for use in tests."""
+        self.quarantined.extend(items)
+
+    async def asyncSetUp(self) -> None:
+        self.parsed_items = []
+        self.quarantined = []
+
+    async def test_abort(self):
+        """Tests that the default policy stops parsing on the first error."""
+        parser = _FailingParser(self._in_test_callback)
+        with self.assertRaises(FormatError):
+            await parser.parse_stream(memory_stream(self.DATA))
+        self.assertEqual(self.parsed_items, ["a"])
+        self.assertEqual(parser.error_counts, {"FormatError": 1})
+
+    async def test_skip(self):
+        """Tests that failed lines are skipped and counted."""
+        metrics = ParserMetrics()
+        parser = _FailingParser(self._in_test_callback, errors="skip", metrics=metrics)
+        await parser.parse_stream(memory_stream(self.DATA))
+        self.assertEqual(self.parsed_items, ["a", "c", "e"])
+        self.assertEqual(parser.error_counts, {"FormatError": 2})
+        self.assertEqual(metrics.errors, {"FormatError": 2})
+
+    async def test_quarantine(self):
+        """Tests that failed lines are passed to the error sink with their offsets."""
+        parser = _FailingParser(self._in_test_callback, errors="quarantine", error_sink=self._error_sink)
+        await parser.parse_stream(memory_stream(self.DATA))
+        self.assertEqual(self.parsed_items, ["a", "c", "e"])
+        self.assertEqual(
+            [(item.data, item.error, item.offset, item.line) for item in self.quarantined],
+            [(b"!b\n", FormatError, 2, 1), (b"!d\n", FormatError, 7, 3)],
+            )
+        self.assertIsInstance(self.quarantined[0], QuarantinedInput)
+        with self.assertRaises(ValueError):
+            _FailingParser(self._in_test_callback, errors="quarantine")
+
+    async def test_quarantine_chunked(self):
+        """Tests that failed lines are quarantined one by one in chunked mode."""
+        for chunk_size in (6, 65536):
+            self.parsed_items = []
+            self.quarantined = []
+            parser = _FailingParser(self._in_test_callback, errors="quarantine", error_sink=self._error_sink)
+            await parser.parse_stream(memory_stream(self.DATA), chunk_size=chunk_size)
+            self.assertEqual(self.parsed_items, ["a", "c", "e"], f"chunk_size = {chunk_size}")
+            self.assertEqual(
+                [(item.data, item.offset, item.line) for item in self.quarantined],
+                [(b"!b\n", 2, 1), (b"!d\n", 7, 3)],
+                f"chunk_size = {chunk_size}",
+                )
+
+    async def test_quarantine_batch(self):
+        """Tests that the whole failed batch is quarantined if _parse_lines is overridden."""
+
+        class _BatchParser(_FailingParser):
+            async def _parse_lines(self, lines):
+                for line in lines:
+                    await self._parse_line(line)
+
+        parser = _BatchParser(self._in_test_callback, errors="quarantine", error_sink=self._error_sink)
+        await parser.parse_stream(memory_stream(self.DATA), chunk_size=6)
+        self.assertEqual(self.parsed_items, ["a", "c"])
+        self.assertEqual(
+            [(item.data, item.offset, item.line) for item in self.quarantined],
+            [(b"a\n!b\n", 0, 0), (b"c\n!d\ne\n", 5, 2)],
+            )
+
+    async def test_quarantine_file(self):
+        """Tests that failed lines of a file are quarantined one by one."""
+        parser = _FailingParser(self._in_test_callback, errors="quarantine", error_sink=self._error_sink)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "test_file")
+            with open(path, "wb") as file:
+                file.write(self.DATA)
+            await parser.parse_file(path, range_size=6)
+        self.assertEqual(self.parsed_items, ["a", "c", "e"])
+        self.assertEqual(
+            [(item.data, item.offset, item.line) for item in self.quarantined],
+            [(b"!b\n", 2, 1), (b"!d\n", 7, 3)],
+            )
+
+    async def test_overflow(self):
+        """Tests that lines exceeding the limit of the pipe are quarantined without data."""
+        parser = _FailingParser(self._in_test_callback, errors="quarantine", error_sink=self._error_sink)
+        reader = asyncio.StreamReader(limit=8)
+        reader.feed_data(b"a\n" + b"x" * 20 + b"\nc\n")
+        reader.feed_eof()
+        await parser.parse_stream(reader)
+        self.assertEqual(self.parsed_items, ["a", "c"])
+        self.assertEqual(
+            [(item.data, item.error, item.offset, item.line) for item in self.quarantined],
+            [(b"", IncompleteDataError, 2, 1)],
+            )
+
+    async def test_max_error_rate(self):
+        """Tests that parsing stops once too many of the recent lines failed."""
+        parser = _FailingParser(self._in_test_callback, errors="skip", max_error_rate=0.2, error_window=10)
+        await parser.parse_stream(memory_stream((b"!\n" + b"a\n" * 5) * 5))
+        self.assertEqual(parser.error_counts, {"FormatError": 5})
+        with self.assertRaises(ErrorRateExceededError):
+            await parser.parse_stream(memory_stream(b"a\n" * 20 + b"!\n" * 3))
+        self.assertEqual(parser.error_counts, {"FormatError": 8})
+
+
+class TestBaseParserCheckpoints(unittest.IsolatedAsyncioTestCase):
+    """Tests for BaseParser checkpoints."""
+
+    async def _in_test_callback(self, items):
+        """Callback function for use in tests, failing on fail_on."""
+        self.checkpoints.append(self.parser.checkpoint)
+        if self.fail_on in items:
+            raise RuntimeError("Callback failed.")
+        self.parsed_items.extend(items)
+
+    async def asyncSetUp(self) -> None:
+        self.parsed_items = []
+        self.checkpoints = []
+        self.fail_on = None
+
+    async def test_checkpoint(self):
+        """Tests that checkpoint follows delivery of the results, in both parsing modes."""
+        for chunk_size in (None, 2):
+            self.checkpoints = []
+            self.parser = _EmittingParser(self._in_test_callback, batch_size=2, checkpoints=True)
+            await self.parser.parse_stream(memory_stream(b"a\nb\nc\n"), chunk_size=chunk_size)
+            self.assertEqual(self.checkpoints, [(0, 0), (4, 2)], f"chunk_size = {chunk_size}")
+            self.assertEqual(self.parser.checkpoint, Position(6, 3))
+            self.assertEqual(self.parser.position, Position(6, 3))
+
+    async def test_resume(self):
+        """Tests resuming parsing of a file from the checkpoint saved before a failure."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "test_file")
+            state_file = os.path.join(tmp_dir, "test_state")
+            with open(path, "wb") as file:
+                file.write(b"a\nb\nc\nd\ne\n")
+
+            self.fail_on = "d"
+            self.parser = _EmittingParser(self._in_test_callback, state_file=state_file, checkpoint_interval=0)
+            with self.assertRaises(RuntimeError):
+                await self.parser.parse_file(path, range_size=1)
+            self.assertEqual(read_checkpoint(state_file), Position(6, 3))
+
+            self.fail_on = None
+            self.parser = _EmittingParser(self._in_test_callback, state_file=state_file)
+            await self.parser.parse_file(path, range_size=1, resume=True)
+            self.assertEqual(read_checkpoint(state_file), Position(10, 5))
+        self.assertEqual(self.parsed_items, ["a", "b", "c", "d", "e"])
+
+
 if __name__ == "__main__":
     # logging.basicConfig(level=logging.DEBUG)
-    unittest.main()
+    unittest.main()
\ No newline at end of file
@@ -23,4 +23,22 @@ PYTHONPATH={$PYTHONPATH}:`pwd`/../.. python3 -m unittest base_parser_test.TestBa
 
 PYTHONPATH={$PYTHONPATH}:`pwd`/../.. python3 -m unittest base_parser_test.TestBaseParserCustomParseLine.test_parse_stream
 
+PYTHONPATH={$PYTHONPATH}:`pwd`/../.. python3 -m unittest base_parser_test.TestBaseParserChunked
+
+PYTHONPATH={$PYTHONPATH}:`pwd`/../.. python3 -m unittest base_parser_test.TestBaseParserBatching
+
+PYTHONPATH={$PYTHONPATH}:`pwd`/../.. python3 -m unittest base_parser_test.TestBaseParserBytesInput
+
+PYTHONPATH={$PYTHONPATH}:`pwd`/../.. python3 -m unittest base_parser_test.TestBaseParserPipelined
+
+PYTHONPATH={$PYTHONPATH}:`pwd`/../.. python3 -m unittest base_parser_test.TestBaseParserOverflow
+
+PYTHONPATH={$PYTHONPATH}:`pwd`/../.. python3 -m unittest base_parser_test.TestBaseParserFile
+
+PYTHONPATH={$PYTHONPATH}:`pwd`/../.. python3 -m unittest base_parser_test.TestBaseParserIterators
+
+PYTHONPATH={$PYTHONPATH}:`pwd`/../.. python3 -m unittest base_parser_test.TestBaseParserErrorPolicy
+
+PYTHONPATH={$PYTHONPATH}:`pwd`/../.. python3 -m unittest base_parser_test.TestBaseParserCheckpoints
+
 rm test_fifo
\ No newline at end of file
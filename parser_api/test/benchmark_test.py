@@ -0,0 +1,35 @@
+import unittest
+
+from parser_api.benchmark.suite import compare, run
+from parser_api.benchmark.workloads import WORKLOADS
+
+
+class TestBenchmarkSuite(unittest.IsolatedAsyncioTestCase):
+    """Tests for the benchmark suite."""
+
+    async def test_run(self):
+        """Tests a small run of every workload through the in-memory driver."""
+        for workload in WORKLOADS:
+            result = await run(workload, "memory", 2 ** 16, None)
+            self.assertGreater(result["records"], 0)
+            self.assertGreater(result["lines_per_s"], 0)
+            self.assertLessEqual(result["p50"], result["p99"])
+
+    async def test_compare(self):
+        """Tests detection of regressions against a baseline."""
+        baseline = [
+            {"workload": "short_lines", "driver": "memory", "lines_per_s": 1000},
+            {"workload": "wide_xml", "driver": "memory", "lines_per_s": 1000},
+            ]
+        results = [
+            {"workload": "short_lines", "driver": "memory", "lines_per_s": 950},
+            {"workload": "wide_xml", "driver": "memory", "lines_per_s": 800},
+            {"workload": "wide_xml", "driver": "fifo", "lines_per_s": 10},
+            ]
+        regressions = compare(results, baseline, 0.1)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith("wide_xml/memory"))
+
+
+if __name__ == "__main__":
+    unittest.main()
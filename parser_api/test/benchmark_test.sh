@@ -0,0 +1,3 @@
+#!/bin/bash
+
+PYTHONPATH={$PYTHONPATH}:`pwd`/../.. python3 -m unittest benchmark_test
@@ -0,0 +1,131 @@
+import asyncio
+import bz2
+import gzip
+import lzma
+import zlib
+from parser_api.base_parser import BaseParser
+from parser_api.decompress import decompress_stream, detect_codec
+from parser_api.error import FormatError, IncompleteDataError
+from helpers import memory_stream
+import unittest
+
+DATA = b"".join(b"%06d some text to compress\n" % i for i in range(20000))
+
+COMPRESS = {
+    "gzip": gzip.compress,
+    "zlib": zlib.compress,
+    "bz2": bz2.compress,
+    "lzma": lzma.compress,
+    }
+
+
+async def _read_all(data: bytes, codec: str, **kwargs) -> bytes:
+    """Returns data decompressed by decompress_stream."""
+    reader, transport = decompress_stream(memory_stream(data), codec, **kwargs)
+    try:
+        return await reader.read()
+    finally:
+        transport.close()
+
+
+class TestDecompressStream(unittest.IsolatedAsyncioTestCase):
+    """Tests for decompress_stream()."""
+
+    async def test_codecs(self):
+        """Tests decompression with every codec, given and detected."""
+        for codec, compress in COMPRESS.items():
+            compressed = compress(DATA)
+            self.assertEqual(detect_codec(compressed), codec)
+            self.assertEqual(await _read_all(compressed, codec, chunk_size=1000), DATA, codec)
+            self.assertEqual(await _read_all(compressed, "auto", chunk_size=1), DATA, codec)
+            self.assertEqual(await _read_all(compressed, "auto"), DATA, codec)
+
+    async def test_bounded_output(self):
+        """Tests that output is bounded by max_length and by the reader limit."""
+        compressed = gzip.compress(b"\n" * 2 ** 22)
+        reader, transport = decompress_stream(memory_stream(compressed), "gzip", max_length=4096, limit=4096)
+        try:
+            await asyncio.sleep(0.1)
+            self.assertLessEqual(len(reader._buffer), 3 * 4096)
+            self.assertFalse(transport.is_reading())
+            self.assertEqual(len(await reader.read()), 2 ** 22)
+        finally:
+            transport.close()
+
+    async def test_passthrough(self):
+        """Tests that data which does not look compressed is passed as is."""
+        self.assertEqual(await _read_all(DATA, "auto"), DATA)
+        self.assertEqual(await _read_all(b"abc", "auto"), b"abc")
+        self.assertEqual(await _read_all(b"", "auto"), b"")
+
+    async def test_multi_member(self):
+        """Tests decompression of concatenated gzip members."""
+        compressed = gzip.compress(DATA[:1000]) + gzip.compress(DATA[1000:])
+        self.assertEqual(await _read_all(compressed, "gzip", chunk_size=333), DATA)
+
+    async def test_in_thread(self):
+        """Tests decompression in a worker thread."""
+        self.assertEqual(await _read_all(lzma.compress(DATA), "auto", in_thread=True), DATA)
+
+    async def test_truncated(self):
+        """Tests that a truncated stream raises IncompleteDataError."""
+        with self.assertRaises(IncompleteDataError):
+            await _read_all(gzip.compress(DATA)[:-100], "gzip")
+
+    async def test_corrupt(self):
+        """Tests that corrupt data raises FormatError."""
+        compressed = bytearray(bz2.compress(DATA))
+        compressed[100:110] = b"0123456789"
+        with self.assertRaises(FormatError):
+            await _read_all(bytes(compressed), "bz2")
+
+    async def test_unknown_codec(self):
+        """Tests that an unknown codec raises ValueError."""
+        with self.assertRaises(ValueError):
+            decompress_stream(memory_stream(b""), "zip")
+
+
+class _LinesParser(BaseParser):
+    """A parser collecting lines it receives, for use in tests."""
+
+    def __init__(self):
+        super().__init__(self._collect)
+        self.lines = []
+
+    async def _collect(self, items) -> None:
+        self.lines.extend(items)
+
+    async def _parse_line(self, line: str) -> None:
+        await self._emit_results([line])
+
+
+class TestBaseParserCompression(unittest.IsolatedAsyncioTestCase):
+    """Tests for BaseParser.parse_stream() with compressed input."""
+
+    async def test_parse_stream(self):
+        """Tests that compressed input is parsed the same as plain input."""
+        expected = DATA.decode().splitlines(keepends=True)
+        for chunk_size in (None, 4096):
+            for compression in ("gzip", "auto"):
+                parser = _LinesParser()
+                await parser.parse_stream(
+                    memory_stream(gzip.compress(DATA)), chunk_size=chunk_size, compression=compression,
+                    )
+                self.assertEqual(parser.lines, expected, f"{compression}, chunk_size = {chunk_size}")
+
+    async def test_parse_stream_in_thread(self):
+        """Tests parsing with decompression in a worker thread."""
+        parser = _LinesParser()
+        await parser.parse_stream(
+            memory_stream(bz2.compress(DATA)), compression="bz2", decompress_in_thread=True,
+            )
+        self.assertEqual("".join(parser.lines).encode(), DATA)
+
+    async def test_limit(self):
+        """Tests that limit applies to the reader of decompressed data."""
+        data = b"x" * 200000 + b"\n"
+        parser = _LinesParser()
+        await parser.parse_stream(memory_stream(gzip.compress(data)), compression="gzip", limit=2 ** 20)
+        self.assertEqual(parser.lines, [data.decode()])
+        with self.assertRaises(IncompleteDataError):
+            await _LinesParser().parse_stream(memory_stream(gzip.compress(data)), compression="gzip")
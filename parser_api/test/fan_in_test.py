@@ -0,0 +1,90 @@
+import asyncio
+import gzip
+import os
+import tempfile
+import unittest
+
+from parser_api.fan_in import parse_fifos
+from helpers import TagParser, write_fifo
+
+
+class TestParseFifos(unittest.IsolatedAsyncioTestCase):
+    """Tests for parse_fifos."""
+
+    async def _in_test_callback(self, source, items):
+        """Callback function for use in tests."""
+        self.parsed_items.setdefault(source, []).extend(items)
+
+    async def asyncSetUp(self) -> None:
+        self.parsed_items = {}
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.paths = [os.path.join(self.tmp_dir.name, f"fifo{i}") for i in range(4)]
+        for path in self.paths:
+            os.mkfifo(path)
+
+    async def asyncTearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def _documents(self, padding):
+        """Returns a document for every source, with padding before its element."""
+        return [f"<doc{i}>\n{padding}<a{i}>x</a{i}>\n</doc{i}>\n" for i in range(len(self.paths))]
+
+    async def _parse(self, max_active=None, parser_factory=TagParser, compress=bytes, padding="", **kwargs):
+        writers = [
+            asyncio.ensure_future(write_fifo(path, compress(data.encode())))
+            for path, data in zip(self.paths, self._documents(padding))
+            ]
+        parsers = await parse_fifos(
+            parser_factory, self.paths, self._in_test_callback, max_active=max_active, **kwargs,
+            )
+        await asyncio.gather(*writers)
+        return parsers
+
+    async def test_parse_fifos(self):
+        """Tests that each source is parsed by its own parser and results are tagged."""
+        parsers = await self._parse()
+        self.assertEqual(set(parsers), set(self.paths))
+        self.assertEqual(len({id(p) for p in parsers.values()}), len(self.paths))
+        for i, path in enumerate(self.paths):
+            self.assertEqual(self.parsed_items[path], [f"a{i}", f"doc{i}"])
+
+    async def test_max_active(self):
+        """Tests parse_fifos with a limit of concurrently parsed sources."""
+        active = 0
+        peak = 0
+
+        class _CountingParser(TagParser):
+            async def parse_fifo(self, *args, **kwargs):
+                nonlocal active, peak
+                active += 1
+                peak = max(peak, active)
+                try:
+                    await asyncio.sleep(0.05)  # Let other sources start meanwhile, if allowed
+                    await super().parse_fifo(*args, **kwargs)
+                finally:
+                    active -= 1
+
+        await self._parse(max_active=2, parser_factory=_CountingParser)
+        self.assertEqual(peak, 2)
+        for i, path in enumerate(self.paths):
+            self.assertEqual(self.parsed_items[path], [f"a{i}", f"doc{i}"])
+
+        peak = 0
+        self.parsed_items = {}
+        await self._parse(parser_factory=_CountingParser)
+        self.assertEqual(peak, len(self.paths))
+
+    async def test_options(self):
+        """Tests that options of parse_fifo are passed on for every source: a
+        compressed source with a line over limit, which is skipped.
+        """
+        await self._parse(
+            compress=gzip.compress, padding=f"<!--{'x' * 2048}-->\n",
+            compression="gzip", limit=1024, overflow="skip",
+            )
+        for i, path in enumerate(self.paths):
+            self.assertEqual(self.parsed_items[path], [f"a{i}", f"doc{i}"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import asyncio
+import errno
+import os
+
+from parser_api.base_parser import BaseParser
+from parser_api.error import FormatError
+from parser_api.xml_base_parser import XmlBaseParser
+
+
+async def a_pass(item):
+    """Asynchronous version of pass for use in callbacks."""
+    pass
+
+
+class LineParser(BaseParser):
+    """A parser emitting every line without its line end."""
+
+    async def _parse_line(self, line: str) -> None:
+        await self._emit_results([line.rstrip("\n")])
+
+
+class UpperParser(BaseParser):
+    """A parser emitting upper-cased lines along with the worker pid."""
+
+    async def _parse_line(self, line: str) -> None:
+        await self._emit_results([(line.strip().upper(), os.getpid())])
+
+
+class StrictParser(UpperParser):
+    """A parser failing on lines starting with "!"."""
+
+    async def _parse_line(self, line: str) -> None:
+        if line.startswith("!"):
+            raise FormatError(f"Unexpected line: {line!r}.")
+        await super()._parse_line(line)
+
+
+class TagParser(XmlBaseParser):
+    """An XML parser emitting tags of the elements it receives."""
+
+    async def _parse_xml(self, event, element) -> None:
+        await self._emit_results([element.tag])
+
+
+def memory_stream(data: bytes) -> asyncio.StreamReader:
+    """Returns a StreamReader holding the given data followed by EOF."""
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader
+
+
+async def write_fifo(path: str, data: bytes) -> None:
+    """Writes data to a named pipe once its reader is open, then hangs up."""
+    while True:
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+            break
+        except OSError as e:
+            if e.errno != errno.ENXIO:
+                raise
+            await asyncio.sleep(0.01)
+    try:
+        os.set_blocking(fd, True)
+        os.write(fd, data)
+    finally:
+        os.close(fd)
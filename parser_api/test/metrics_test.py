@@ -0,0 +1,78 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from parser_api.base_parser import BaseParser
+from parser_api.error import FormatError
+from parser_api.metrics import LatencyHistogram, ParserMetrics
+from helpers import a_pass, memory_stream
+
+
+class _MetricsParser(BaseParser):
+    """A parser emitting each line it receives, failing on 'bad' lines."""
+
+    async def _parse_line(self, line: str) -> None:
+        if line.startswith("bad"):
+            raise FormatError("bad line")
+        await self._emit_results([line, line])
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    """Tests for LatencyHistogram."""
+
+    def test_percentiles(self):
+        """Tests that percentiles fall into the right buckets."""
+        histogram = LatencyHistogram()
+        for duration in [100] * 98 + [5000, 1000000]:
+            histogram.add(duration)
+        self.assertEqual(histogram.count, 100)
+        self.assertEqual(histogram.max_ns, 1000000)
+        self.assertEqual(histogram.percentile(0.5), 127)
+        self.assertEqual(histogram.percentile(0.99), 8191)
+        self.assertEqual(histogram.percentile(1.0), 1000000)
+        self.assertEqual(LatencyHistogram().snapshot()["p99"], 0.0)
+
+
+class TestParserMetrics(unittest.IsolatedAsyncioTestCase):
+    """Tests for ParserMetrics updated by BaseParser."""
+
+    async def asyncSetUp(self) -> None:
+        self.metrics = ParserMetrics()
+        self.parser = _MetricsParser(a_pass, metrics=self.metrics)
+
+    async def test_counters(self):
+        """Tests counters in line-by-line and chunked modes."""
+        await self.parser.parse_stream(memory_stream(b"a\nb\nc\n"))
+        await self.parser.parse_stream(memory_stream(b"a\nb\nc"), chunk_size=4)
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot["bytes_read"], 11)
+        self.assertEqual(snapshot["lines_parsed"], 6)
+        self.assertEqual(snapshot["records_emitted"], 12)
+        self.assertEqual(snapshot["eofs"], 2)
+        self.assertEqual(snapshot["latency"]["callback"]["count"], 6)
+        self.assertEqual(snapshot["latency"]["parse"]["count"], 5)
+        self.assertEqual(snapshot["latency"]["read"]["count"], 7)
+
+    async def test_errors(self):
+        """Tests that parse errors are counted by class."""
+        with self.assertRaises(FormatError):
+            await self.parser.parse_stream(memory_stream(b"a\nbad\n"))
+        self.assertEqual(self.metrics.snapshot()["errors"], {"FormatError": 1})
+
+    async def test_dump_periodically(self):
+        """Tests periodic dumps of snapshots to a file."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "metrics.jsonl")
+            task = asyncio.create_task(self.metrics.dump_periodically(0.01, path))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with open(path) as file:
+                snapshots = [json.loads(line) for line in file]
+        self.assertGreater(len(snapshots), 1)
+        self.assertEqual(snapshots[0]["lines_parsed"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
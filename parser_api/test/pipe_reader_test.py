@@ -36,5 +36,22 @@ class TestGetStreamReader(unittest.IsolatedAsyncioTestCase):
         file.close()
 
 
+class TestGetStreamReaderLimit(unittest.IsolatedAsyncioTestCase):
+    """Tests for get_stream_reader with a buffer limit."""
+
+    async def test_limit(self):
+        """Tests that the limit is applied to lines read from the pipe."""
+        read_fd, write_fd = os.pipe()
+        file = os.fdopen(read_fd)
+        reader, transport = await get_stream_reader(file, limit=8)
+        os.write(write_fd, b"abc\n" + b"x" * 20 + b"\n")
+        os.close(write_fd)
+        self.assertEqual(await reader.readline(), b"abc\n")
+        with self.assertRaises(ValueError):
+            await reader.readline()
+        transport.close()
+        file.close()
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -8,4 +8,6 @@ echo 'abcdefg' | PYTHONPATH={$PYTHONPATH}:`pwd`/../.. python3 -m unittest pipe_r
 echo 'gfedcba' > test_fifo &
 PYTHONPATH={$PYTHONPATH}:`pwd`/../.. python3 -m unittest pipe_reader_test.TestGetStreamReader.test_get_fifo_reader
 
+PYTHONPATH={$PYTHONPATH}:`pwd`/../.. python3 -m unittest pipe_reader_test.TestGetStreamReaderLimit
+
 rm test_fifo
@@ -0,0 +1,211 @@
+import os
+import tempfile
+import unittest
+
+from parser_api.base_parser import Position, read_checkpoint
+from parser_api.error import FormatError
+from parser_api.metrics import ParserMetrics
+from parser_api.process_pool_parser import ProcessPoolParser
+from helpers import StrictParser, UpperParser, memory_stream
+
+
+class StrictBatchParser(StrictParser):
+    """A parser failing on lines starting with "!", which parses batches of lines at once."""
+
+    async def _parse_lines(self, lines) -> None:
+        for line in lines:
+            await self._parse_line(line)
+
+
+class TestProcessPoolParser(unittest.IsolatedAsyncioTestCase):
+    """Tests for ProcessPoolParser."""
+
+    async def _in_test_callback(self, items):
+        """Callback function for use in tests."""
+        self.parsed_items.extend(items)
+
+    async def asyncSetUp(self) -> None:
+        self.parsed_items = []
+        self.parser = ProcessPoolParser(
+            UpperParser, self._in_test_callback, workers=2, lines_per_batch=7, max_in_flight=3,
+            )
+
+    async def asyncTearDown(self) -> None:
+        self.parser.close()
+
+    async def test_order_preserved(self):
+        """Tests that results are delivered in input order."""
+        lines = [f"line{i}" for i in range(1000)]
+        data = "".join(f"{line}\n" for line in lines).encode()
+        await self.parser.parse_stream(memory_stream(data))
+        self.assertEqual([item for item, _ in self.parsed_items], [line.upper() for line in lines])
+        self.assertNotIn(os.getpid(), {pid for _, pid in self.parsed_items})
+
+    async def test_chunked(self):
+        """Tests ProcessPoolParser with parse_stream in chunked mode."""
+        lines = [f"line{i}" for i in range(100)]
+        data = "".join(f"{line}\n" for line in lines).encode()
+        await self.parser.parse_stream(memory_stream(data), chunk_size=64)
+        self.assertEqual([item for item, _ in self.parsed_items], [line.upper() for line in lines])
+
+    async def test_parse_file(self):
+        """Tests that ranges of a file are parsed in parallel, in file order."""
+        lines = [f"line{i}" for i in range(1000)]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "input.txt")
+            with open(path, "w") as file:
+                file.write("".join(f"{line}\n" for line in lines))
+            await self.parser.parse_file(path, range_size=100)
+        self.assertEqual([item for item, _ in self.parsed_items], [line.upper() for line in lines])
+        self.assertNotIn(os.getpid(), {pid for _, pid in self.parsed_items})
+
+    async def test_parse_file_metrics(self):
+        """Tests that metrics are updated as ranges of a file are collected."""
+        metrics = ParserMetrics()
+        parser = ProcessPoolParser(UpperParser, self._in_test_callback, workers=2, metrics=metrics)
+        self.addCleanup(parser.close)
+        data = b"".join(b"line%d\n" % i for i in range(100))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "input.txt")
+            with open(path, "wb") as file:
+                file.write(data)
+            await parser.parse_file(path, range_size=100)
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["bytes_read"], len(data))
+        self.assertEqual(snapshot["lines_parsed"], 100)
+        self.assertEqual(snapshot["records_emitted"], 100)
+        self.assertEqual(snapshot["eofs"], 1)
+
+
+class TestProcessPoolParserErrors(unittest.IsolatedAsyncioTestCase):
+    """Tests for handling of input errors raised by workers of ProcessPoolParser."""
+
+    DATA = b"a\nb\n!c\nd\ne\nf\ng\n!h\n"
+
+    async def _in_test_callback(self, items):
+        """Callback function for use in tests."""
+        self.parsed_items.extend(item for item, _ in items)
+
+    async def _error_sink(self, items):
+        """Error sink for use in tests."""
+        self.quarantined.extend(items)
+
+    def _parser(self, **kwargs) -> ProcessPoolParser:
+        parser = ProcessPoolParser(
+            StrictParser, self._in_test_callback, workers=1, lines_per_batch=3, max_in_flight=1, **kwargs,
+            )
+        self.addCleanup(parser.close)
+        return parser
+
+    async def asyncSetUp(self) -> None:
+        self.parsed_items = []
+        self.quarantined = []
+
+    async def test_quarantine(self):
+        """Tests that failed batches are quarantined with their offsets and line numbers,
+        and that batches following them are not lost.
+        """
+        for chunk_size in (None, 5):
+            self.parsed_items = []
+            self.quarantined = []
+            parser = self._parser(errors="quarantine", error_sink=self._error_sink)
+            await parser.parse_stream(memory_stream(self.DATA), chunk_size=chunk_size)
+            self.assertEqual(self.parsed_items, ["A", "B", "D", "E", "F", "G"], f"chunk_size = {chunk_size}")
+            self.assertEqual(
+                [(item.data, item.offset, item.line) for item in self.quarantined],
+                [(b"!c\n", 4, 2), (b"!h\n", 15, 7)],
+                f"chunk_size = {chunk_size}",
+                )
+            self.assertEqual(parser.error_counts, {"FormatError": 2})
+
+    async def test_quarantine_file(self):
+        """Tests that failed ranges of a file are quarantined with their offsets and line numbers."""
+        parser = self._parser(errors="quarantine", error_sink=self._error_sink)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "input.txt")
+            with open(path, "wb") as file:
+                file.write(self.DATA)
+            await parser.parse_file(path, range_size=6)
+        self.assertEqual(self.parsed_items, ["A", "B", "D", "E", "F", "G"])
+        self.assertEqual(
+            [(item.data, item.offset, item.line) for item in self.quarantined],
+            [(b"!c\n", 4, 2), (b"!h\n", 15, 7)],
+            )
+        self.assertEqual(parser.error_counts, {"FormatError": 2})
+
+    async def test_quarantine_batch(self):
+        """Tests that failed batches are quarantined whole if the worker parser overrides _parse_lines."""
+        parser = ProcessPoolParser(
+            StrictBatchParser, self._in_test_callback, workers=1, lines_per_batch=3, max_in_flight=1,
+            errors="quarantine", error_sink=self._error_sink,
+            )
+        self.addCleanup(parser.close)
+        await parser.parse_stream(memory_stream(self.DATA), chunk_size=5)
+        self.assertEqual(self.parsed_items, ["A", "B", "D", "E", "F", "G"])
+        self.assertEqual(
+            [(item.data, item.offset, item.line) for item in self.quarantined],
+            [(b"a\nb\n!c\n", 0, 0), (b"g\n!h\n", 13, 6)],
+            )
+
+    async def test_abort(self):
+        """Tests that an error of a worker is raised once, by the abort policy."""
+        parser = self._parser()
+        with self.assertRaises(FormatError):
+            await parser.parse_stream(memory_stream(self.DATA))
+        self.assertEqual(parser.error_counts, {"FormatError": 1})
+
+
+class TestProcessPoolParserCheckpoints(unittest.IsolatedAsyncioTestCase):
+    """Tests for ProcessPoolParser checkpoints."""
+
+    async def _in_test_callback(self, items):
+        """Callback function for use in tests, failing on fail_on."""
+        self.checkpoints.append(self.parser.checkpoint)
+        if self.fail_on in (item for item, _ in items):
+            raise RuntimeError("Callback failed.")
+        self.parsed_items.extend(item for item, _ in items)
+
+    def _parser(self, **kwargs) -> ProcessPoolParser:
+        self.parser = ProcessPoolParser(
+            UpperParser, self._in_test_callback, workers=1, lines_per_batch=1, max_in_flight=1, **kwargs,
+            )
+        self.addCleanup(self.parser.close)
+        return self.parser
+
+    async def asyncSetUp(self) -> None:
+        self.parsed_items = []
+        self.checkpoints = []
+        self.fail_on = None
+
+    async def test_checkpoint(self):
+        """Tests that checkpoint does not pass results pending in the pool, in both parsing modes."""
+        for chunk_size in (None, 2):
+            self.checkpoints = []
+            parser = self._parser(batch_size=2, checkpoints=True)
+            await parser.parse_stream(memory_stream(b"a\nb\nc\n"), chunk_size=chunk_size)
+            self.assertEqual(self.checkpoints, [(0, 0), (4, 2)], f"chunk_size = {chunk_size}")
+            self.assertEqual(parser.checkpoint, Position(6, 3))
+
+    async def test_resume(self):
+        """Tests resuming parsing of a file from the checkpoint saved before a failure."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "input.txt")
+            state_file = os.path.join(tmp_dir, "state")
+            with open(path, "wb") as file:
+                file.write(b"a\nb\nc\nd\ne\n")
+
+            self.fail_on = "D"
+            parser = self._parser(state_file=state_file, checkpoint_interval=0)
+            with self.assertRaises(RuntimeError):
+                await parser.parse_file(path, range_size=1)
+            self.assertEqual(read_checkpoint(state_file), Position(6, 3))
+
+            self.fail_on = None
+            parser = self._parser(state_file=state_file)
+            await parser.parse_file(path, range_size=1, resume=True)
+            self.assertEqual(read_checkpoint(state_file), Position(10, 5))
+        self.assertEqual(self.parsed_items, ["A", "B", "C", "D", "E"])
+
+
+if __name__ == "__main__":
+    unittest.main()
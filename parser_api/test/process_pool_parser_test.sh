@@ -0,0 +1,3 @@
+#!/bin/bash
+
+PYTHONPATH={$PYTHONPATH}:`pwd`/../.. python3 -m unittest process_pool_parser_test
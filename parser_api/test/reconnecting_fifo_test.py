@@ -0,0 +1,75 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+
+from parser_api.metrics import ParserMetrics
+from parser_api.reconnecting_fifo import ReconnectingFifo
+from helpers import TagParser, write_fifo
+
+
+class TestReconnectingFifo(unittest.IsolatedAsyncioTestCase):
+    """Tests for ReconnectingFifo and BaseParser.parse_fifo(reconnect=True)."""
+
+    async def _in_test_callback(self, items):
+        """Callback function for use in tests."""
+        self.parsed_items.extend(items)
+
+    async def asyncSetUp(self) -> None:
+        self.parsed_items = []
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "test_fifo")
+        os.mkfifo(self.path)
+
+    async def asyncTearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    async def _wait_for(self, count: int) -> None:
+        """Waits until the given number of items is parsed."""
+        for _ in range(200):
+            if len(self.parsed_items) >= count:
+                return
+            await asyncio.sleep(0.01)
+
+    async def test_parser_state_kept(self):
+        """Tests that an XML document written by several writers is parsed as one."""
+        metrics = ParserMetrics()
+        parser = TagParser(self._in_test_callback, metrics=metrics)
+        task = asyncio.ensure_future(parser.parse_fifo(self.path, reconnect=True))
+        try:
+            await write_fifo(self.path, b"<root>\n<a/>\n")
+            await self._wait_for(1)
+            await write_fifo(self.path, b"<b>te")
+            await asyncio.sleep(0.05)
+            await write_fifo(self.path, b"xt</b>\n")
+            await self._wait_for(2)
+            await write_fifo(self.path, b"</root>\n")
+            await self._wait_for(3)
+        finally:
+            task.cancel()
+        self.assertEqual(self.parsed_items, ["a", "b", "root"])
+        self.assertGreaterEqual(metrics.reconnects, 3)
+
+    async def test_idle_wait(self):
+        """Tests that waiting for the next writer does not busy-poll."""
+        fifo = await ReconnectingFifo().open(self.path)
+        with fifo as reader:
+            await write_fifo(self.path, b"abc\n")
+            self.assertEqual(await reader.readline(), b"abc\n")
+            await asyncio.sleep(0.05)
+            self.assertEqual(fifo.reconnects, 1)
+
+            started = time.process_time()
+            await asyncio.sleep(0.3)
+            self.assertLess(time.process_time() - started, 0.1)
+            self.assertEqual(fifo.reconnects, 1)
+
+            await write_fifo(self.path, b"def\n")
+            self.assertEqual(await reader.readline(), b"def\n")
+        self.assertTrue(fifo.is_closed())
+        self.assertEqual(await reader.read(), b"")
+
+
+if __name__ == "__main__":
+    unittest.main()
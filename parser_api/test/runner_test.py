@@ -0,0 +1,117 @@
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+
+from parser_api import runner
+from parser_api.benchmark.loops import compare_loops
+from parser_api.pipe_reader import get_stream_reader, get_stream_writer
+from helpers import LineParser
+
+STDIN_SCRIPT = """
+import sys
+from parser_api import runner
+from parser_api.base_parser import BaseParser
+
+class LineParser(BaseParser):
+    async def _parse_line(self, line):
+        await self._emit_results([line])
+
+async def a_print(items):
+    for item in items:
+        print(item.strip().upper())
+
+runner.run(LineParser(a_print).parse_stdin(), sys.argv[1])
+"""
+
+
+class TestRunner(unittest.TestCase):
+    """Tests for event loop selection, parametrized over the available loops."""
+
+    def setUp(self) -> None:
+        self.parsed_items = []
+
+    def tearDown(self) -> None:
+        runner.select_loop("asyncio")
+
+    async def _in_test_callback(self, items):
+        """Callback function for use in tests."""
+        self.parsed_items.extend(items)
+
+    def test_select_loop(self):
+        """Tests selection of the event loop."""
+        self.assertEqual(runner.available_loops()[-1], "asyncio")
+        self.assertEqual(runner.select_loop(), runner.available_loops()[0])
+        with self.assertRaises(ValueError):
+            runner.select_loop("no such loop")
+        for name in runner.available_loops():
+            with self.subTest(loop=name):
+                self.assertEqual(runner.select_loop(name), name)
+                self.assertEqual(runner.selected_loop(), name)
+                self.assertIsInstance(asyncio.get_event_loop_policy(), runner.LOOPS[name])
+                self.assertEqual(runner.run(asyncio.sleep(0, "result"), name), "result")
+
+    def test_parse_fifo(self):
+        """Tests AsyncFifo and BaseParser.parse_fifo on every loop."""
+
+        def _write(path: str) -> None:
+            with open(path, "wb") as fifo:  # Blocks until the parser opens the pipe
+                fifo.write(b"a\nb\n")
+
+        for name in runner.available_loops():
+            with self.subTest(loop=name), tempfile.TemporaryDirectory() as tmp_dir:
+                self.parsed_items = []
+                path = os.path.join(tmp_dir, "test_fifo")
+                os.mkfifo(path)
+                writer = threading.Thread(target=_write, args=(path,))
+                writer.start()
+                parser = LineParser(self._in_test_callback)
+                loop = runner.new_event_loop(name)
+                try:
+                    loop.run_until_complete(asyncio.wait_for(parser.parse_fifo(path), 5))
+                finally:
+                    loop.close()
+                    writer.join()
+                self.assertEqual(self.parsed_items, ["a", "b"])
+
+    def test_pipes(self):
+        """Tests get_stream_reader and get_stream_writer on every loop."""
+
+        async def _copy() -> bytes:
+            read_fd, write_fd = os.pipe()
+            reader, transport = await get_stream_reader(os.fdopen(read_fd, "rb"))
+            writer = await get_stream_writer(os.fdopen(write_fd, "wb"))
+            writer.write(b"x" * 2 ** 20)
+            writer.close()
+            data = await reader.read()
+            transport.close()
+            return data
+
+        for name in runner.available_loops():
+            with self.subTest(loop=name):
+                self.assertEqual(runner.run(_copy(), name), b"x" * 2 ** 20)
+
+    def test_parse_stdin(self):
+        """Tests AsyncStdin and BaseParser.parse_stdin on every loop."""
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        for name in runner.available_loops():
+            with self.subTest(loop=name):
+                result = subprocess.run(
+                    [sys.executable, "-c", STDIN_SCRIPT, name],
+                    input=b"a\nb\n", stdout=subprocess.PIPE, env=env, check=True, timeout=30,
+                    )
+                self.assertEqual(result.stdout, b"A\nB\n")
+
+    def test_compare_loops(self):
+        """Tests a small loop comparison."""
+        results = compare_loops(["short_lines"], 2 ** 14)
+        self.assertEqual(len(results), 2 * len(runner.available_loops()))
+        self.assertEqual({item["loop"] for item in results}, set(runner.available_loops()))
+        self.assertTrue(all(item["lines_per_s"] > 0 for item in results))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import unittest
+
+from parser_api.error import ParserError
+from parser_api.sharded_parser import ShardedParser
+from helpers import StrictParser, UpperParser, memory_stream
+
+
+def _key(line: bytes) -> bytes:
+    """Returns the first field of a line."""
+    return line.split(b" ", 1)[0]
+
+
+class TestShardedParser(unittest.IsolatedAsyncioTestCase):
+    """Tests for ShardedParser."""
+
+    DATA = b"".join(b"k%d line %d\n" % (i % 5, i) for i in range(2000))
+
+    async def _in_test_callback(self, items):
+        """Callback function for use in tests."""
+        self.parsed_items.extend(items)
+
+    async def asyncSetUp(self) -> None:
+        self.parsed_items = []
+        self.parser = None
+
+    async def asyncTearDown(self) -> None:
+        if self.parser is not None:
+            self.parser.close()
+
+    async def test_round_robin(self):
+        """Tests that all the lines are parsed, by every shard."""
+        self.parser = ShardedParser(UpperParser, self._in_test_callback, shards=2, result_batch=100)
+        await self.parser.parse_stream(memory_stream(self.DATA), chunk_size=4096)
+        self.assertEqual(
+            sorted(line for line, _ in self.parsed_items),
+            sorted(line.upper() for line in self.DATA.decode().splitlines()),
+            )
+        self.assertEqual(len({pid for _, pid in self.parsed_items}), 2)
+        self.assertNotIn(os.getpid(), {pid for _, pid in self.parsed_items})
+
+    async def test_key(self):
+        """Tests that lines of a key go to one shard in input order."""
+        shard_items = [[], [], []]
+
+        def _shard_callback(index):
+            async def _callback(items):
+                shard_items[index].extend(items)
+            return _callback
+
+        self.parser = ShardedParser(
+            UpperParser, None, shards=3, key=_key, shard_callbacks=[_shard_callback(i) for i in range(3)],
+            )
+        await self.parser.parse_stream(memory_stream(self.DATA), chunk_size=1000)
+        self.assertEqual(sum(map(len, shard_items)), 2000)
+        for key in range(5):
+            expected = [line.upper() for line in self.DATA.decode().splitlines() if line.startswith(f"k{key} ")]
+            shards = [[line for line, _ in items if line.startswith(f"K{key} ")] for items in shard_items]
+            self.assertIn(expected, shards)
+
+    async def test_worker_error(self):
+        """Tests that a malformed line, failing a worker parser, fails parsing."""
+        self.parser = ShardedParser(StrictParser, self._in_test_callback, shards=2)
+        with self.assertRaises(ParserError):
+            await self.parser.parse_stream(memory_stream(b"a\n!\nb\n" * 10), chunk_size=6)
+
+    async def test_error_policy(self):
+        """Tests that error policies other than abort are rejected, since workers
+        cannot skip or quarantine malformed lines.
+        """
+        with self.assertRaises(ValueError):
+            ShardedParser(StrictParser, self._in_test_callback, errors="skip")
+        with self.assertRaises(ValueError):
+            ShardedParser(StrictParser, self._in_test_callback, errors="quarantine", error_sink=self._in_test_callback)
+        with self.assertRaises(ValueError):
+            ShardedParser(StrictParser, self._in_test_callback, error_sink=self._in_test_callback)
+
+    async def test_checkpoints(self):
+        """Tests that checkpoints are rejected, since results are not in input order."""
+        with self.assertRaises(ValueError):
+            ShardedParser(UpperParser, self._in_test_callback, checkpoints=True)
+        with self.assertRaises(ValueError):
+            ShardedParser(UpperParser, self._in_test_callback, state_file="state")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+from parser_api.shm_ring import AsyncShmRing, ShmRingWriter
+from helpers import LineParser
+
+
+def produce(name: str, fifo_dir: str, data: bytes, piece: int) -> None:
+    """Writes data to a ring in pieces of the given size, then closes it."""
+    with ShmRingWriter(name, fifo_dir) as writer:
+        for start in range(0, len(data), piece):
+            writer.write(data[start:start + piece])
+
+
+class TestAsyncShmRing(unittest.IsolatedAsyncioTestCase):
+    """Tests for AsyncShmRing, ShmRingWriter and BaseParser.parse_shm_ring."""
+
+    async def _in_test_callback(self, items):
+        """Callback function for use in tests."""
+        self.parsed_items.extend(items)
+
+    async def asyncSetUp(self) -> None:
+        self.parsed_items = []
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.name = f"parser_api_test_{os.getpid()}"
+
+    async def asyncTearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    async def _produce(self, data: bytes, piece: int) -> multiprocessing.Process:
+        """Starts a producer process once the ring exists."""
+        for _ in range(200):
+            if os.path.exists(os.path.join(self.tmp_dir.name, f"{self.name}.space")):
+                break
+            await asyncio.sleep(0.01)
+        process = multiprocessing.get_context("spawn").Process(
+            target=produce, args=(self.name, self.tmp_dir.name, data, piece),
+            )
+        process.start()
+        return process
+
+    async def _join(self, process: multiprocessing.Process) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, process.join, 10)
+        self.assertEqual(process.exitcode, 0)
+
+    async def test_read(self):
+        """Tests data passing through a small ring, wrapping around and filling it."""
+        data = bytes(range(256)) * 400
+        ring = await AsyncShmRing(chunk_size=1000).open(self.name, 4096, self.tmp_dir.name)
+        process = await self._produce(data, 3000)
+        with ring as reader:
+            received = await asyncio.wait_for(reader.read(), 10)
+        await self._join(process)
+        self.assertEqual(received, data)
+        self.assertTrue(ring.is_closed())
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir.name, f"{self.name}.data")))
+
+    async def test_parse_shm_ring(self):
+        """Tests parsing lines written to a ring, in line and chunked modes."""
+        data = b"".join(b"line %d\n" % i for i in range(1000))
+        for chunk_size in (None, 100):
+            with self.subTest(chunk_size=chunk_size):
+                self.parsed_items = []
+                parser = LineParser(self._in_test_callback)
+                parsing = asyncio.ensure_future(parser.parse_shm_ring(
+                    self.name, capacity=1024, fifo_dir=self.tmp_dir.name, chunk_size=chunk_size,
+                    ))
+                process = await self._produce(data, 500)
+                await asyncio.wait_for(parsing, 10)
+                await self._join(process)
+                self.assertEqual(self.parsed_items, [f"line {i}" for i in range(1000)])
+
+    async def test_open(self):
+        """Tests opening a ring twice and attaching to a missing one."""
+        ring = await AsyncShmRing().open(self.name, 1024, self.tmp_dir.name)
+        try:
+            with self.assertRaises(RuntimeError):
+                await ring.open(self.name, 1024, self.tmp_dir.name)
+            with self.assertRaises(FileExistsError):
+                await AsyncShmRing().open(self.name, 1024, self.tmp_dir.name)
+        finally:
+            ring.close()
+        with self.assertRaises(FileNotFoundError):
+            ShmRingWriter(self.name, self.tmp_dir.name)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from parser_api.sinks import CsvSerializer, FileSink, JsonlSerializer, PipeSink, RawSerializer
+from helpers import LineParser, memory_stream
+import unittest
+
+
+class TestSerializers(unittest.TestCase):
+    """Tests for sink serializers."""
+
+    def test_jsonl(self):
+        """Tests JSON lines serialization."""
+        data = JsonlSerializer()([{"a": 1}, "ä", [1, 2]])
+        self.assertEqual(data, '{"a": 1}\n"ä"\n[1, 2]\n'.encode())
+
+    def test_csv(self):
+        """Tests CSV serialization of dicts and sequences."""
+        serializer = CsvSerializer()
+        self.assertEqual(serializer([{"a": 1, "b": "x,y"}]), b'a,b\n1,"x,y"\n')
+        self.assertEqual(serializer([{"b": 2}]), b",2\n")
+        self.assertEqual(CsvSerializer()([(1, 2), [3, 4]]), b"1,2\n3,4\n")
+
+    def test_raw(self):
+        """Tests raw serialization."""
+        self.assertEqual(RawSerializer()([b"a\n", "ä\n", 1]), "a\nä\n1".encode())
+
+
+class TestSinks(unittest.IsolatedAsyncioTestCase):
+    """Tests for sinks."""
+
+    DATA = b"".join(b"line %d\n" % i for i in range(20000))
+
+    async def test_file_sink(self):
+        """Tests that a parser writes all the records through a FileSink."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "out.jsonl")
+            async with await FileSink(buffer_size=4096).open(path) as sink:
+                await LineParser(sink).parse_stream(memory_stream(self.DATA))
+            with open(path) as file:
+                lines = [json.loads(line) for line in file]
+        self.assertEqual(lines, self.DATA.decode().splitlines())
+
+    async def test_pipe_sink_backpressure(self):
+        """Tests that writing to a pipe waits for a slow reader and loses nothing."""
+        read_fd, write_fd = os.pipe()
+        received = []
+
+        def _read() -> None:
+            time.sleep(0.2)
+            with os.fdopen(read_fd, "rb") as pipe:
+                while True:
+                    data = pipe.read(65536)
+                    if not data:
+                        break
+                    received.append(data)
+
+        reader = threading.Thread(target=_read)
+        reader.start()
+        sink = await PipeSink("raw").open(os.fdopen(write_fd, "wb"))
+        started = time.monotonic()
+        await sink([self.DATA * 20])
+        self.assertGreater(time.monotonic() - started, 0.1)
+        await sink.close()
+        await asyncio.get_running_loop().run_in_executor(None, reader.join)
+        self.assertEqual(b"".join(received), self.DATA * 20)
+
+    async def test_fifo_sink(self):
+        """Tests writing CSV to a named pipe."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "out_fifo")
+            os.mkfifo(path)
+            received = []
+
+            def _read() -> None:
+                with open(path, "rb") as fifo:
+                    received.append(fifo.read())
+
+            reader = threading.Thread(target=_read)
+            reader.start()
+            sink = await PipeSink(CsvSerializer(fieldnames=["n"])).open(path)
+            await sink([{"n": 1}, {"n": 2}])
+            await sink.close()
+            await asyncio.get_running_loop().run_in_executor(None, reader.join)
+        self.assertEqual(received, [b"n\n1\n2\n"])
+
+    async def test_not_a_fifo(self):
+        """Tests that PipeSink refuses paths which are not named pipes."""
+        with tempfile.NamedTemporaryFile() as file:
+            with self.assertRaises(TypeError):
+                await PipeSink().open(file.name)
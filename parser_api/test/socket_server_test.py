@@ -0,0 +1,96 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from parser_api.socket_server import ParserServer
+from helpers import LineParser
+
+
+async def send(writer: asyncio.StreamWriter, data: bytes) -> None:
+    """Sends data and closes the connection."""
+    writer.write(data)
+    await writer.drain()
+    writer.close()
+    await writer.wait_closed()
+
+
+class TestParserServer(unittest.IsolatedAsyncioTestCase):
+    """Tests for ParserServer over loopback."""
+
+    async def _in_test_callback(self, items):
+        """Callback function for use in tests."""
+        self.parsed_items.extend(items)
+
+    async def asyncSetUp(self) -> None:
+        self.parsed_items = []
+
+    async def _wait_for(self, server: ParserServer, connections: int) -> None:
+        """Waits until the given number of connections is parsed."""
+        for _ in range(200):
+            if server.connections + server.rejected >= connections and not server.active:
+                return
+            await asyncio.sleep(0.01)
+
+    async def test_tcp(self):
+        """Tests that every TCP connection is parsed by its own parser."""
+        server = ParserServer(LineParser, self._in_test_callback, limit=2 ** 20, recv_buffer=2 ** 16)
+        async with await server.start_tcp("127.0.0.1"):
+            port = server.sockets[0].getsockname()[1]
+            connections = [await asyncio.open_connection("127.0.0.1", port) for _ in range(5)]
+            # Incomplete lines of different connections must not be mixed up
+            for i, (_, writer) in enumerate(connections):
+                writer.write(b"conn %d " % i)
+                await writer.drain()
+            for i, (_, writer) in enumerate(connections):
+                await send(writer, b"line\n" + b"x" * 100000 + b"\n")
+            await self._wait_for(server, 5)
+        self.assertEqual(server.connections, 5)
+        self.assertEqual(sorted(item for item in self.parsed_items if item.startswith("conn")),
+                         [f"conn {i} line" for i in range(5)])
+        self.assertEqual(len(self.parsed_items), 10)
+
+    async def test_unix_shared_parser(self):
+        """Tests parsing of Unix domain socket connections by a shared parser."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "test_socket")
+            server = ParserServer(parser=LineParser(self._in_test_callback), chunk_size=1024)
+            async with await server.start_unix(path):
+                for i in range(3):
+                    _, writer = await asyncio.open_unix_connection(path)
+                    await send(writer, b"a%d\nb%d\n" % (i, i))
+                await self._wait_for(server, 3)
+        self.assertEqual(sorted(self.parsed_items), ["a0", "a1", "a2", "b0", "b1", "b2"])
+
+    async def test_max_connections(self):
+        """Tests that connections beyond the limit are rejected."""
+        server = ParserServer(LineParser, self._in_test_callback, max_connections=1)
+        async with await server.start_tcp("127.0.0.1"):
+            port = server.sockets[0].getsockname()[1]
+            _, first = await asyncio.open_connection("127.0.0.1", port)
+            first.write(b"first\n")
+            await first.drain()
+            await asyncio.sleep(0.05)
+            second_reader, second = await asyncio.open_connection("127.0.0.1", port)
+            self.assertEqual(await second_reader.read(), b"")  # Closed by the server
+            await send(first, b"")
+            await self._wait_for(server, 2)
+        self.assertEqual((server.connections, server.rejected), (1, 1))
+        self.assertEqual(self.parsed_items, ["first"])
+
+    async def test_connection_error(self):
+        """Tests that an error in a connection does not stop the server."""
+        server = ParserServer(LineParser, self._in_test_callback, limit=16)
+        async with await server.start_tcp("127.0.0.1"):
+            port = server.sockets[0].getsockname()[1]
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            await send(writer, b"x" * 100 + b"\n")
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            await send(writer, b"ok\n")
+            await self._wait_for(server, 2)
+        self.assertEqual(server.errors, 1)
+        self.assertEqual(self.parsed_items, ["ok"])
+
+
+if __name__ == "__main__":
+    unittest.main()
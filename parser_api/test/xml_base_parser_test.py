@@ -1,13 +1,15 @@
 import asyncio
+import itertools
+import os
+import tempfile
 import xml.etree.ElementTree as ElementTree
+from parser_api.base_parser import Position, read_checkpoint
+from parser_api.record_schema import RecordSchema
 from parser_api.xml_base_parser import XmlBaseParser
+from parser_api.xml_engine import ENGINES
 import unittest
 from parser_api.error import FormatError
-
-
-async def a_pass(item):
-    """Asynchronous version of pass for use in callbacks."""
-    pass
+from helpers import a_pass
 
 
 class TestXmlBaseParser(unittest.IsolatedAsyncioTestCase):
@@ -155,6 +157,371 @@ class TestXmlBaseParserCustomParseXml(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(self.parsed_items[1].text, None)
 
 
+class _CollectingXmlParser(XmlBaseParser):
+    """An XML parser passing all the elements it receives to the callback."""
+
+    async def _parse_xml(self, event: str, element: ElementTree.Element) -> None:
+        await self._result_callback([element])
+
+
+class TestXmlBaseParserChunked(unittest.IsolatedAsyncioTestCase):
+    """Tests for XmlBaseParser.parse_stream() in chunked mode."""
+
+    async def _in_test_callback(self, items):
+        """Callback function for use in tests."""
+        self.parsed_items.extend(items)
+
+    async def asyncSetUp(self) -> None:
+        self.parsed_items = []
+        self.parser = _CollectingXmlParser(self._in_test_callback)
+
+    async def test_parse_stream(self):
+        """Tests XmlBaseParser.parse_stream() with chunk_size set."""
+        reader = asyncio.StreamReader()
+        reader.feed_data("<tag8>\n<tag7>tëst7</tag7>\n</tag8>\n".encode())
+        reader.feed_eof()
+        await self.parser.parse_stream(reader, chunk_size=3)
+        self.assertEqual([e.tag for e in self.parsed_items], ["tag7", "tag8"])
+        self.assertEqual(self.parsed_items[0].text, "tëst7")
+
+    async def test_declared_encoding(self):
+        """Tests that the encoding declared in the document is used to decode it."""
+        for chunk_size in (None, 5):
+            self.parsed_items = []
+            parser = _CollectingXmlParser(self._in_test_callback)
+            reader = asyncio.StreamReader()
+            reader.feed_data('<?xml version="1.0" encoding="ISO-8859-1"?>\n<a>tëst</a>\n'.encode("latin-1"))
+            reader.feed_eof()
+            await parser.parse_stream(reader, chunk_size=chunk_size)
+            self.assertEqual(self.parsed_items[0].text, "tëst")
+
+
+def _rss() -> int:
+    """Returns resident set size of the current process in bytes."""
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+class TestXmlBaseParserPrune(unittest.IsolatedAsyncioTestCase):
+    """Tests for XmlBaseParser with pruning of processed records."""
+
+    async def _in_test_callback(self, items):
+        """Callback function for use in tests."""
+        self.parsed_items.extend(items)
+
+    async def asyncSetUp(self) -> None:
+        self.parsed_items = []
+
+    async def test_prune_by_depth(self):
+        """Tests that children of the root are detached once parsed."""
+        parser = _CollectingXmlParser(self._in_test_callback, prune=True)
+        await parser._parse_line("<root><rec><a>1</a></rec><rec><a>2</a></rec></root>")
+        self.assertEqual([e.tag for e in self.parsed_items], ["a", "rec", "a", "rec", "root"])
+        self.assertEqual(len(self.parsed_items[-1]), 0)
+        self.assertEqual(len(self.parsed_items[1]), 0)
+
+    async def test_prune_by_tag(self):
+        """Tests that elements with the given tags are detached once parsed."""
+        parser = _CollectingXmlParser(self._in_test_callback, prune=True, record_tags=["a"])
+        await parser._parse_line("<root><rec><a>1</a><b>2</b></rec></root>")
+        rec = self.parsed_items[2]
+        self.assertEqual(rec.tag, "rec")
+        self.assertEqual([e.tag for e in rec], ["b"])
+        self.assertEqual(self.parsed_items[0].text, None)
+
+    @unittest.skipUnless(os.path.exists("/proc/self/statm"), "requires /proc/self/statm")
+    async def test_rss_bounded(self):
+        """Tests that memory use stays bounded while streaming a large document.
+        Document size can be set via PARSER_API_RSS_TEST_BYTES environment variable.
+        """
+
+        class _CountingXmlParser(XmlBaseParser):
+            count = 0
+
+            async def _parse_xml(self, event: str, element: ElementTree.Element) -> None:
+                self.count += 1
+
+        total = int(os.environ.get("PARSER_API_RSS_TEST_BYTES", 8 * 2 ** 20))
+        block = [f'<rec id="{i}"><v>{i}</v></rec>\n' for i in range(1000)]
+        block_size = sum(map(len, block))
+
+        parser = _CountingXmlParser(a_pass, prune=True)
+        await parser._parse_line("<root>\n")
+        start_rss = peak_rss = _rss()
+        fed = 0
+        while fed < total:
+            await parser._parse_lines(block)
+            fed += block_size
+            peak_rss = max(peak_rss, _rss())
+        await parser._parse_line("</root>\n")
+
+        self.assertGreater(parser.count, total // block_size * 2000)
+        self.assertLess(peak_rss - start_rss, 32 * 2 ** 20)
+
+
+class TestXmlBaseParserResync(unittest.IsolatedAsyncioTestCase):
+    """Tests for resynchronization of XmlBaseParser after malformed XML."""
+
+    DOCUMENT = (
+        b'<?xml version="1.0"?>\n'
+        b'<feed xmlns:x="http://example.com/x">\n'
+        b'<rec id="1"><x:a>1</x:a></rec>\n'
+        b'<rec id="2"><x:a>2</rec>\n'
+        b'<rec id="3">\n'
+        b'<x:a>3</b>\n'
+        b'</rec>\n'
+        b'<rec id="4"><x:a>4</x:a></rec>\n'
+        b'</feed>\n'
+        )
+
+    async def _in_test_callback(self, items):
+        """Callback function for use in tests."""
+        self.parsed_items.extend(items)
+
+    async def _error_sink(self, items):
+        """Error sink for use in tests."""
+        self.quarantined.extend(items)
+
+    async def test_resync(self):
+        """Tests that parsing goes on with the next record after malformed XML with every
+        engine, in both parsing modes.
+        """
+        document = self.DOCUMENT
+        for engine, chunk_size in itertools.product(ENGINES, (None, 4096)):
+            self.parsed_items = []
+            self.quarantined = []
+            parser = _CollectingXmlParser(
+                self._in_test_callback, engine=engine, errors="quarantine", error_sink=self._error_sink,
+                )
+            reader = asyncio.StreamReader()
+            reader.feed_data(document)
+            reader.feed_eof()
+            await parser.parse_stream(reader, chunk_size=chunk_size)
+            await parser.close()
+            records = [element for element in self.parsed_items if element.tag == "rec"]
+            message = f"engine = {engine}, chunk_size = {chunk_size}"
+            self.assertEqual([element.get("id") for element in records], ["1", "4"], message)
+            self.assertEqual(records[1][0].tag, "{http://example.com/x}a", message)
+            self.assertEqual(
+                [(item.data, item.error, item.offset, item.line) for item in self.quarantined],
+                [
+                    (b'<rec id="2"><x:a>2</rec>\n', FormatError, document.index(b'<rec id="2">'), 3),
+                    (b"<x:a>3</b>\n", FormatError, document.index(b"<x:a>3"), 5),
+                    (b"</rec>\n", FormatError, document.index(b"</rec>\n<rec id=\"4\">"), 6),
+                    ],
+                message,
+                )
+            self.assertEqual(parser.error_counts, {"FormatError": 2}, message)
+
+    async def test_record_tags(self):
+        """Tests that lines are dropped up to a start tag of a record listed in record_tags."""
+        self.parsed_items = []
+        parser = _CollectingXmlParser(self._in_test_callback, record_tags=["rec"], errors="skip")
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"<feed>\n<rec><a>\n</b></rec>\n<a/>\n<rec>ok</rec>\n</feed>\n")
+        reader.feed_eof()
+        await parser.parse_stream(reader)
+        await parser.close()
+        self.assertEqual([element.text for element in self.parsed_items if element.tag == "rec"], ["ok"])
+
+
+class _RecordXmlParser(XmlBaseParser):
+    """An XML parser emitting ids of "rec" elements, failing on fail_on."""
+
+    fail_on = None
+
+    async def _parse_xml(self, event: str, element: ElementTree.Element) -> None:
+        if element.tag == "rec":
+            if element.get("id") == self.fail_on:
+                raise RuntimeError("Parsing failed.")
+            await self._emit_results([element.get("id")])
+
+
+class TestXmlBaseParserCheckpoints(unittest.IsolatedAsyncioTestCase):
+    """Tests for checkpoints of XmlBaseParser."""
+
+    DOCUMENT = (
+        b'<?xml version="1.0"?>\n'
+        b'<feed xmlns:x="http://example.com/x">\n'
+        b'<rec id="1"><x:a>1</x:a></rec>\n'
+        b'<rec id="2">\n'
+        b'<x:a>2</x:a>\n'
+        b'</rec>\n'
+        b'<rec id="3">\n'
+        b'<x:a>3</x:a></rec><rec id="4"/>\n'
+        b'</feed>\n'
+        )
+
+    async def _in_test_callback(self, items):
+        """Callback function for use in tests."""
+        self.parsed_items.extend(items)
+
+    async def test_resume(self):
+        """Tests that checkpoints are aligned to records and parsing resumes from them with every engine."""
+        for engine in ENGINES:
+            self.parsed_items = []
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                path = os.path.join(tmp_dir, "test.xml")
+                state_file = os.path.join(tmp_dir, "test_state")
+                with open(path, "wb") as file:
+                    file.write(self.DOCUMENT)
+
+                parser = _RecordXmlParser(self._in_test_callback, engine=engine, state_file=state_file)
+                parser.fail_on = "3"
+                with self.assertRaises(RuntimeError):
+                    await parser.parse_file(path, range_size=1)
+                self.assertEqual(parser.position, Position(self.DOCUMENT.index(b"<rec id=\"3\">"), 6), engine)
+                parser.save_checkpoint()
+
+                parser = _RecordXmlParser(self._in_test_callback, engine=engine, state_file=state_file)
+                await parser.parse_file(path, range_size=1, resume=True)
+                await parser.close()
+                self.assertEqual(read_checkpoint(state_file), Position(self.DOCUMENT.index(b"</feed>"), 8), engine)
+            self.assertEqual(self.parsed_items, ["1", "2", "3", "4"], engine)
+
+    async def test_split_tag(self):
+        """Tests that no checkpoint is taken within a start tag split between lines."""
+        document = b'<feed>\n<rec id="1"/>\n<rec\n id="2"/>\n</feed>\n'
+        for engine in ENGINES:
+            self.parsed_items = []
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                path = os.path.join(tmp_dir, "test.xml")
+                state_file = os.path.join(tmp_dir, "test_state")
+                with open(path, "wb") as file:
+                    file.write(document)
+
+                parser = _RecordXmlParser(self._in_test_callback, engine=engine, state_file=state_file)
+                parser.fail_on = "2"
+                with self.assertRaises(RuntimeError):
+                    await parser.parse_file(path, range_size=1)
+                self.assertEqual(parser.position, Position(document.index(b"<rec\n"), 2), engine)
+                parser.save_checkpoint()
+
+                parser = _RecordXmlParser(self._in_test_callback, engine=engine, state_file=state_file)
+                await parser.parse_file(path, range_size=1, resume=True)
+                await parser.close()
+            self.assertEqual(self.parsed_items, ["1", "2"], engine)
+
+
+class TestXmlBaseParserSchema(unittest.IsolatedAsyncioTestCase):
+    """Tests for XmlBaseParser projecting records to a schema."""
+
+    DOCUMENT = (
+        b'<feed>\n'
+        b'<item id="1">note<name>one</name><price><amount>1.5</amount></price></item>\n'
+        b'<item id="2"><name>two</name></item>\n'
+        b'<item><price><amount>3</amount></price></item>\n'
+        b'</feed>\n'
+        )
+    SCHEMA = RecordSchema(
+        {"id": "@id", "name": "name", "price": "price/amount", "note": "."},
+        name="Item",
+        converters={"price": float},
+        )
+
+    async def _in_test_callback(self, items):
+        """Callback function for use in tests."""
+        self.parsed_items.append(items)
+
+    async def asyncSetUp(self) -> None:
+        self.parsed_items = []
+
+    async def _parse(self, **kwargs):
+        """Parses the document in chunked mode with a schema."""
+        parser = XmlBaseParser(self._in_test_callback, schema=self.SCHEMA, **kwargs)
+        reader = asyncio.StreamReader()
+        reader.feed_data(self.DOCUMENT)
+        reader.feed_eof()
+        await parser.parse_stream(reader, chunk_size=32)
+        await parser.close()
+
+    async def test_records(self):
+        """Tests records projected with every engine."""
+        item = self.SCHEMA.record_type
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                self.parsed_items = []
+                await self._parse(engine=engine)
+                records = [record for items in self.parsed_items for record in items]
+                self.assertEqual(records, [
+                    item("1", "one", 1.5, "note"),
+                    item("2", "two", None, None),
+                    item(None, None, 3.0, None),
+                    ])
+                self.assertIsInstance(records[0], item)
+
+    async def test_columnar(self):
+        """Tests records delivered in batches of columns."""
+        await self._parse(columnar=True, batch_size=2)
+        self.assertEqual(len(self.parsed_items), 2)
+        self.assertIsInstance(self.parsed_items[0], self.SCHEMA.columns_type)
+        self.assertEqual(self.parsed_items[0].id, ["1", "2"])
+        self.assertEqual(self.parsed_items[1].price, [3.0])
+        self.assertEqual(self.SCHEMA.columns([]).name, [])
+        with self.assertRaises(ValueError):
+            XmlBaseParser(self._in_test_callback, columnar=True)
+        with self.assertRaises(ValueError):
+            RecordSchema({"id": "@id"}, converters={"price": float})
+
+
+class TestXmlBaseParserSelect(unittest.IsolatedAsyncioTestCase):
+    """Tests for XmlBaseParser with selected elements."""
+
+    DOCUMENT = (
+        '<feed xmlns:x="http://example.com/x">'
+        '<rec id="1"><a>1</a><b>2</b></rec>'
+        '<other><rec id="2"><a>3</a></rec><x:c>4</x:c></other>'
+        '</feed>'
+        )
+
+    async def _in_test_callback(self, items):
+        """Callback function for use in tests."""
+        self.parsed_items.extend(items)
+
+    async def _parse(self, select, events=None, engine="etree"):
+        """Returns tags of the elements passed to _parse_xml for the document."""
+        self.parsed_items = []
+        parser = _CollectingXmlParser(self._in_test_callback, events=events, engine=engine, select=select)
+        for i in range(0, len(self.DOCUMENT), 10):
+            await parser._parse_line(self.DOCUMENT[i:i + 10])
+        await parser.close()
+        return [element.tag for element in self.parsed_items]
+
+    async def test_select(self):
+        """Tests selection by tag names and by paths with every engine."""
+        for engine in ENGINES:
+            self.assertEqual(await self._parse(["rec"], engine=engine), ["rec", "rec"], engine)
+            self.assertEqual(await self._parse(["feed/rec"], engine=engine), ["rec"], engine)
+            self.assertEqual(await self._parse(["/feed/other/rec", "a"], engine=engine), ["a", "a", "rec"], engine)
+            self.assertEqual(
+                await self._parse(["other/{http://example.com/x}c"], engine=engine),
+                [],
+                engine,
+                )
+            self.assertEqual(
+                await self._parse(["feed/other/{http://example.com/x}c"], engine=engine),
+                ["{http://example.com/x}c"],
+                engine,
+                )
+            self.assertEqual(
+                await self._parse(["rec"], events=["start", "end"], engine=engine),
+                ["rec", "rec", "rec", "rec"],
+                engine,
+                )
+
+    async def test_selected_subtree(self):
+        """Tests that selected elements are complete and the rest of the tree is freed."""
+        for engine in ENGINES:
+            await self._parse(["rec"], engine=engine)
+            self.assertEqual([e.tag for e in self.parsed_items[0]], ["a", "b"])
+            self.assertEqual(self.parsed_items[1].get("id"), "2")
+
+        parser = _CollectingXmlParser(self._in_test_callback, select=["feed/rec/a", "a"])
+        await parser._parse_line(self.DOCUMENT[:-len("</feed>")])
+        root = parser._engine._stack[0]
+        self.assertEqual(len(root), 0)
+
+
 if __name__ == "__main__":
     # logging.basicConfig(level=logging.DEBUG)
     unittest.main()
@@ -26,4 +26,16 @@ PYTHONPATH={$PYTHONPATH}:`pwd`/../.. python3 -m unittest xml_base_parser_test.Te
 
 PYTHONPATH={$PYTHONPATH}:`pwd`/../.. python3 -m unittest xml_base_parser_test.TestXmlBaseParserCustomParseXml.test_parse_stream
 
+PYTHONPATH={$PYTHONPATH}:`pwd`/../.. python3 -m unittest xml_base_parser_test.TestXmlBaseParserChunked
+
+PYTHONPATH={$PYTHONPATH}:`pwd`/../.. python3 -m unittest xml_base_parser_test.TestXmlBaseParserPrune
+
+PYTHONPATH={$PYTHONPATH}:`pwd`/../.. python3 -m unittest xml_base_parser_test.TestXmlBaseParserSelect
+
+PYTHONPATH={$PYTHONPATH}:`pwd`/../.. python3 -m unittest xml_base_parser_test.TestXmlBaseParserResync
+
+PYTHONPATH={$PYTHONPATH}:`pwd`/../.. python3 -m unittest xml_base_parser_test.TestXmlBaseParserCheckpoints
+
+PYTHONPATH={$PYTHONPATH}:`pwd`/../.. python3 -m unittest xml_base_parser_test.TestXmlBaseParserSchema
+
 rm test_fifo
@@ -0,0 +1,156 @@
+import asyncio
+import functools
+import xml.etree.ElementTree as ElementTree
+from parser_api.error import FormatError
+from parser_api.xml_base_parser import XmlBaseParser
+from parser_api.xml_engine import ElementTreeEngine, ExpatEngine, ENGINES
+import unittest
+
+FEED = (
+    b'<feed xmlns:x="urn:x">\n'
+    b'<rec id="1" kind="a" x:flag="y">one<b>bold</b> tail<i/></rec>\n'
+    b'<rec id="2" kind="b"><c>two</c></rec>\n'
+    b'<other><rec id="3">deep</rec></other>\n'
+    b'</feed>\n'
+    )
+
+
+def _describe(element: ElementTree.Element):
+    """Returns contents of the element, except for its tail."""
+    return element.tag, element.attrib, element.text, [ElementTree.tostring(child) for child in element]
+
+
+def _events(engine, data: bytes, step: int = 7):
+    """Returns (event, element contents) for all events of the engine fed with data in pieces."""
+    result = []
+    for i in range(0, len(data), step):
+        engine.feed(data[i:i + step])
+        result.extend((event, _describe(element)) for event, element in engine.read_events())
+    engine.close()
+    result.extend((event, _describe(element)) for event, element in engine.read_events())
+    return result
+
+
+class TestXmlEngines(unittest.TestCase):
+    """Tests for XML engines."""
+
+    def test_same_records(self):
+        """Tests that both engines build the same record elements."""
+        etree = [item for item in _events(ElementTreeEngine(["end"]), FEED) if item[1][0] == "rec"]
+        self.assertEqual(len(etree), 3)
+        for step in (1, 7, len(FEED)):
+            expat = _events(ExpatEngine(["end"], record_tags=["rec"]), FEED, step)
+            self.assertEqual([item for item in expat if item[1][0] == "rec"], etree)
+
+    def test_record_depth(self):
+        """Tests that the expat engine reports events of elements at record_depth and below."""
+        events = _events(ExpatEngine(["end"], record_depth=2), FEED)
+        self.assertEqual([contents[0] for _, contents in events], ["b", "i", "c", "rec"])
+        events = _events(ExpatEngine(["end"]), FEED)
+        self.assertEqual([contents[0] for _, contents in events], ["b", "i", "rec", "c", "rec", "rec", "other"])
+
+    def test_subtree_events(self):
+        """Tests that the expat engine reports events of record subtrees only."""
+        events = _events(ExpatEngine(["start", "end"], record_tags=["rec"]), FEED, step=1)
+        self.assertEqual(
+            [(event, contents[0]) for event, contents in events],
+            [("start", "rec"), ("start", "b"), ("end", "b"), ("start", "i"), ("end", "i"), ("end", "rec")]
+            + [("start", "rec"), ("start", "c"), ("end", "c"), ("end", "rec")]
+            + [("start", "rec"), ("end", "rec")],
+            )
+
+    def test_attributes(self):
+        """Tests attribute filtering and namespaced attributes of the expat engine."""
+        records = _read_records(ExpatEngine(["end"], record_tags=["rec"], attributes=["id"]))
+        self.assertEqual([element.attrib for element in records], [{"id": "1"}, {"id": "2"}, {"id": "3"}])
+        records = _read_records(ExpatEngine(["end"], record_tags=["rec"]))
+        self.assertEqual(records[0].attrib, {"id": "1", "kind": "a", "{urn:x}flag": "y"})
+
+    def test_prune(self):
+        """Tests that the ElementTree engine detaches records once they are consumed."""
+        engine = ElementTreeEngine(["end"], prune=True)
+        engine.feed(FEED)
+        for event, element in engine.read_events():
+            if element.tag == "feed":
+                self.assertEqual(len(element), 0)
+
+    def test_project(self):
+        """Tests that every engine reports records projected from complete record elements."""
+
+        def _project(element):
+            return element.get("id"), element.findtext("c"), len(element)
+
+        for name, engine_class in ENGINES.items():
+            engine = engine_class([], project=_project)
+            engine.feed(FEED)
+            engine.close()
+            self.assertEqual(
+                list(engine.read_events()),
+                [("record", ("1", None, 2)), ("record", ("2", "two", 1)), ("record", (None, None, 1))],
+                name,
+                )
+        engine = ElementTreeEngine(["end"], record_tags=["rec"], project=_project)
+        engine.feed(FEED)
+        for event, element in engine.read_events():
+            if event == "end" and element.tag == "feed":
+                self.assertEqual(len(element), 1)  # Only "other", without its record
+                self.assertEqual(len(element[0]), 0)
+
+    def test_errors(self):
+        """Tests that malformed and incomplete documents raise FormatError."""
+        for name, engine_class in ENGINES.items():
+            with self.assertRaises(FormatError, msg=name):
+                engine = engine_class(["end"])
+                engine.feed(b"<a><b></a>")
+                list(engine.read_events())
+            engine = engine_class(["end"])
+            engine.feed(b"<a><b></b>")
+            with self.assertRaises(FormatError, msg=name):
+                engine.close()
+
+    def test_unsupported_events(self):
+        """Tests that the expat engine rejects events it does not support."""
+        with self.assertRaises(ValueError):
+            ExpatEngine(["end", "comment"])
+
+
+def _read_records(engine):
+    """Returns "rec" elements reported by the engine fed with FEED."""
+    engine.feed(FEED)
+    engine.close()
+    return [element for _, element in engine.read_events() if element.tag == "rec"]
+
+
+class _RecordParser(XmlBaseParser):
+    """An XML parser collecting "rec" elements, for use in tests."""
+
+    async def _parse_xml(self, event: str, element: ElementTree.Element) -> None:
+        if element.tag == "rec":
+            await self._emit_results([element.get("id")])
+
+
+class TestXmlBaseParserEngines(unittest.IsolatedAsyncioTestCase):
+    """Tests for XmlBaseParser with different engines."""
+
+    async def _in_test_callback(self, items):
+        """Callback function for use in tests."""
+        self.parsed_items.extend(items)
+
+    async def test_engines(self):
+        """Tests that records are parsed the same by every engine."""
+        engines = dict(ENGINES, expat_id=functools.partial(ExpatEngine, attributes=["id"]))
+        for name, engine in engines.items():
+            for chunk_size in (None, 5):
+                self.parsed_items = []
+                parser = _RecordParser(self._in_test_callback, record_tags=["rec"], engine=engine)
+                reader = asyncio.StreamReader()
+                reader.feed_data(FEED)
+                reader.feed_eof()
+                await parser.parse_stream(reader, chunk_size=chunk_size)
+                await parser.close()
+                self.assertEqual(self.parsed_items, ["1", "2", "3"], name)
+
+    async def test_unknown_engine(self):
+        """Tests that an unknown engine name raises ValueError."""
+        with self.assertRaises(ValueError):
+            XmlBaseParser(self._in_test_callback, engine="lxml")
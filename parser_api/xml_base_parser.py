@@ -1,42 +1,304 @@
 #!/usr/bin/env python3
 
+import functools
+import re
 import xml.etree.ElementTree as ElementTree
-from typing import Union, List, Callable, Any, Awaitable
+from typing import Union, List, Callable, Any, Awaitable, Iterable, Optional
 import logging
 
-from parser_api.base_parser import BaseParser
-from parser_api.error import FormatError
+from parser_api.base_parser import BaseParser, Position
+from parser_api.error import InputError, FormatError
+from parser_api.record_schema import RecordSchema
+from parser_api.xml_engine import XmlEngine, ENGINES
 
 logger = logging.getLogger(__name__)
 
+# Beginning of a document up to the end of the root element start tag (group 1 is
+# the root tag): byte order mark, XML declaration, comments, processing instructions
+# and document type declaration
+_PROLOG = re.compile(
+    rb"(?:\xef\xbb\xbf)?(?:\s|<\?.*?\?>|<!--.*?-->|<!DOCTYPE[^\[>]*(?:\[.*?\])?\s*>)*"
+    rb"<([^\s/>?!]+)(?:\s+[^\s=/>]+\s*=\s*(?:\"[^\"]*\"|'[^']*'))*\s*>",
+    re.DOTALL,
+    )
+_MAX_PROLOG = 2 ** 16
+
+# Start tag at the beginning of a line, group 1 is its local name
+_LINE_START_TAG = re.compile(rb"\s*<(?:[^\s/>?!:]+:)?([^\s/>?!:]+)")
+
 
 class XmlBaseParser(BaseParser):
     """An XLM parser. Parses text to XML entities and passes them to _parse_xml method
     which should be implemented by subclasses.
+    Data read from streams is fed to the XML parser as raw bytes, so the encoding
+    declared in the document (UTF-8 by default) is used to decode it.
+    XML is parsed by an engine, see xml_engine.XmlEngine.
     """
 
+    _bytes_input = True
+
     def __init__(
             self,
-            result_callback: Callable[[List[Any]], Awaitable[None]],
+            result_callback: Optional[Callable[[List[Any]], Awaitable[None]]],
             events: Union[List[str], None] = None,
+            prune: bool = False,
+            record_tags: Optional[Iterable[str]] = None,
+            record_depth: Optional[int] = None,
+            engine: Union[str, Callable[..., XmlEngine]] = "etree",
+            select: Optional[Iterable[str]] = None,
+            schema: Optional[RecordSchema] = None,
+            columnar: bool = False,
+            **kwargs,
             ):
-        super().__init__(result_callback)
-        self._xml_parser = ElementTree.XMLPullParser(events)
+        """If prune is True, record elements are cleared and detached from their parent
+        once _parse_xml returns for their "end" event, so memory use stays flat on
+        unbounded documents. Elements with tags listed in record_tags, or located
+        at record_depth (the root element is at depth 0), are treated as records.
+        If neither is given, children of the root element are records.
+        engine is a name from xml_engine.ENGINES ("etree" or "expat") or a callable
+        returning an XmlEngine, e.g. functools.partial(ExpatEngine, attributes=["id"]).
+        If select is given, only events of the elements it lists are passed to _parse_xml,
+        without calling it for the others. Elements are listed by tag name, or by
+        path of tags from the root element separated by "/", e.g. "feed/record".
+        Elements outside selected subtrees are freed as soon as they are parsed by
+        the expat engine, and by the etree one if prune is True or select lists paths.
+        Other keyword arguments are passed to BaseParser.
+        If the error policy (see BaseParser) is not "abort", parsing resumes after
+        malformed XML with a new engine, which is fed the beginning of the document
+        up to the root element start tag. Lines up to the next one starting with
+        a start tag of a record (of any element unless record_tags is given) or
+        the root element end tag are dropped, and quarantined with their position if
+        the policy is "quarantine". This assumes
+        records are children of the root element. Batches of lines of chunked mode are
+        fed to the engine at once under the "abort" policy, and line by line otherwise.
+        If checkpoints are tracked (see BaseParser), they are only taken between
+        children of the root element, and parsing resumed from them starts with
+        the beginning of the document up to the root element start tag.
+        If schema is given, record elements are projected to records of the schema
+        as soon as they are parsed, and then cleared and detached from their parent,
+        as if prune was True. Records are passed to _parse_record, which emits them,
+        rather than to _parse_xml, which receives no events unless events are given.
+        If columnar is True too, every list of results is passed to result_callback
+        as columns of the schema (see RecordSchema.columns), which suits batching.
+        """
+        super().__init__(result_callback, **kwargs)
+        if columnar and schema is None:
+            raise ValueError("columnar requires schema.")
+        self._schema = schema
+        self._columnar = columnar
+        if isinstance(engine, str):
+            if engine not in ENGINES:
+                raise ValueError(f"Unknown XML engine: {engine!r}.")
+            engine = ENGINES[engine]
+        engine_kwargs = {"track_depth": True} if self._checkpoints else {}
+        if schema is not None:
+            engine_kwargs["project"] = schema.project
+        self._new_engine = functools.partial(
+            engine,
+            events or ([] if schema is not None else ["end"]),
+            prune=prune,
+            record_tags=record_tags,
+            record_depth=record_depth,
+            select=select,
+            **engine_kwargs,
+            )
+        self._engine = self._new_engine()
+        self._record_names = None
+        if record_tags:
+            self._record_names = {tag.rpartition("}")[2].encode() for tag in record_tags}
+        self._head = b""  # Beginning of the document, until the prolog is found
+        self._prolog = None
+        self._root_end = None
+        self._resync_error = None  # Error after which lines are dropped up to the next record
+        self._resync_position = None  # Position of the next line to drop, if known
+        self._in_markup = False  # Data fed to the engine ends within markup, e.g. a start tag
 
-    async def _parse_line(self, line: str) -> None:
+    async def _parse_line(self, line: Union[str, bytes]) -> None:
         """Parses a single line of data."""
 
-        self._xml_parser.feed(line)
-        try:
-            for event, element in self._xml_parser.read_events():
+        if self._prolog is None:
+            self._find_prolog(line)
+        if self._resync_error is not None and not await self._skip_to_record([line]):
+            return
+        if self._checkpoints:
+            self._track_markup([line])
+        self._engine.feed(line)
+        await self._read_events()
+
+    async def _parse_lines(self, lines: List[Union[str, bytes]]) -> None:
+        """Parses a batch of lines, collecting XML events once for the whole batch."""
+
+        if self._prolog is None:
+            for line in lines:
+                self._find_prolog(line)
+                if self._prolog is not None:
+                    break
+        if self._resync_error is not None:
+            lines = await self._skip_to_record(lines)
+        if self._checkpoints:
+            self._track_markup(lines)
+        feed = self._engine.feed
+        for line in lines:
+            feed(line)
+        await self._read_events()
+
+    async def _parse_batch(
+            self,
+            lines: List[Union[str, bytes]],
+            encoding: str,
+            offset: int,
+            number: int,
+            ) -> None:
+        """Passes a batch of lines to _parse_lines under the "abort" error policy,
+        and to _parse_line one by one otherwise, so that parsing resumes after
+        the failed line, see BaseParser._parse_batch.
+        """
+        if self._error_policy == "abort":
+            await super()._parse_batch(lines, encoding, offset, number)
+        else:
+            await self._parse_each_line(lines, encoding, offset, number)
+
+    async def _read_events(self) -> None:
+        """Passes XML events collected by the engine to _parse_xml, and records
+        to _parse_record.
+        """
+
+        debug = logger.isEnabledFor(logging.DEBUG)
+        for event, element in self._engine.read_events():
+            if event == "record":
+                if debug:
+                    logger.debug(f"record = {element}")
+                await self._parse_record(element)
+                continue
+            if debug:
                 logger.debug(
                     f"event = {event}, element = {element}, "
                     f"reconstructed xml = '{ElementTree.tostring(element)}'"
                     )
-                await self._parse_xml(event, element)
-        except ElementTree.ParseError as e:
-            raise FormatError(f"XML parsing error: {e}") from e
+            await self._parse_xml(event, element)
+
+    def _track_markup(self, lines: List[Union[str, bytes]]) -> None:
+        """Keeps whether the last "<" of lines about to be fed to the engine has no
+        matching ">", so that the engine has not seen the whole tag yet.
+        """
+        for line in reversed(lines):
+            brackets = ("<", ">") if isinstance(line, str) else (b"<", b">")
+            start = line.rfind(brackets[0])
+            end = line.rfind(brackets[1])
+            if start != end:  # Not both missing
+                self._in_markup = start > end
+                return
+
+    def _find_prolog(self, data: Union[str, bytes]) -> None:
+        """Collects the beginning of the document until the root element start tag."""
+
+        head = self._head + (data.encode() if isinstance(data, str) else data)
+        match = _PROLOG.match(head)
+        if match:
+            self._set_prolog(match)
+        elif len(head) > _MAX_PROLOG:
+            logger.warning("XML prolog not found, resynchronization will start a new document.")
+            self._prolog = b""
+            self._head = None
+        else:
+            self._head = head
+
+    def _set_prolog(self, match: re.Match) -> None:
+        """Keeps the beginning of the document matched by _PROLOG."""
+        self._prolog = match.group(0)
+        self._root_end = b"</" + match.group(1) + b">"
+        self._head = None
+
+    def _at_boundary(self) -> bool:
+        """Returns True between children of the root element, outside markup."""
+        return (
+            self._prolog is not None
+            and self._resync_error is None
+            and not self._in_markup
+            and self._engine.depth == 1
+            )
+
+    async def _on_resume(self, head: bytes) -> None:
+        """Feeds the beginning of the document up to the root element start tag to the engine."""
+
+        match = _PROLOG.match(head)
+        if not match:
+            raise FormatError("XML root element start tag not found, cannot resume.")
+        self._set_prolog(match)
+        self._engine.feed(self._prolog)
+
+    async def _handle_input_error(
+            self,
+            error: InputError,
+            data: bytes,
+            offset: Optional[int],
+            line: Optional[int],
+            ) -> None:
+        """Keeps the position following the failed input, where lines dropped by
+        resynchronization start, see BaseParser._handle_input_error.
+        """
+        self._resync_position = None
+        if offset is not None and line is not None:
+            self._resync_position = Position(offset + len(data), line + data.endswith(b"\n"))
+        await super()._handle_input_error(error, data, offset, line)
+
+    async def _on_input_error(self, error: InputError) -> None:
+        """Replaces the engine failed on malformed XML, see __init__."""
+
+        if not self._engine.failed:
+            return
+        logger.warning("XML engine failed, resynchronizing at the next record.")
+        self._engine = self._new_engine()
+        self._in_markup = False
+        if self._prolog is None:
+            self._prolog = b""
+            self._head = None
+        self._engine.feed(self._prolog)
+        self._resync_error = error
+
+    async def _skip_to_record(self, lines: List[Union[str, bytes]]) -> List[Union[str, bytes]]:
+        """Drops lines up to the next start tag of a record or end tag of the root
+        element, returns the rest.
+        """
+
+        index = 0
+        for line in lines:
+            data = line.encode() if isinstance(line, str) else line
+            match = _LINE_START_TAG.match(data)
+            if match and (self._record_names is None or match.group(1) in self._record_names):
+                break
+            if self._root_end and data.lstrip().startswith(self._root_end):
+                break
+            index += 1
+
+        if index:
+            data = b"".join(line.encode() if isinstance(line, str) else line for line in lines[:index])
+            offset, number = self._resync_position or (None, None)
+            if self._resync_position is not None:
+                self._resync_position = Position(offset + len(data), number + data.count(b"\n"))
+            if self._error_policy == "quarantine":
+                await self._quarantine(self._resync_error, data, offset, number)
+        if index < len(lines):
+            self._resync_error = None
+        return lines[index:]
+
+    async def close(self) -> None:
+        """Finishes the document, passing the remaining XML events to _parse_xml.
+        Raises FormatError if the document is incomplete.
+        """
+        self._engine.close()
+        await self._read_events()
 
     async def _parse_xml(self, event: str, element: ElementTree.Element) -> None:
         """Parses a single XML entity. Should be implemented by subclasses."""
         raise NotImplementedError
+
+    async def _parse_record(self, record: tuple) -> None:
+        """Parses a single record projected by the schema. Emits it by default."""
+        await self._emit_results([record])
+
+    async def _put_results(self, items: List[Any]) -> None:
+        """Passes results to BaseParser._put_results, as columns if columnar is set."""
+        if self._columnar:
+            items = self._schema.columns(items)
+        await super()._put_results(items)
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+import re
+import xml.etree.ElementTree as ElementTree
+from xml.parsers import expat
+from typing import Union, List, Iterable, Iterator, Optional, Tuple, Dict, Callable, Set, Any
+import logging
+
+from parser_api.error import FormatError
+
+logger = logging.getLogger(__name__)
+
+# A step of a path: a tag, possibly with a "{namespace}" prefix containing slashes
+_PATH_STEP = re.compile(r"(?:\{[^}]*\}|[^/{])+")
+
+
+def parse_select(select: Iterable[str]) -> Tuple[Set[str], Set[Tuple[str, ...]]]:
+    """Returns tag names and paths (tuples of tags from the root element) listed in select.
+    Items containing "/" are paths, e.g. "feed/record", the others are tag names.
+    """
+    tags = set()
+    paths = set()
+    for item in select:
+        steps = tuple(_PATH_STEP.findall(item))
+        if len(steps) > 1 or item.startswith("/"):
+            paths.add(steps)
+        else:
+            tags.add(item)
+    return tags, paths
+
+
+class XmlEngine:
+    """Interface of XML parsing backends used by XmlBaseParser.
+    Data is fed with feed, events (event name, element) collected so far are
+    taken with read_events and close finishes the document.
+    Malformed XML raises FormatError from any of the methods and sets failed,
+    the engine cannot be used any more then.
+    If project is given, it is called with every record element once the element
+    is complete, and its result is reported as a "record" event, after which the
+    element is cleared and freed.
+    """
+
+    def __init__(
+            self,
+            events: Iterable[str],
+            prune: bool = False,
+            record_tags: Optional[Iterable[str]] = None,
+            record_depth: Optional[int] = None,
+            select: Optional[Iterable[str]] = None,
+            track_depth: bool = False,
+            project: Optional[Callable[[ElementTree.Element], Any]] = None,
+            ):
+        """events are names of events to report. If track_depth is True, depth must
+        be known. See XmlBaseParser for the other arguments.
+        """
+        self._events = set(events)
+        self._prune = prune
+        self._record_tags = set(record_tags) if record_tags else None
+        if record_tags is None and record_depth is None:
+            record_depth = 1
+        self._record_depth = record_depth
+        self._select = select is not None
+        self._select_tags, self._select_paths = parse_select(select or [])
+        # Paths of open elements, tracked only if needed to evaluate select
+        self._paths = [()] if self._select_paths else None
+        self._track_depth = track_depth
+        self._project = project
+        self.failed = False
+
+    def feed(self, data: Union[str, bytes]) -> None:
+        """Feeds data to the engine."""
+        raise NotImplementedError
+
+    def read_events(self) -> Iterator[Tuple[str, ElementTree.Element]]:
+        """Returns an iterator over events collected since the last call."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Finishes the document. Remaining events can be taken with read_events."""
+        raise NotImplementedError
+
+    @property
+    def depth(self) -> Optional[int]:
+        """Number of elements open after the data fed so far, None if not known."""
+        return None
+
+    def _is_record(self, tag: str, depth: int) -> bool:
+        """Returns True if an element with the tag at the given depth is a record."""
+        if self._record_tags is not None and tag in self._record_tags:
+            return True
+        return depth == self._record_depth
+
+    def _selected(self, tag: str) -> bool:
+        """Returns True if the element with the tag, the last one in _paths, is selected."""
+        if tag in self._select_tags:
+            return True
+        return self._paths is not None and self._paths[-1] in self._select_paths
+
+
+class ElementTreeEngine(XmlEngine):
+    """An engine based on xml.etree.ElementTree.XMLPullParser, building the whole tree.
+    If prune is True, record elements are cleared and detached from their parent
+    once the consumer of read_events is done with their "end" event.
+    If select is given, only events of selected elements are reported. If open
+    elements are tracked (prune or track_depth is True, or select lists paths),
+    elements outside selected subtrees are also detached from their parent once
+    parsed, and cleared unless selected.
+    """
+
+    def __init__(self, events: Iterable[str], prune: bool = False, **kwargs):
+        super().__init__(events, prune, **kwargs)
+        self._stack = []
+        self._marks = []  # Whether each open element is selected
+        self._inside = 0  # Number of open selected elements
+        self._track = prune or bool(self._select_paths) or self._track_depth or self._project is not None
+        pull_events = self._events | {"start", "end"} if self._track else self._events
+        self._xml_parser = ElementTree.XMLPullParser(list(pull_events))
+
+    @property
+    def depth(self) -> Optional[int]:
+        """Number of elements open after the events read so far, if they are tracked."""
+        return len(self._stack) if self._track else None
+
+    def feed(self, data: Union[str, bytes]) -> None:
+        try:
+            self._xml_parser.feed(data)
+        except ElementTree.ParseError as e:
+            self.failed = True
+            raise FormatError(f"XML parsing error: {e}") from e
+
+    def read_events(self) -> Iterator[Tuple[str, ElementTree.Element]]:
+        events = self._events
+        prune = self._prune
+        project = self._project
+        select = self._select
+        select_tags = self._select_tags
+        track = self._track
+        stack = self._stack
+        marks = self._marks
+        paths = self._paths
+        try:
+            for event, element in self._xml_parser.read_events():
+                if track and event == "start":
+                    stack.append(element)
+                    if paths is not None:
+                        paths.append(paths[-1] + (element.tag,))
+                    if select:
+                        selected = self._selected(element.tag)
+                        marks.append(selected)
+                        self._inside += selected
+
+                if event in events:
+                    if not select or event not in ("start", "end"):
+                        yield event, element
+                    elif marks[-1] if track else element.tag in select_tags:
+                        yield event, element
+
+                if track and event == "end":
+                    stack.pop()
+                    detach = (prune or project is not None) and self._is_record(element.tag, len(stack))
+                    if detach:
+                        if project is not None and (not select or marks[-1]):
+                            yield "record", project(element)
+                        element.clear()
+                    if paths is not None:
+                        paths.pop()
+                    if select:
+                        selected = marks.pop()
+                        self._inside -= selected
+                        if not self._inside:  # Not within a selected subtree
+                            if not selected:
+                                element.clear()
+                            detach = True
+                    if detach and stack:
+                        stack[-1].remove(element)
+        except ElementTree.ParseError as e:
+            self.failed = True
+            raise FormatError(f"XML parsing error: {e}") from e
+
+    def close(self) -> None:
+        try:
+            self._xml_parser.close()
+        except ElementTree.ParseError as e:
+            self.failed = True
+            raise FormatError(f"XML parsing error: {e}") from e
+
+
+class ExpatEngine(XmlEngine):
+    """An engine based on expat which builds elements of record subtrees only.
+    Elements outside records are not built and report no events. Records are not
+    attached to their parents, so they are freed once the consumer drops them
+    (prune is implied). If attributes is given, only attributes with these
+    names are kept. If select is given, selected elements are treated as records
+    and only their events are reported. Supports "start" and "end" events.
+    Its handlers run in Python, so it pays off on records with many attributes,
+    while ElementTreeEngine is faster on small records, see benchmark/xml_engines.py.
+    """
+
+    def __init__(
+            self,
+            events: Iterable[str],
+            prune: bool = False,
+            attributes: Optional[Iterable[str]] = None,
+            **kwargs,
+            ):
+        super().__init__(events, prune, **kwargs)
+        unsupported = self._events - {"start", "end"}
+        if unsupported:
+            raise ValueError(f"Unsupported events: {sorted(unsupported)}.")
+        self._start_events = "start" in self._events
+        self._end_events = "end" in self._events
+        # Attributes to keep as (expat name, ElementTree name) pairs
+        self._attributes = None
+        if attributes is not None:
+            self._attributes = [(name.lstrip("{"), name) for name in attributes]
+        self._namespaces = False  # Whether any namespace has been declared yet
+        self._names: Dict[str, str] = {}
+        self._depth = 0
+        self._elements: List[ElementTree.Element] = []  # Open elements of the current record
+        self._last: Optional[ElementTree.Element] = None  # Element which gets the text collected
+        self._tail = False  # Whether the text collected is the tail of _last
+        self._data: List[str] = []
+        self._pending: List[Tuple[str, ElementTree.Element]] = []
+
+        self._xml_parser = expat.ParserCreate(namespace_separator="}")
+        self._xml_parser.buffer_text = True
+        # Attributes come as a flat [name, value, ...] list, which is cheaper to build
+        # than a dict for elements with many attributes
+        self._xml_parser.ordered_attributes = True
+        self._xml_parser.StartNamespaceDeclHandler = self._start_namespace
+        self._xml_parser.StartElementHandler = self._start
+        self._xml_parser.EndElementHandler = self._end
+        self._xml_parser.CharacterDataHandler = self._character_data
+
+    def _name(self, name: str) -> str:
+        """Returns name in ElementTree notation, "{namespace}local"."""
+        try:
+            return self._names[name]
+        except KeyError:
+            fixed = "{" + name if "}" in name else name
+            self._names[name] = fixed
+            return fixed
+
+    def _flush_data(self) -> None:
+        """Sets text collected so far as text or tail of the last element."""
+        if self._data:
+            if self._last is not None:
+                text = "".join(self._data)
+                if self._tail:
+                    self._last.tail = text
+                else:
+                    self._last.text = text
+            self._data = []
+
+    def _start_namespace(self, prefix: Optional[str], uri: str) -> None:
+        self._namespaces = True
+
+    def _start(self, name: str, attributes: List[str]) -> None:
+        depth = self._depth
+        self._depth = depth + 1
+        elements = self._elements
+        tag = self._name(name)
+        if self._paths is not None:
+            self._paths.append(self._paths[-1] + (tag,))
+        if self._select:
+            report = self._selected(tag)
+            if not elements and not report:
+                return
+        else:
+            report = True
+            if not elements and not self._is_record(tag, depth):
+                return
+
+        self._flush_data()
+        names = attributes[::2]
+        if self._attributes is not None:
+            attrib = {}
+            for expat_name, name in self._attributes:
+                try:
+                    attrib[name] = attributes[2 * names.index(expat_name) + 1]
+                except ValueError:
+                    pass
+        elif self._namespaces:
+            attrib = dict(zip(map(self._name, names), attributes[1::2]))
+        else:
+            attrib = dict(zip(names, attributes[1::2]))
+        element = ElementTree.Element(tag, attrib)
+        if elements:
+            elements[-1].append(element)
+        elements.append(element)
+        self._last = element
+        self._tail = False
+        if self._start_events and report:
+            self._pending.append(("start", element))
+
+    def _end(self, name: str) -> None:
+        self._depth -= 1
+        elements = self._elements
+        if not elements:
+            if self._paths is not None:
+                self._paths.pop()
+            return
+
+        self._flush_data()
+        element = elements.pop()
+        if self._end_events and (not self._select or self._selected(element.tag)):
+            self._pending.append(("end", element))
+        if self._project is not None and not elements:
+            self._pending.append(("record", self._project(element)))
+        if self._paths is not None:
+            self._paths.pop()
+        if elements:
+            self._last = element
+            self._tail = True
+        else:  # End of the record, text outside records is dropped
+            self._last = None
+
+    @property
+    def depth(self) -> int:
+        return self._depth
+
+    def _character_data(self, data: str) -> None:
+        if self._elements:
+            self._data.append(data)
+
+    def feed(self, data: Union[str, bytes]) -> None:
+        try:
+            self._xml_parser.Parse(data, False)
+        except expat.ExpatError as e:
+            self.failed = True
+            raise FormatError(f"XML parsing error: {e}") from e
+
+    def read_events(self) -> Iterator[Tuple[str, ElementTree.Element]]:
+        events, self._pending = self._pending, []
+        return iter(events)
+
+    def close(self) -> None:
+        try:
+            self._xml_parser.Parse(b"", True)
+        except expat.ExpatError as e:
+            self.failed = True
+            raise FormatError(f"XML parsing error: {e}") from e
+
+
+# Engine name -> engine class, for XmlBaseParser engine argument
+ENGINES: Dict[str, Callable[..., XmlEngine]] = {
+    "etree": ElementTreeEngine,
+    "expat": ExpatEngine,
+    }